@@ -27,6 +27,7 @@ import tkMessageBox
 import tkSimpleDialog
 import os
 
+import crypto
 from authwidget import *
 from nymwidget import *
 from sigwidget import *
@@ -38,12 +39,17 @@ class IDGui():
 
     def __init__(self, config):
         self.config = config
+        if len(self.config.cfg[Config.CRYPTOBACKEND]) > 0:
+            crypto.setBackend(self.config.cfg[Config.CRYPTOBACKEND])
         clientConfig = idclient.Config()
         clientConfig.publicKey = self.config.cfg[Config.SERVERKEY]
         clientConfig.sslCert = self.config.cfg[Config.SSLCERT]
         clientConfig.idHost = self.config.cfg[Config.SERVER]
         clientConfig.idPort = int(self.config.cfg[Config.SERVERPORT])
         clientConfig.keyHost = self.config.cfg[Config.SERVER]
+        clientConfig.blindingPool = int(self.config.cfg[Config.BLINDINGPOOL])
+        clientConfig.batchSlot = (
+            self.config.cfg[Config.BATCHSLOT].lower() in ('yes', 'true', '1'))
         self.client = idclient.IDClient(clientConfig)
         self.top = Tk()
         self.authWidget = AuthWidget(self.top)
@@ -60,6 +66,8 @@ class IDGui():
         self.top.mainloop()
 
     def actionQuit(self):
+        self.client.shutdown()
+        self.nymWidget.shutdown()
         self.top.destroy()
 
     def actionSign(self):
@@ -113,6 +121,11 @@ class Config:
     NYM = 'nymfile'
     SECRETKEY = 'secretkey'
     PUBLICKEY = 'publickey'
+    BLINDINGPOOL = 'blindingpool'
+    BATCHSLOT = 'batchslot'
+    KEYPOOL = 'keypool'
+    KEYPOOLSIZE = 'keypoolsize'
+    CRYPTOBACKEND = 'cryptobackend'
 
     def __init__(self, cfgFile):
         self.cfgFile = cfgFile
@@ -123,6 +136,11 @@ class Config:
                     self.NYM:'~/idgui_nym.txt',
                     self.SECRETKEY: '~/idgui_secretkey.txt',
                     self.PUBLICKEY: '~/idgui_publickey.txt',
+                    self.BLINDINGPOOL: 4,
+                    self.BATCHSLOT: 'no',
+                    self.KEYPOOL: '',
+                    self.KEYPOOLSIZE: 2,
+                    self.CRYPTOBACKEND: '',
                     self.SSLCERT: ''}
         try:
             f = open(os.path.expanduser(cfgFile), 'r')
@@ -139,6 +157,7 @@ class Config:
             self.cfg[self.SECRETKEY]=os.path.expanduser(self.cfg[self.SECRETKEY])
             self.cfg[self.PUBLICKEY]=os.path.expanduser(self.cfg[self.PUBLICKEY])
             self.cfg[self.SSLCERT] = os.path.expanduser(self.cfg[self.SSLCERT])
+            self.cfg[self.KEYPOOL] = os.path.expanduser(self.cfg[self.KEYPOOL])
         except:
             pass
 
@@ -24,6 +24,7 @@ sys.path.append('..')
 
 from Tkinter import *
 import OpenPGP
+import keypool
 from idgui import *
 
 class NymWidget(LabelFrame):
@@ -49,12 +50,24 @@ class NymWidget(LabelFrame):
         self.nym = config.nym
         self.pubKey = config.publicKey
         self.secKey = config.secretKey
+        self.keyPool = None
+        if config.cfg[Config.KEYPOOL] != '':
+            passphrase = poolPassphraseCallback()
+            if passphrase:
+                # no process pools, they would fork the running Tk process
+                self.keyPool = keypool.KeyPool(
+                    config.cfg[Config.KEYPOOL], passphrase,
+                    int(config.cfg[Config.KEYPOOLSIZE]), processes=1)
+                self.keyPool.start()
         if self.nym is not None:
             self.idEntry.insert(0, self.nym.packets[OpenPGP.TAG_NYM].id)
             self.keyVar.set(self.nym.packets[OpenPGP.TAG_NYM].keyID().encode('hex'))
         
     def actionGenerate(self):
-        self.pubKey, self.secKey = OpenPGP.generateKey(2048)
+        if self.keyPool is not None:
+            self.pubKey, self.secKey = self.keyPool.take()
+        else:
+            self.pubKey, self.secKey = OpenPGP.generateKey(2048, processes=1)
         self.nym = OpenPGP.messages.Message.fromPackets((
                 OpenPGP.packets.NymPacket.fromParameter(
                     self.idEntry.get(),
@@ -69,6 +82,10 @@ class NymWidget(LabelFrame):
             self.secKey.rep(passphrase))
 
 
+    def shutdown(self):
+        if self.keyPool is not None:
+            self.keyPool.shutdown()
+
     def getNym(self):
         if self.secKey is None:
             try:
@@ -88,6 +105,11 @@ def passphraseCallback():
     return tkSimpleDialog.askstring('idgui.py',
                                    'Enter passphrase for secret key:')
 
+def poolPassphraseCallback():
+    return tkSimpleDialog.askstring('idgui.py',
+                                    'Enter passphrase for the key pool:',
+                                    show='*')
+
 # ------------------------------------------------------------------------------
 
 if __name__ == '__main__':
@@ -29,6 +29,7 @@ import packets
 import messages
 
 TAG_NYM = packets.NymPacket.TAG
+TAG_ED25519NYM = packets.Ed25519NymPacket.TAG
 TAG_PUBKEY = packets.PublicKeyPacket.TAG
 TAG_SECKEY = packets.SecretKeyPacket.TAG
 TAG_SIGNATURE = packets.SignaturePacket.TAG
@@ -36,9 +37,12 @@ TAG_USERID = packets.UserIDPacket.TAG
 TAG_BLINDMSG = packets.BlindMessagePacket.TAG
 TAG_BLINDSIG = packets.BlindSignaturePacket.TAG
 
+RSAPublicContext = packets.RSAPublicContext
+RSAPrivateContext = packets.RSAPrivateContext
+
 # ------------------------------------------------------------------------------
 
-def verifySignature(m, signature, publicKey):
+def verifySignature(m, signature, publicKey, hashAlgorithms=None):
     """
     Verify a type 0 signature over m
 
@@ -47,62 +51,138 @@ def verifySignature(m, signature, publicKey):
     @param signature: The OpenPGP signature over m.
     @type signature: SignatureMessage
     @param publicKey: The public key of the signer.
-    @type publicKey: PublicKeyMessage
+    @type publicKey: PublicKeyMessage or RSAPublicContext
+    @param hashAlgorithms: The hash algorithms to accept, None for all
+    supported ones (see blinding.hashPolicy).
     @return: Returns true if the signature is valid.
     """
-
-    data = (m + signature.packets[TAG_SIGNATURE].hashdata())
-    plainhash = crypto.hash(
-        data,
-        signature.packets[TAG_SIGNATURE].hashAlgorithm.value)
-    if signature.packets[TAG_SIGNATURE].hashLeftTwo != plainhash[0:2]:
+    key = _signatureKey(signature.packets[TAG_SIGNATURE],
+                        packets.publicContext(publicKey))
+    if key is None:
+        return False
+    codedhashInt = _codedHash(m, signature.packets[TAG_SIGNATURE], key,
+                              hashAlgorithms)
+    if codedhashInt is None:
         return False
+    return key.verify(signature.packets[TAG_SIGNATURE].sig.value, codedhashInt)
 
-    codedhash = encoding.pkcs15(
-        plainhash,
-        publicKey.packets[TAG_PUBKEY].n.bits(),
-        signature.packets[TAG_SIGNATURE].hashAlgorithm.value)
-    codedhashInt = elements.ScalarElement(codedhash).value
-    
-    rsaN = publicKey.packets[TAG_PUBKEY].n.value
-    rsaE = publicKey.packets[TAG_PUBKEY].e.value
-    return crypto.rsaVerify(signature.packets[TAG_SIGNATURE].sig.value,
-                            codedhashInt, rsaE, rsaN)
+# ------------------------------------------------------------------------------
+
+def _signatureKey(sigPacket, key):
+    """
+    The key a signature packet verifies with: the key itself, or the exponent
+    slot the signature names if the key publishes that slot (see
+    blindca.BlindCA.signBatch). None if the slot is not published.
+    """
+    slot = sigPacket.hashedSubpackets.notation(subpackets.NOTATION_EXPONENT)
+    if slot is None:
+        return key
+    try:
+        e = int(slot)
+    except ValueError:
+        return None
+    if not e in key.batchExponents():
+        return None
+    return key.slot(e)
+
+# ------------------------------------------------------------------------------
+
+def _codedHash(m, sigPacket, key, hashAlgorithms):
+    """
+    The encoded hash a signature packet over m must verify to, or None if the
+    left two bytes of the hash do not match. Everything depending on the hash
+    algorithm of the signature is looked up in crypto.HASH_NAME and
+    encoding.HASH_PREFIX, algorithms missing there or in hashAlgorithms give
+    None as well.
+    """
+    algorithm = sigPacket.hashAlgorithm.value
+    if not algorithm in encoding.HASH_PREFIX:
+        return None
+    if hashAlgorithms is not None and not algorithm in hashAlgorithms:
+        return None
+    h = crypto.hashNew(algorithm, m)
+    h.update(sigPacket.hashdata())
+    plainhash = h.digest()
+    if sigPacket.hashLeftTwo != plainhash[0:2]:
+        return None
+    return encoding.pkcs15Int(plainhash, key.bits,
+                              sigPacket.hashAlgorithm.value)
 
 # ------------------------------------------------------------------------------
 
-def computeSignature(m, secretKey):
+def screenSignatures(pairs, publicKey, hashAlgorithms=None):
+    """
+    Screen many type 0 signatures made with the same key. All signatures are
+    screened together (see crypto.rsaBatchScreen), the invalid ones are found
+    by binary splitting.
+    Screening is not verification: a signature replaced by n - s passes with
+    a probability of 1/2, verifySignature rejects it. Use verifySignature to
+    decide whether a signature is valid.
+
+    @param pairs: List of (m, signature) as for verifySignature.
+    @param publicKey: The public key of the signer.
+    @type publicKey: PublicKeyMessage or RSAPublicContext
+    @param hashAlgorithms: The hash algorithms to accept, None for all
+    supported ones.
+    @return: List of booleans, true for each signature that passed the
+    screening.
+    """
+    caKey = packets.publicContext(publicKey)
+    result = [False] * len(pairs)
+    # signatures of different exponent slots are screened separately
+    batches = {}
+    for i, (m, signature) in enumerate(pairs):
+        key = _signatureKey(signature.packets[TAG_SIGNATURE], caKey)
+        if key is None:
+            continue
+        codedhashInt = _codedHash(m, signature.packets[TAG_SIGNATURE], key,
+                                  hashAlgorithms)
+        if codedhashInt is None:
+            continue
+        indices, sigs, ms = batches.setdefault(key.e, ([], [], []))
+        indices.append(i)
+        sigs.append(signature.packets[TAG_SIGNATURE].sig.value)
+        ms.append(codedhashInt)
+    for e, (indices, sigs, ms) in batches.items():
+        for i, valid in zip(indices,
+                            crypto.rsaBatchScreen(sigs, ms, e, caKey.n)):
+            result[i] = valid
+    return result
+
+# ------------------------------------------------------------------------------
+
+def computeSignature(m, secretKey, hashAlgorithm=crypto.HASH_SHA256):
     """
     Compute a type 0 signature.
 
     @param m: Message of binary data to sign.
     @type m: string
     @param secretKey: Key used for signature.
-    @type secretKey: SecretKeyMessage
+    @type secretKey: SecretKeyMessage or RSAPrivateContext
+    @param hashAlgorithm: Hash algorithm of the signature.
     @return: An OpenPGP signature message.
     """
+    key = packets.privateContext(secretKey)
     sigPacket = packets.SignaturePacket()
     sigPacket.version = elements.ScalarElement(4)
     sigPacket.signatureType = elements.ScalarElement(0)
     sigPacket.pubAlgorithm = elements.ScalarElement(1)
-    sigPacket.hashAlgorithm = elements.ScalarElement(crypto.HASH_SHA256)
+    sigPacket.hashAlgorithm = elements.ScalarElement(hashAlgorithm)
     sigPacket.hashedSubpackets.add(subpackets.CreationTimeSubpacket(
             elements.TimeElement.now()))
     sigPacket.subpackets.add(
-        subpackets.IssuerSubpacket(secretKey.packets[TAG_SECKEY].keyID()))
-    data = (m + sigPacket.hashdata())
-    plainhash = crypto.hash(data, sigPacket.hashAlgorithm.value)
+        subpackets.IssuerSubpacket(key.keyID))
+    h = crypto.hashNew(sigPacket.hashAlgorithm.value, m)
+    h.update(sigPacket.hashdata())
+    plainhash = h.digest()
     sigPacket.hashLeftTwo = plainhash[0:2]
 
-    codedhash = encoding.pkcs15(
+    codedhashInt = encoding.pkcs15Int(
         plainhash,
-        secretKey.packets[TAG_SECKEY].n.bits(),
+        key.bits,
         sigPacket.hashAlgorithm.value)
-    codedhashInt = elements.ScalarElement(codedhash).value
 
-    rsaN = secretKey.packets[TAG_SECKEY].n.value
-    rsaD = secretKey.packets[TAG_SECKEY].d.value
-    s = crypto.rsaSign(codedhashInt, rsaD, rsaN)
+    s = key.sign(codedhashInt)
     sigPacket.sig = elements.MPIElement(s)
 
     pgpMessage = messages.SignatureMessage.fromPackets((sigPacket,))
@@ -111,8 +191,28 @@ def computeSignature(m, secretKey):
 
 # ------------------------------------------------------------------------------
 
-def generateKey(bits):
-    key = crypto.rsaGenerate(bits)
+def generateKey(bits, primes=2, exponents=(), processes=1):
+    """
+    Generate a RSA key pair.
+
+    @param bits: Size of the modulus.
+    @param primes: Number of prime factors of the modulus. Keys with more than
+    two primes are faster to use, the public key stays a normal RSA key.
+    @param exponents: Additional public exponents the key must support, see
+    blindca.Config.batchExponents.
+    @param processes: Number of processes searching for primes, None for one
+    per CPU (see crypto.rsaGenerateParallel).
+    @return: (PublicKeyMessage, SecretKeyMessage)
+    """
+    if processes != 1:
+        key = crypto.rsaGenerateParallel(bits, primes,
+                                         exponents=tuple(exponents),
+                                         processes=processes)
+    elif primes == 2 and len(exponents) == 0:
+        key = crypto.rsaGenerate(bits) + ((),)
+    else:
+        key = crypto.rsaGenerateMultiPrime(bits, primes,
+                                           exponents=tuple(exponents))
     pubKey = packets.PublicKeyPacket.fromParameter(elements.MPIElement(key[0]),
                                                    elements.MPIElement(key[1]))
     secKey = packets.SecretKeyPacket.fromParameter(elements.MPIElement(key[0]),
@@ -120,8 +220,56 @@ def generateKey(bits):
                                                    elements.MPIElement(key[2]),
                                                    elements.MPIElement(key[3]),
                                                    elements.MPIElement(key[4]),
-                                                   elements.MPIElement(key[5]))
+                                                   elements.MPIElement(key[5]),
+                                                   [elements.MPIElement(r)
+                                                    for r in key[6]])
     return (messages.PublicKeyMessage.fromPackets((pubKey,)),
             messages.SecretKeyMessage.fromPackets((secKey,)))
 
 # ------------------------------------------------------------------------------
+
+def generateEd25519Key():
+    """
+    Generate an Ed25519 key pair, e.g. for the key of a nym. This needs a
+    native Ed25519 implementation (see crypto.ed25519Supported).
+
+    @return: (PublicKeyMessage, SecretKeyMessage)
+    """
+    secret, public = crypto.ed25519Generate()
+    pubKey = packets.PublicKeyPacket.fromEd25519(public)
+    secKey = packets.SecretKeyPacket.fromEd25519(secret, public)
+    secKey.created = pubKey.created
+    return (messages.PublicKeyMessage.fromPackets((pubKey,)),
+            messages.SecretKeyMessage.fromPackets((secKey,)))
+
+# ------------------------------------------------------------------------------
+
+def createNym(id, secretKey):
+    """
+    Create a self signed nym for the key, a NymPacket for a RSA key and an
+    Ed25519NymPacket for an Ed25519 key.
+
+    @param id: The username of the nym.
+    @param secretKey: The key of the nym.
+    @type secretKey: SecretKeyMessage
+    """
+    key = packets.keyPacket(secretKey)
+    if key.algorithm.value == packets.ALGORITHM_ED25519:
+        nym = packets.Ed25519NymPacket.fromParameter(id, key.ed25519Public)
+    else:
+        nym = packets.NymPacket.fromParameter(id, key.n)
+    nym.computeSignature(secretKey)
+    return nym
+
+# ------------------------------------------------------------------------------
+
+def getNym(message):
+    """
+    Return the nym packet of a message, RSA or Ed25519.
+    """
+    for tag in (TAG_NYM, TAG_ED25519NYM):
+        if tag in message.packets:
+            return message.packets[tag]
+    raise Exception('no nym in message')
+
+# ------------------------------------------------------------------------------
@@ -95,12 +95,7 @@ class MPIElement(Element):
         self.value = crypto.b2i(self.bytes)
 
     def bits(self):
-        temp = self.value
-        bits = 0
-        while temp > 0:
-            bits += 1
-            temp >>= 1
-        return bits
+        return self.value.bit_length()
 
     def octets(self):
         return int(math.ceil(float(self.bits()) / 8))
@@ -169,7 +164,54 @@ class TimeElement(ScalarElement):
 # ------------------------------------------------------------------------------
 
 class S2KElement(Element):
-    def __init__(self, s=None):
+    DEFAULT_COUNT = 65536
+
+    @staticmethod
+    def decodeCount(c):
+        """
+        The number of bytes hashed for the coded count octet c.
+        """
+        return (16 + (c & 15)) << ((c >> 4) + 6)
+
+    @staticmethod
+    def encodeCount(count):
+        """
+        The smallest coded count octet that hashes at least count bytes, 255 if
+        count is larger than the maximum.
+        """
+        for c in range(0, 256):
+            if S2KElement.decodeCount(c) >= count:
+                return c
+        return 255
+
+    @staticmethod
+    def calibrate(seconds, hashalgorithm=crypto.HASH_SHA1,
+                  algorithm=crypto.SYMALGORITHM_AES256):
+        """
+        Measure the hash speed of this machine and return the largest count
+        for which generateKey takes at most the given time.
+
+        @param seconds: Target unlock time.
+        @param hashalgorithm: Hash algorithm of the S2K.
+        @param algorithm: Symmetric algorithm the key is generated for.
+        """
+        s2k = S2KElement(count=S2KElement.decodeCount(0xa0))
+        s2k.hashalgorithm = hashalgorithm
+        start = time.time()
+        s2k.generateKey('', algorithm)
+        rate = s2k.count / max(time.time() - start, 1e-6)
+        c = 0
+        while (c < 255 and
+               S2KElement.decodeCount(c + 1) <= seconds * rate):
+            c += 1
+        return S2KElement.decodeCount(c)
+
+    def __init__(self, s=None, count=DEFAULT_COUNT):
+        """
+        @param s: Data to parse, None for a new iterated and salted S2K.
+        @param count: Bytes to hash for a new S2K. It is rounded up to the next
+        count that can be coded.
+        """
         if isinstance(s, basestring):
             s = io.BytesIO(s)
         if isinstance(s, io.BytesIO):
@@ -184,13 +226,12 @@ class S2KElement(Element):
                 # Iterated and Salted S2K
                 self.hashalgorithm = ord(s.read(1))
                 self.salt = s.read(8)
-                c = ord(s.read(1))
-                self.count = (16 + (c & 15)) << ((c >> 4) + 6);
+                self.count = self.decodeCount(ord(s.read(1)))
         if s is None:
             self.specifier = 3
             self.hashalgorithm = crypto.HASH_SHA1
             self.salt = crypto.randomBytes(8)
-            self.count = 65536
+            self.count = self.decodeCount(self.encodeCount(count))
 
     def generateKey(self, passphrase, algorithm):
         if self.specifier == 0:
@@ -198,22 +239,29 @@ class S2KElement(Element):
         elif self.specifier == 1:
             raise Exception('not implemented')
         elif self.specifier == 3:
-            hashdata = ''
-            m = self.salt + passphrase
-            bytes = 0
-            while bytes < self.count:
-                for i in range(0, len(m)):
-                    hashdata += m[i]
-                    bytes += 1
-                    if bytes == self.count:
-                        break
-            self.key = crypto.hash(hashdata, self.hashalgorithm)
-            if len(self.key) < crypto.SYMALGORITHM_KEYSIZE[algorithm]:
-                self.key += crypto.hash('\x00' + hashdata, self.hashalgorithm)
+            keysize = crypto.SYMALGORITHM_KEYSIZE[algorithm]
+            self.key = ''
+            preload = 0
+            while len(self.key) < keysize:
+                h = crypto.hashNew(self.hashalgorithm, '\x00' * preload)
+                self._iterate(h, self.salt + passphrase)
+                self.key += h.digest()
+                preload += 1
         else:
             raise Exception('invalid s2k specifier')
         return self.key[:crypto.SYMALGORITHM_KEYSIZE[algorithm]]
 
+    def _iterate(self, h, m):
+        """
+        Hash count bytes of m repeated, at least m once, in blocks of about
+        64 KiB.
+        """
+        count = max(self.count, len(m))
+        block = m * (65536 / len(m) + 1)
+        for i in xrange(0, count / len(block)):
+            h.update(block)
+        h.update(block[:count % len(block)])
+
     def __str__(self):
         return ('S2K: iterated and salted (3)\n'
                 '        Hash algorithm: %s\n'
@@ -224,6 +272,6 @@ class S2KElement(Element):
 
     def rep(self):
         return (chr(self.specifier) + chr(self.hashalgorithm) + self.salt +
-                chr(96))
+                chr(self.encodeCount(self.count)))
 
 # ------------------------------------------------------------------------------
@@ -122,44 +122,88 @@ class Message:
 class PublicKeyMessage(Message):
     HEADER = 'PGP PUBLIC KEY BLOCK'
 
-    def verifySignature(self):
-        data = (self.packets[PublicKeyPacket.TAG].hashdata() +
-                self.packets[UserIDPacket.TAG].hashdata() +
-                self.packets[SignaturePacket.TAG].hashdata())
+    def _signatureHash(self):
+        h = crypto.hashNew(self.packets[SignaturePacket.TAG].hashAlgorithm.value,
+                           self.packets[PublicKeyPacket.TAG].hashdata())
+        h.update(self.packets[UserIDPacket.TAG].hashdata())
+        h.update(self.packets[SignaturePacket.TAG].hashdata())
+        return h.digest()
 
-        plainhash = crypto.hash(
-            data,
-            self.packets[SignaturePacket.TAG].hashAlgorithm.value)
+    def verifySignature(self):
+        if not (self.packets[SignaturePacket.TAG].hashAlgorithm.value in
+                encoding.HASH_PREFIX):
+            return False
+        plainhash = self._signatureHash()
         if self.packets[SignaturePacket.TAG].hashLeftTwo != plainhash[0:2]:
             return False
         sig = self.packets[SignaturePacket.TAG].sig.value
-        codedhash = encoding.pkcs15(
+        codedhashInt = encoding.pkcs15Int(
             plainhash,
             self.packets[PublicKeyPacket.TAG].n.bits(),
             self.packets[SignaturePacket.TAG].hashAlgorithm.value)
-        codedhashInt = ScalarElement(codedhash).value
         rsaN = self.packets[PublicKeyPacket.TAG].n.value
         rsaE = self.packets[PublicKeyPacket.TAG].e.value
         return crypto.rsaVerify(sig, codedhashInt, rsaE, rsaN)
         
 
     def computeSignature(self, secretKey):
-        data = (self.packets[PublicKeyPacket.TAG].hashdata() +
-                self.packets[UserIDPacket.TAG].hashdata() +
-                self.packets[SignaturePacket.TAG].hashdata())
-        plainhash = crypto.hash(
-            data, self.packets[SignaturePacket.TAG].hashAlgorithm.value)
-        codedhash = encoding.pkcs15(
+        plainhash = self._signatureHash()
+        codedhashInt = encoding.pkcs15Int(
             plainhash,
             self.packets[PublicKeyPacket.TAG].n.bits(),
             self.packets[SignaturePacket.TAG].hashAlgorithm.value)
-        codedhashInt = ScalarElement(codedhash).value
-        rsaN = secretKey.packets[SecretKeyPacket.TAG].n.value
-        rsaD = secretKey.packets[SecretKeyPacket.TAG].d.value
-        sig = crypto.rsaSign(codedhashInt, rsaD, rsaN)
+        sig = privateContext(secretKey).sign(codedhashInt)
         return plainhash[0:2], MPIElement(sig)
 
 
+    def hashAlgorithms(self):
+        """
+        The preferred hash algorithms of the key, empty if there is no self
+        signature or it states none.
+        """
+        if not SignaturePacket.TAG in self.packets:
+            return ()
+        preferred = self.packets[SignaturePacket.TAG].hashedSubpackets.get(
+            HashAlgorithmsSubpacket.TAG)
+        if preferred is None:
+            return ()
+        return preferred.algorithms()
+
+    def setHashAlgorithms(self, algorithms, secretKey):
+        """
+        Replace the preferred hash algorithms and renew the self signature.
+
+        @param algorithms: Hash algorithms in order of preference.
+        @param secretKey: The secret key of this key.
+        """
+        sigPacket = self.packets[SignaturePacket.TAG]
+        sigPacket.hashedSubpackets.set(HashAlgorithmsSubpacket(
+                ''.join([chr(a) for a in algorithms])))
+        sigPacket.hashLeftTwo, sigPacket.sig = self.computeSignature(secretKey)
+
+    def batchExponents(self):
+        """
+        The exponent slots of a batch signing CA key, empty if the self
+        signature lists none (see blindca.BlindCA.signBatch).
+        """
+        if not SignaturePacket.TAG in self.packets:
+            return ()
+        return parseExponents(
+            self.packets[SignaturePacket.TAG].hashedSubpackets.notation(
+                NOTATION_BATCH_EXPONENTS))
+
+    def setBatchExponents(self, exponents, secretKey):
+        """
+        Replace the published exponent slots and renew the self signature.
+
+        @param exponents: The exponent slots of the key.
+        @param secretKey: The secret key of this key.
+        """
+        sigPacket = self.packets[SignaturePacket.TAG]
+        sigPacket.hashedSubpackets.setNotation(
+            NOTATION_BATCH_EXPONENTS, ','.join([str(e) for e in exponents]))
+        sigPacket.hashLeftTwo, sigPacket.sig = self.computeSignature(secretKey)
+
     def creationTime(self):
         return self.packets[PublicKeyPacket.TAG].created
 
@@ -184,8 +228,17 @@ class PublicKeyMessage(Message):
 class SecretKeyMessage(PublicKeyMessage):
     HEADER = 'PGP PRIVATE KEY BLOCK'
 
-    def rep(self, passphrase=None):
+    def rep(self, passphrase=None, s2kCount=None):
+        """
+        @param passphrase: Passphrase to encrypt the key with, None for an
+        unencrypted key.
+        @param s2kCount: Number of bytes hashed to derive the key from the
+        passphrase (see S2KElement.calibrate). By default the count of the
+        loaded key or S2KElement.DEFAULT_COUNT is kept.
+        """
         self.packets[SecretKeyPacket.TAG].passphrase = passphrase
+        if s2kCount is not None:
+            self.packets[SecretKeyPacket.TAG].s2kCount = s2kCount
         return Message.rep(self)
 
     @classmethod
@@ -28,6 +28,7 @@ ALGORITHM_RSA_ENCRYPT = 2
 ALGORITHM_RSA_SIGN    = 3
 ALGORITHM_ELGAMAL     = 16
 ALGORITHM_DSA         = 17
+ALGORITHM_ED25519     = 27
 
        
 # ------------------------------------------------------------------------------
@@ -43,6 +44,8 @@ def algorithmToString(a):
         s = 'Elgamal'
     elif a == ALGORITHM_DSA:
         s = 'DSA'
+    elif a == ALGORITHM_ED25519:
+        s = 'Ed25519'
     else:
         s = 'unknown'
     s += ' (%d)' % a
@@ -123,6 +126,8 @@ class Packet:
             return BlindSignaturePacket.fromData(stream)
         elif tag == NymPacket.TAG:
             return NymPacket.fromData(stream)
+        elif tag == Ed25519NymPacket.TAG:
+            return Ed25519NymPacket.fromData(stream)
         else:
             print 'WARNING: unsupported package tag: %d' % tag
 
@@ -135,7 +140,7 @@ class Packet:
         if pLen > 0 and pLen < 192:
             length = chr(pLen)
         elif pLen >= 192 and pLen <= 8383:
-            lenBytes = ScalarElement(pLen).rep(2)
+            lenBytes = ScalarElement(pLen - 192).rep(2)
             length = chr(ord(lenBytes[0]) + 192) + lenBytes[1]
         else:
             raise Exception('lenth type not implemented')
@@ -223,6 +228,8 @@ class SignaturePacket(Packet):
 class PublicKeyPacket(Packet):
     """
     Public-Key Packet (Tag 6)
+    RSA keys have the MPIs n and e, Ed25519 keys (RFC 9580) the 32 octets
+    ed25519Public.
     """
 
     TAG = 6
@@ -232,8 +239,11 @@ class PublicKeyPacket(Packet):
         self.version = ScalarElement(s.read(1))
         self.created = TimeElement(s.read(4))
         self.algorithm = ScalarElement(s.read(1))
-        self.n = MPIElement(s)
-        self.e = MPIElement(s)
+        if self.algorithm.value == ALGORITHM_ED25519:
+            self.ed25519Public = s.read(32)
+        else:
+            self.n = MPIElement(s)
+            self.e = MPIElement(s)
 
     @classmethod
     def fromParameter(self, n, e):
@@ -245,31 +255,50 @@ class PublicKeyPacket(Packet):
         p.e = e
         return p
 
+    @classmethod
+    def fromEd25519(self, public):
+        p = PublicKeyPacket()
+        p.version = ScalarElement(4)
+        p.created = TimeElement.now()
+        p.algorithm = ScalarElement(ALGORITHM_ED25519)
+        p.ed25519Public = public
+        return p
+
+    def keyMaterial(self):
+        """
+        The algorithm specific fields of the public key.
+        """
+        if self.algorithm.value == ALGORITHM_ED25519:
+            return self.ed25519Public
+        return self.n.rep() + self.e.rep()
+
     def rep(self):
         data = (self.version.rep(1) +
                 self.created.rep() +
                 self.algorithm.rep(1) +
-                self.n.rep() +
-                self.e.rep())
+                self.keyMaterial())
         return Packet.createHeader(self.TAG, len(data)) + data
         
     def hashdata(self):
         data = (self.version.rep(1) + self.created.rep() + self.algorithm.rep(1) +
-                self.n.rep() + self.e.rep())
+                self.keyMaterial())
         return '\x99' + ScalarElement(len(data)).rep(2) + data
 
+    def _keyString(self):
+        if self.algorithm.value == ALGORITHM_ED25519:
+            return '    Ed25519: %s\n' % self.ed25519Public.encode('hex')
+        return '    RSA n: %s\n    RSA e: %s\n' % (self.n, self.e)
+
     def __str__(self):
         return ('Public Key Packet (tag %d):\n'
                 '    Version: %s\n'
                 '    Created: %s\n'
                 '    Algorithm: %s\n'
-                '    RSA n: %s\n'
-                '    RSA e: %s\n') % (self.TAG,
-                                      self.version,
-                                      self.created,
-                                      algorithmToString(self.algorithm.value),
-                                      self.n,
-                                      self.e)
+                '%s') % (self.TAG,
+                         self.version,
+                         self.created,
+                         algorithmToString(self.algorithm.value),
+                         self._keyString())
 
     def fingerprint(self):
         return crypto.hash_sha1(self.hashdata())
@@ -287,16 +316,22 @@ class SecretKeyPacket(PublicKeyPacket):
     TAG = 5
     
     def __init__(self, s=None, length=0, passphraseCallback=None):
+        if s is not None:
+            start = s.tell()
         PublicKeyPacket.__init__(self, s)
         self.passphrase = None
+        self.s2kCount = S2KElement.DEFAULT_COUNT
+        self.crt = None
+        self.primes = []
         if s is None:
             return
         self.s2kUsage = ord(s.read(1))
         if self.s2kUsage == 255 or self.s2kUsage == 254:
             self.symAlgorithm = ord(s.read(1))
             self.s2k = S2KElement(s)
+            self.s2kCount = self.s2k.count
             self.iv = s.read(crypto.SYMALGORITHM_BLOCKSIZE[self.symAlgorithm])
-            encrypted = s.read(length - s.tell() + 3)
+            encrypted = s.read(length - (s.tell() - start))
             if passphraseCallback is None:
                 raise Exception('encrypted key and no passphraseCallback')
             symkey = self.s2k.generateKey(passphraseCallback(), self.symAlgorithm)
@@ -304,27 +339,59 @@ class SecretKeyPacket(PublicKeyPacket):
                                                      encrypted,
                                                      self.iv,
                                                      self.symAlgorithm))
-            self.d = MPIElement(decrypted)
-            self.p = MPIElement(decrypted)
-            self.q = MPIElement(decrypted)
-            self.u = MPIElement(decrypted)
+            if self.algorithm.value == ALGORITHM_ED25519:
+                self.ed25519Secret = decrypted.read(32)
+            else:
+                self.d = MPIElement(decrypted)
+                self.p = MPIElement(decrypted)
+                self.q = MPIElement(decrypted)
+                self.u = MPIElement(decrypted)
+            while len(decrypted.getvalue()) - decrypted.tell() > 20:
+                self.primes.append(MPIElement(decrypted))
             if self.s2kUsage == 254:
                 self.checksum = decrypted.read(20)
                 if self.checksum != crypto.hash_sha1(decrypted.getvalue()[:-20]):
                     raise Exception('invalid passphrase')
             else:
                 raise Exception('not implemented')
+        elif self.s2kUsage == 0 and self.algorithm.value == ALGORITHM_ED25519:
+            self.ed25519Secret = s.read(32)
+            self.checksum = s.read(2)
         elif self.s2kUsage == 0:
             self.d = MPIElement(s)
             self.p = MPIElement(s)
             self.q = MPIElement(s)
             self.u = MPIElement(s)
-            self.checksum = s.read(2)
+            # the extra primes of a multi-prime key fill the body up to the
+            # checksum, a packet without length extends to the end of s
+            if length == 0:
+                rest = s.read()
+            else:
+                restLen = length - (s.tell() - start)
+                if restLen < 2:
+                    raise Exception('invalid secret key packet length')
+                rest = s.read(restLen)
+            if len(rest) < 2 or (length != 0 and len(rest) != restLen):
+                raise Exception('invalid secret key packet length')
+            material = io.BytesIO(rest[:-2])
+            while material.tell() < len(rest) - 2:
+                before = material.tell()
+                r = MPIElement(material)
+                if rest[before:material.tell()] != r.rep():
+                    raise Exception('invalid secret key material')
+                self.primes.append(r)
+            self.checksum = rest[-2:]
         else:            
             raise Exception('not implemented')
 
     @classmethod
-    def fromParameter(self, n, e, d, p, q, u):
+    def fromParameter(self, n, e, d, p, q, u, primes=()):
+        """
+        Create a secret key. primes are the additional prime factors of a
+        multi-prime key, they are stored after u in the secret key material.
+        This layout is not part of RFC 4880, other implementations do not
+        read such keys.
+        """
         key = SecretKeyPacket()
         key.version = ScalarElement(4)
         key.created = TimeElement.now()
@@ -335,16 +402,50 @@ class SecretKeyPacket(PublicKeyPacket):
         key.p = p
         key.q = q
         key.u = u
+        key.primes = list(primes)
         key.checksum = '\x00\x00'
         return key
 
+    @classmethod
+    def fromEd25519(self, secret, public):
+        key = SecretKeyPacket()
+        key.version = ScalarElement(4)
+        key.created = TimeElement.now()
+        key.algorithm = ScalarElement(ALGORITHM_ED25519)
+        key.ed25519Public = public
+        key.ed25519Secret = secret
+        key.checksum = '\x00\x00'
+        return key
+
+    def crtParameters(self):
+        """
+        The CRT parameters of the key, computed on first use.
+        """
+        if self.crt is None:
+            self.crt = crypto.rsaCrtParameters(
+                self.d.value, self.p.value, self.q.value, self.u.value,
+                [r.value for r in self.primes])
+        return self.crt
+
+    def sign(self, m):
+        """
+        Compute m^d mod n.
+        """
+        return crypto.rsaSignCrt(m, self.crtParameters(), self.e.value,
+                                 self.n.value)
+
     def rep(self, passphrase=None, algorithm=crypto.SYMALGORITHM_AES256):
         passphrase = self.passphrase
-        keydata = self.d.rep() + self.p.rep() + self.q.rep() + self.u.rep()
+        if self.algorithm.value == ALGORITHM_ED25519:
+            keydata = self.ed25519Secret
+        else:
+            keydata = self.d.rep() + self.p.rep() + self.q.rep() + self.u.rep()
+        for r in self.primes:
+            keydata += r.rep()
         s2kPart = '\x00'
         if passphrase is not None and len(passphrase) > 0:
             iv = crypto.randomBytes(crypto.SYMALGORITHM_BLOCKSIZE[algorithm])
-            s2k = S2KElement()
+            s2k = S2KElement(count=self.s2kCount)
             s2kPart = '\xfe' + chr(algorithm) + s2k.rep() + iv
             keydata += crypto.hash_sha1(keydata)
             keydata = crypto.encryptCFB(s2k.generateKey(passphrase, algorithm),
@@ -352,7 +453,7 @@ class SecretKeyPacket(PublicKeyPacket):
         else:
             keydata += '\x00\x00'
         data = (self.version.rep(1) + self.created.rep() + self.algorithm.rep(1) +
-                self.n.rep() + self.e.rep() + s2kPart + keydata)
+                self.keyMaterial() + s2kPart + keydata)
         return Packet.createHeader(self.TAG, len(data)) + data
 
     def __str__(self):
@@ -364,33 +465,201 @@ class SecretKeyPacket(PublicKeyPacket):
                            self.s2k))
         if self.s2kUsage != 0:
             s2kdetails += '    IV: %s\n' % self.iv.encode('hex')
+        if self.algorithm.value == ALGORITHM_ED25519:
+            secret = '    Ed25519 secret: %s\n' % self.ed25519Secret.encode('hex')
+        else:
+            secret = ('    RSA d: %s\n'
+                      '    RSA p: %s\n'
+                      '    RSA q: %s\n'
+                      '    RSA u: %s\n') % (self.d, self.p, self.q, self.u)
+        for r in self.primes:
+            secret += '    RSA r: %s\n' % r
         return ('Secret Key Packet (tag %d):\n'
                 '    Version: %s\n'
                 '    Created: %s\n'
                 '    Algorithm: %s\n'
-                '    RSA n: %s\n'
-                '    RSA e: %s\n'
+                '%s'
                 '    S2K usage: %s\n'
                 '%s'
-                '    RSA d: %s\n'
-                '    RSA p: %s\n'
-                '    RSA q: %s\n'
-                '    RSA u: %s\n'
+                '%s'
                 '    Checksum: %s\n') % (self.TAG,
                                          self.version,
                                          self.created,
                                          algorithmToString(self.algorithm.value),
-                                         self.n,
-                                         self.e,
+                                         self._keyString(),
                                          self.s2kUsage,
                                          s2kdetails,
-                                         self.d,
-                                         self.p,
-                                         self.q,
-                                         self.u,
+                                         secret,
                                          self.checksum.encode('hex'))
 
 # ------------------------------------------------------------------------------
+
+class RSAPublicContext:
+    """
+    A RSA public key with the values derived from it computed once. Functions
+    taking a key message also accept a context, so repeated operations with
+    the same key skip reading and converting the key packet.
+    """
+
+    KEYTAGS = (PublicKeyPacket.TAG, SecretKeyPacket.TAG)
+
+    def __init__(self, key, e=None):
+        """
+        @param key: A key message or a public or secret key packet.
+        @param e: Use this public exponent instead of the one of the key. This
+        is the key of an exponent slot of a batch signing CA, it keeps the key
+        id of the CA key.
+        """
+        self.packet = None
+        keyPackets = getattr(key, 'packets', None)
+        if keyPackets is None:
+            self.packet = key
+            signature = None
+        else:
+            for tag in self.KEYTAGS:
+                if self.packet is None:
+                    self.packet = keyPackets.get(tag)
+            signature = keyPackets.get(SignaturePacket.TAG)
+        if self.packet is None:
+            raise Exception('no key in message')
+        self.fingerprint = self.packet.fingerprint()
+        if e is not None:
+            created = self.packet.created
+            self.packet = PublicKeyPacket.fromParameter(self.packet.n,
+                                                        MPIElement(e))
+            self.packet.created = created
+        self.n = self.packet.n.value
+        self.e = self.packet.e.value
+        self.bits = self.packet.n.bits()
+        self.octets = self.packet.n.octets()
+        self.keyID = self.fingerprint[-8:]
+        self.created = self.packet.created
+        self.expires = None
+        self.preferredHashes = ()
+        self.slots = ()
+        if signature is not None:
+            expiration = signature.hashedSubpackets.get(
+                KeyExpirationSubpacket.TAG)
+            if expiration is not None:
+                self.expires = TimeElement(self.created.value +
+                                           expiration.value)
+            preferred = signature.hashedSubpackets.get(
+                HashAlgorithmsSubpacket.TAG)
+            if preferred is not None:
+                self.preferredHashes = preferred.algorithms()
+            self.slots = parseExponents(
+                signature.hashedSubpackets.notation(NOTATION_BATCH_EXPONENTS))
+
+    def creationTime(self):
+        return self.created
+
+    def expirationTime(self):
+        return self.expires
+
+    def hashAlgorithms(self):
+        """
+        The preferred hash algorithms of the key.
+        """
+        return self.preferredHashes
+
+    def batchExponents(self):
+        """
+        The exponent slots published with the key.
+        """
+        return self.slots
+
+    def slot(self, e):
+        """
+        The key of the exponent slot e, with the expiration and preferences of
+        this key.
+        """
+        slot = RSAPublicContext(self.packet, e)
+        slot.expires = self.expires
+        slot.preferredHashes = self.preferredHashes
+        slot.slots = self.slots
+        return slot
+
+    def verify(self, s, m):
+        """
+        Check s^e mod n == m.
+        """
+        return crypto.rsaVerify(s, m, self.e, self.n)
+
+# ------------------------------------------------------------------------------
+
+class RSAPrivateContext(RSAPublicContext):
+    """
+    A RSA secret key with precomputed CRT parameters.
+    """
+
+    KEYTAGS = (SecretKeyPacket.TAG,)
+
+    def __init__(self, key):
+        """
+        @param key: A secret key message or secret key packet.
+        """
+        RSAPublicContext.__init__(self, key)
+        if not isinstance(self.packet, SecretKeyPacket):
+            raise Exception('no secret key')
+        self.d = self.packet.d.value
+        self.crt = self.packet.crtParameters()
+
+    def sign(self, m):
+        """
+        Compute m^d mod n.
+        """
+        return crypto.rsaSignCrt(m, self.crt, self.e, self.n)
+
+# ------------------------------------------------------------------------------
+
+def parseExponents(value):
+    """
+    The exponent slots listed in a NOTATION_BATCH_EXPONENTS value, empty for
+    None.
+    """
+    if value is None:
+        return ()
+    try:
+        return tuple([int(e) for e in value.split(',')])
+    except ValueError:
+        raise Exception('invalid batch exponents %s' % value)
+
+# ------------------------------------------------------------------------------
+
+def publicContext(key):
+    """
+    Return key as RSAPublicContext, build it if key is a message or packet.
+    """
+    if isinstance(key, RSAPublicContext):
+        return key
+    return RSAPublicContext(key)
+
+# ------------------------------------------------------------------------------
+
+def privateContext(key):
+    """
+    Return key as RSAPrivateContext, build it if key is a message or packet.
+    """
+    if isinstance(key, RSAPrivateContext):
+        return key
+    return RSAPrivateContext(key)
+
+# ------------------------------------------------------------------------------
+
+def keyPacket(key):
+    """
+    Return the secret or else the public key packet of a key message, or key
+    if it is a packet.
+    """
+    keyPackets = getattr(key, 'packets', None)
+    if keyPackets is None:
+        return key
+    for tag in (SecretKeyPacket.TAG, PublicKeyPacket.TAG):
+        if tag in keyPackets:
+            return keyPackets[tag]
+    raise Exception('no key in message')
+
+# ------------------------------------------------------------------------------
     
 class UserIDPacket(Packet):
     """
@@ -513,12 +782,12 @@ class NymPacket(Packet):
     def computeSignature(self, secretKeyMessage):
         """
         Compute self signature
-        """        
-        key = secretKeyMessage.packets[SecretKeyPacket.TAG]
+        """
+        key = privateContext(secretKeyMessage)
         m = encoding.hashEncode(self.hashdata(),
-                                key.n.bits() - 1,
+                                key.bits - 1,
                                 crypto.HASH_SHA256, encoding.ENCODING_PKCSPSS)
-        s = crypto.rsaSign(crypto.b2i(m), key.d.value, key.n.value)
+        s = key.sign(crypto.b2i(m))
         self.signature = MPIElement(s)
 
         
@@ -526,16 +795,20 @@ class NymPacket(Packet):
         """
         Verify the self signature.
         """
-        key = keyMessage.packets.get(PublicKeyPacket.TAG)
-        if key is None:
-            key = keyMessage.packets.get(SecretKeyPacket.TAG)
-        if key is None:
-            raise Exception('no key in message')
-        em = crypto.i2b(crypto.rsaEncrypt(self.signature.value, key.e.value,
-                                          key.n.value))
-        return encoding.pssVerify(self.hashdata(), em,
-                                  crypto.HASH_SIZE[crypto.HASH_SHA256] / 8,
-                                  key.n.bits() - 1, crypto.HASH_SHA256)
+        key = publicContext(keyMessage)
+        return encoding.pssVerifyInt(
+            self.hashdata(),
+            crypto.rsaEncrypt(self.signature.value, key.e, key.n),
+            crypto.HASH_SIZE[crypto.HASH_SHA256] / 8,
+            key.bits - 1, crypto.HASH_SHA256)
+
+    def verifySelfSignature(self):
+        """
+        Verify the self signature with the key of the nym, a RSA key with the
+        public exponent 65537.
+        """
+        return self.isValid(PublicKeyPacket.fromParameter(self.n,
+                                                          MPIElement(65537)))
     
     def rep(self):
         data = (ScalarElement(len(self.id)).rep(1) + self.id + self.n.rep() +
@@ -557,3 +830,73 @@ class NymPacket(Packet):
 
     
 # ------------------------------------------------------------------------------
+
+class Ed25519NymPacket(NymPacket):
+    """
+    A Pseudonym with an Ed25519 key instead of a RSA modulus. The self
+    signature is an Ed25519 signature over the username and the key.
+    """
+
+    TAG = 63
+
+    @classmethod
+    def fromData(self, s):
+        nym = Ed25519NymPacket()
+        idLen = ScalarElement(s.read(1))
+        nym.id = s.read(idLen.value)
+        nym.key = s.read(32)
+        nym.signature = s.read(64)
+        return nym
+
+    @classmethod
+    def fromParameter(self, id, key):
+        nym = Ed25519NymPacket()
+        nym.id = id
+        nym.key = key
+        return nym
+
+    def __init__(self):
+        self.id = ''
+        self.key = '\x00' * 32
+        self.signature = '\x00' * 64
+
+    def __str__(self):
+        return ('Ed25519 Nym Packet (tag %d)\n'
+                '    id = %s\n'
+                '    key = %s\n'
+                '    signature = %s\n' % (self.TAG, self.id,
+                                          self.key.encode('hex'),
+                                          self.signature.encode('hex')))
+
+    def hashdata(self):
+        """
+        Data covered by the self signature.
+        """
+        return ScalarElement(len(self.id)).rep(1) + self.id + self.key
+
+    def computeSignature(self, secretKeyMessage):
+        """
+        Compute self signature
+        """
+        key = keyPacket(secretKeyMessage)
+        self.signature = crypto.ed25519Sign(key.ed25519Secret, self.hashdata())
+
+    def isValid(self, keyMessage=None):
+        """
+        Verify the self signature. If a key is given, it has to be the key of
+        the nym.
+        """
+        if (keyMessage is not None and
+            keyPacket(keyMessage).ed25519Public != self.key):
+            return False
+        return crypto.ed25519Verify(self.key, self.hashdata(), self.signature)
+
+    def verifySelfSignature(self):
+        return self.isValid()
+
+    def rep(self):
+        data = (ScalarElement(len(self.id)).rep(1) + self.id + self.key +
+                self.signature)
+        return Packet.createHeader(self.TAG, len(data)) + data
+
+# ------------------------------------------------------------------------------
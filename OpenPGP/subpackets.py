@@ -20,6 +20,12 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from elements import *
 
+# Notation names of the exponent slots of a batch signing CA, see
+# blindca.BlindCA.signBatch. The CA key lists its slots, a signature names the
+# slot it verifies with.
+NOTATION_BATCH_EXPONENTS = 'batch-exponents@blindca'
+NOTATION_EXPONENT = 'exponent@blindca'
+
 # ------------------------------------------------------------------------------
 
 class SignatureSubpackets:
@@ -61,6 +67,8 @@ class SignatureSubpackets:
                 subpacket = SymmetricAlgorithmsSubpacket(subBody)
             elif subType == IssuerSubpacket.TAG:
                 subpacket = IssuerSubpacket(subBody)
+            elif subType == NotationDataSubpacket.TAG:
+                subpacket = NotationDataSubpacket(subBody)
             elif subType == HashAlgorithmsSubpacket.TAG:
                 subpacket = HashAlgorithmsSubpacket(subBody)
             elif subType == CompressionAlgorithmsSubpacket.TAG:
@@ -85,6 +93,36 @@ class SignatureSubpackets:
                 return subpacket
         return None
 
+    def set(self, subpacket):
+        """
+        Replace the subpacket of the same type, or add it if there is none.
+        """
+        for i, p in enumerate(self.packets):
+            if p.TAG == subpacket.TAG:
+                self.packets[i] = subpacket
+                return
+        self.add(subpacket)
+
+    def notation(self, name):
+        """
+        The value of the notation called name, None if there is none.
+        """
+        for p in self.packets:
+            if p.TAG == NotationDataSubpacket.TAG and p.name == name:
+                return p.value
+        return None
+
+    def setNotation(self, name, value):
+        """
+        Replace the notation called name, or add it if there is none.
+        """
+        subpacket = NotationDataSubpacket.fromNotation(name, value)
+        for i, p in enumerate(self.packets):
+            if p.TAG == NotationDataSubpacket.TAG and p.name == name:
+                self.packets[i] = subpacket
+                return
+        self.add(subpacket)
+
 
     def rep(self):
         data = ''
@@ -187,6 +225,46 @@ class IssuerSubpacket(SignatureSubpacket):
                 self.keyid.rep())
 
 # ------------------------------------------------------------------------------
+
+class NotationDataSubpacket(SignatureSubpacket):
+    """
+    Notation Data, a name and a value.
+    """
+
+    TAG = 20
+    HUMAN_READABLE = 0x80
+
+    def __init__(self, d):
+        if len(d) < 8:
+            raise Exception('invalid notation data')
+        self.flags = d[0:4]
+        nameLen = ScalarElement(d[4:6]).value
+        valueLen = ScalarElement(d[6:8]).value
+        if len(d) != 8 + nameLen + valueLen:
+            raise Exception('invalid notation data')
+        self.name = d[8:8 + nameLen]
+        self.value = d[8 + nameLen:]
+
+    @classmethod
+    def fromNotation(self, name, value):
+        """
+        Create a human-readable notation.
+        """
+        return NotationDataSubpacket(chr(self.HUMAN_READABLE) + '\x00' * 3 +
+                                     ScalarElement(len(name)).rep(2) +
+                                     ScalarElement(len(value)).rep(2) +
+                                     name + value)
+
+    def __str__(self, indent=0):
+        return 'notation data (tag %d): %s=%s' % (self.TAG, self.name,
+                                                  self.value)
+
+    def rep(self):
+        d = (self.flags + ScalarElement(len(self.name)).rep(2) +
+             ScalarElement(len(self.value)).rep(2) + self.name + self.value)
+        return self.createHeader(self.TAG, len(d) + 1) + d
+
+# ------------------------------------------------------------------------------
     
 class HashAlgorithmsSubpacket(SignatureSubpacket):
     """
@@ -200,6 +278,9 @@ class HashAlgorithmsSubpacket(SignatureSubpacket):
         
     def __str__(self, indent=0):
         return 'preferred hash algorithms (tag %d): %s' % (self.TAG, self.d.encode('hex'))
+
+    def algorithms(self):
+        return tuple([ord(c) for c in self.d])
     
     def rep(self):
         return self.createHeader(self.TAG, len(self.d) + 1) + self.d
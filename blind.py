@@ -23,24 +23,47 @@ import sys
 
 from OpenPGP import *
 import blinding
+import crypto
 
-if len(sys.argv) != 3 and len(sys.argv) != 4:
-    print >>sys.stderr, 'usage: blind.py <RANDOMFILE> <PUBKEYFILE> [<TIME>]'
+args = sys.argv[1:]
+hashAlgorithm = None
+exponent = None
+while len(args) > 1 and args[0] in ('--hash', '--slot'):
+    if args[0] == '--hash':
+        hashAlgorithm = crypto.hashAlgorithmFromName(args[1])
+    else:
+        exponent = int(args[1])
+    args = args[2:]
+if len(args) != 2 and len(args) != 3:
+    print >>sys.stderr, ('usage: blind.py [--hash <ALGORITHM>] '
+                         '[--slot <EXPONENT>] <RANDOMFILE> <PUBKEYFILE> '
+                         '[<TIME>]')
     sys.exit(2)
 
-publicKey  = messages.fromRadix64(open(sys.argv[2], 'r').read())
+publicKey  = messages.fromRadix64(open(args[1], 'r').read())
+if exponent is not None and not exponent in publicKey.batchExponents():
+    print >>sys.stderr, ('%s: the key has no exponent slot %d' %
+                         (sys.argv[0], exponent))
+    sys.exit(1)
 message = sys.stdin.read()
-if len(sys.argv) == 4:
-    sigTime = elements.TimeElement(int(sys.argv[3]))
+if len(args) == 3:
+    sigTime = elements.TimeElement(int(args[2]))
 else:
     sigTime = None
+if hashAlgorithm is None:
+    hashAlgorithm = blinding.hashPolicy(publicKey)[0]
 
-r, hashtwo, sigTime, blinded = blinding.blind(publicKey, sigTime, message)
+r, hashtwo, sigTime, blinded = blinding.blind(publicKey, sigTime, message,
+                                              exponent,
+                                              hashAlgorithm=hashAlgorithm)
 
-randfile = open(sys.argv[1], 'w')
+randfile = open(args[0], 'w')
 randfile.write(elements.ScalarElement(r).rep().encode('hex') + '\n')
 randfile.write(hashtwo.encode('hex') + '\n')
 randfile.write('%d\n' % sigTime.value)
+randfile.write('%d\n' % hashAlgorithm)
+if exponent is not None:
+    randfile.write('%d\n' % exponent)
 randfile.close()
 
 #print >>sys.stderr, blinded
@@ -19,13 +19,77 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 from OpenPGP import *
+import blinding
 import crypto
+import threading
+import Queue
+import time
 
 class Config:
     def __init__(self):
         self.secretKey = None
         self.publicKey = None
         self.passwordCallback = None
+        self.batchExponents = ()
+        self.hashAlgorithms = None
+        self.blindingPool = 0
+
+class BaseBlindingPool(threading.Thread):
+    """
+    Keeps base blinding pairs (v, v^-e mod n) for the private key operations
+    of the CA ready, so that blinding a signature costs two multiplications.
+    A new pair is the square of the previous one, a random pair is drawn
+    again after every RESEED pairs.
+    """
+    RESEED = 32
+
+    def __init__(self, key, depth=4):
+        """
+        @param key: The private key of the CA.
+        @type key: RSAPrivateContext
+        @param depth: Number of pairs to keep ready.
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.e = key.e
+        self.n = key.n
+        self.pairs = Queue.Queue(depth)
+        self.running = True
+
+    def compute(self):
+        """
+        Draw a new random pair.
+        """
+        return crypto.rsaBaseBlindingPair(self.e, self.n)
+
+    def get(self):
+        """
+        Take a pair from the pool. If the pool is empty the pair is computed
+        by the caller.
+        """
+        try:
+            return self.pairs.get_nowait()
+        except Queue.Empty:
+            return self.compute()
+
+    def run(self):
+        count = 0
+        v, vInverseE = self.compute()
+        while self.running:
+            while self.running:
+                try:
+                    self.pairs.put((v, vInverseE), timeout=1)
+                    break
+                except Queue.Full:
+                    pass
+            count += 1
+            if count % self.RESEED == 0:
+                v, vInverseE = self.compute()
+            else:
+                v, vInverseE = v * v % self.n, vInverseE * vInverseE % self.n
+
+    def shutdown(self):
+        self.running = False
 
 class BlindCA:
     """
@@ -45,21 +109,197 @@ class BlindCA:
             raise Exception('invalid configuration')
         self.secretKey = messages.fromRadix64(open(config.secretKey, 'r').read(),
                                               config.passwordCallback)
+        self.key = RSAPrivateContext(self.secretKey)
         if config.publicKey is not None:
             self.publicKey = messages.fromRadix64(open(config.publicKey).read())
+        if config.hashAlgorithms is None:
+            self.hashAlgorithms = blinding.hashPolicy(self.secretKey)
+        else:
+            self.hashAlgorithms = tuple(config.hashAlgorithms)
+            if len(self.hashAlgorithms) == 0:
+                raise Exception('empty hash policy')
+            for algorithm in self.hashAlgorithms:
+                if not algorithm in blinding.POLICY_HASHES:
+                    raise Exception('invalid hash algorithm %d' % algorithm)
+            # clients learn the policy from the published key
+            if (config.publicKey is not None and
+                self.publicKey.hashAlgorithms() != self.hashAlgorithms):
+                self.publicKey.setHashAlgorithms(self.hashAlgorithms,
+                                                 self.key)
+        self.pool = BaseBlindingPool(self.key, max(config.blindingPool, 1))
+        if config.blindingPool > 0:
+            self.pool.start()
+        self.batchExponents = tuple(config.batchExponents)
+        phi = crypto.rsaPhi(self.key.crt)
+        for i, e in enumerate(self.batchExponents):
+            if e < 3 or crypto.gcd(e, phi) != 1:
+                raise Exception('invalid batch exponent %d' % e)
+            for other in self.batchExponents[:i]:
+                if crypto.gcd(e, other) != 1:
+                    raise Exception('invalid batch exponent %d' % e)
+        # verifiers accept a slot only if the published key lists it
+        if (config.publicKey is not None and
+            self.publicKey.batchExponents() != self.batchExponents):
+            self.publicKey.setBatchExponents(self.batchExponents, self.key)
+
+    def shutdown(self):
+        """
+        Stop precomputing base blinding pairs.
+        """
+        self.pool.shutdown()
+        if self.pool.isAlive():
+            self.pool.join()
+
+    def _signatureMessage(self, s):
+        packet = packets.BlindSignaturePacket()
+        packet.s = elements.MPIElement(s)
+        return messages.BlindSignatureMessage().fromPackets((packet,))
 
     def sign(self, bm):
         """
-        Create the signature.
+        Create the signature. The message is base blinded with a pair from
+        the pool before the private key operation.
         
         @param bm: The message to be signed.
         @type bm: openpgp.BlindMessageMessage.
         @return: The signature as a BlindSigntureMessage.
         """
-        packet = packets.BlindSignaturePacket()
-        packet.s = elements.MPIElement(crypto.rsaSign(
-            bm.packets[TAG_BLINDMSG].m.value,
-            self.secretKey.packets[TAG_SECKEY].d.value,
-            self.secretKey.packets[TAG_SECKEY].n.value))
-        message = messages.BlindSignatureMessage().fromPackets((packet,))
-        return message
+        return self._signatureMessage(crypto.rsaSignBlinded(
+                bm.packets[TAG_BLINDMSG].m.value, self.key.crt, self.key.e,
+                self.key.n, self.pool.get()))
+
+    def signBatch(self, blindMessages):
+        """
+        Sign several blinded messages using Fiat's batch RSA. Each message is
+        signed for the exponent slot it was blinded with (see blinding.blind),
+        messages for distinct slots share a single private key operation,
+        which is base blinded like sign() (see crypto.rsaBatchSign).
+        The slots are published with the public key of the CA and each
+        signature names its slot, so verifySignature accepts it. Other OpenPGP
+        implementations verify with the exponent of the key and reject slot
+        signatures.
+
+        @param blindMessages: List of (exponent, BlindMessageMessage), each
+        exponent one of Config.batchExponents.
+        @return: List of BlindSignatureMessage in the order of blindMessages.
+        """
+        result = [None] * len(blindMessages)
+        pending = range(0, len(blindMessages))
+        while len(pending) > 0:
+            batch = []
+            rest = []
+            used = set()
+            for i in pending:
+                e = blindMessages[i][0]
+                if e not in self.batchExponents:
+                    raise Exception('invalid exponent slot %d' % e)
+                if e in used:
+                    rest.append(i)
+                else:
+                    used.add(e)
+                    batch.append(i)
+            sigs = crypto.rsaBatchSign(
+                [blindMessages[i][1].packets[TAG_BLINDMSG].m.value
+                 for i in batch],
+                [blindMessages[i][0] for i in batch],
+                self.key.crt, self.key.n)
+            for i, s in zip(batch, sigs):
+                result[i] = self._signatureMessage(s)
+            pending = rest
+        return result
+
+class _BatchRequest:
+    def __init__(self, exponent, bm):
+        self.exponent = exponent
+        self.message = bm
+        self.done = threading.Event()
+        self.signature = None
+        self.error = None
+
+class BatchSigner(threading.Thread):
+    """
+    Collects the requests of concurrent clients for the exponent slots of a
+    BlindCA and signs them together with BlindCA.signBatch. A batch is signed
+    when it has a message for every slot, or window seconds after its first
+    message arrived.
+    """
+
+    def __init__(self, ca, window=0.05):
+        """
+        @param ca: A BlindCA with Config.batchExponents.
+        @param window: Seconds to wait for messages for the other slots.
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.ca = ca
+        self.window = window
+        self.requests = Queue.Queue()
+        self.running = True
+
+    def sign(self, exponent, bm):
+        """
+        Queue a message and wait until its batch is signed.
+
+        @param exponent: The exponent slot the message was blinded with.
+        @param bm: The message to be signed.
+        @type bm: openpgp.BlindMessageMessage.
+        @return: The signature as a BlindSignatureMessage.
+        """
+        if not self.running:
+            raise Exception('shutdown')
+        if not exponent in self.ca.batchExponents:
+            raise Exception('invalid exponent slot %d' % exponent)
+        if not TAG_BLINDMSG in bm.packets:
+            raise Exception('no blind message')
+        request = _BatchRequest(exponent, bm)
+        self.requests.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise Exception(request.error)
+        return request.signature
+
+    def _collect(self, first):
+        batch = [first]
+        slots = set([first.exponent])
+        deadline = time.time() + self.window
+        while len(slots) < len(self.ca.batchExponents):
+            timeout = deadline - time.time()
+            if timeout <= 0:
+                break
+            try:
+                request = self.requests.get(timeout=timeout)
+            except Queue.Empty:
+                break
+            batch.append(request)
+            slots.add(request.exponent)
+        return batch
+
+    def _finish(self, batch, sigs, error):
+        for i, request in enumerate(batch):
+            if sigs is not None:
+                request.signature = sigs[i]
+            request.error = error
+            request.done.set()
+
+    def run(self):
+        while self.running:
+            try:
+                first = self.requests.get(timeout=1)
+            except Queue.Empty:
+                continue
+            batch = self._collect(first)
+            try:
+                sigs = self.ca.signBatch([(request.exponent, request.message)
+                                          for request in batch])
+            except Exception, e:
+                self._finish(batch, None, 'signature failed: %s' % e)
+                continue
+            self._finish(batch, sigs, None)
+        while True:
+            try:
+                self._finish([self.requests.get_nowait()], None, 'shutdown')
+            except Queue.Empty:
+                break
+
+    def shutdown(self):
+        self.running = False
@@ -21,6 +21,31 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 from OpenPGP import *
 import crypto
 import encoding
+import threading
+import Queue
+
+# Hash algorithms a CA may issue blind signatures with.
+POLICY_HASHES = (crypto.HASH_SHA224, crypto.HASH_SHA256, crypto.HASH_SHA384,
+                 crypto.HASH_SHA512)
+
+# ------------------------------------------------------------------------------
+
+def hashPolicy(publicKey):
+    """
+    The hash algorithms a CA signs with, in order of preference. The policy is
+    taken from the preferred hash algorithms of the CA key, restricted to
+    POLICY_HASHES. Keys without a preference sign with SHA-256.
+
+    @param publicKey: The public key of the CA.
+    @type publicKey: PublicKeyMessage or RSAPublicContext
+    @return: Tuple of hash algorithms, the first one is used for new
+    signatures.
+    """
+    policy = tuple([a for a in publicKey.hashAlgorithms()
+                    if a in POLICY_HASHES])
+    if not policy:
+        return (crypto.HASH_SHA256,)
+    return policy
 
 # ------------------------------------------------------------------------------
 
@@ -30,57 +55,181 @@ def _randomTime(start, end):
 
 # ------------------------------------------------------------------------------
 
-def _prepareSignature(hashAlgorithm, sigTime, sigKeyid):
+def _prepareSignature(hashAlgorithm, sigTime, sigKeyid, exponent=None):
     sigPacket = packets.SignaturePacket()
     sigPacket.pubAlgorithm = elements.ScalarElement(packets.ALGORITHM_RSA)
     sigPacket.hashAlgorithm = elements.ScalarElement(hashAlgorithm)
     sigPacket.hashedSubpackets.add(
         subpackets.CreationTimeSubpacket(sigTime))
+    if exponent is not None:
+        sigPacket.hashedSubpackets.setNotation(subpackets.NOTATION_EXPONENT,
+                                               str(exponent))
     sigPacket.subpackets.add(subpackets.IssuerSubpacket(sigKeyid))
     return sigPacket
 
 # ------------------------------------------------------------------------------
 
-def blind(publicKey, sigTime, data):
-    keyID = publicKey.packets[TAG_PUBKEY].keyID()
-    n = publicKey.packets[TAG_PUBKEY].n
-    e = publicKey.packets[TAG_PUBKEY].e
+def _signatureMessage(key, sigTime, hashTwo, s, hashAlgorithm, exponent):
+    sigPacket = _prepareSignature(hashAlgorithm, sigTime, key.keyID, exponent)
+    sigPacket.hashLeftTwo = hashTwo
+    sigPacket.sig = elements.MPIElement(s)
+    return messages.SignatureMessage().fromPackets((sigPacket,))
+
+# ------------------------------------------------------------------------------
+
+def _context(publicKey, exponent):
+    if exponent is None:
+        return packets.publicContext(publicKey)
+    return packets.publicContext(publicKey).slot(exponent)
+
+# ------------------------------------------------------------------------------
+
+def _blindingFactor(key):
+    while True:
+        r = elements.ScalarElement(crypto.randomBytes(key.octets)).value
+        if (r > 1 and
+            r < key.n and
+            crypto.gcd(key.n, r) == 1):
+            return r
+
+# ------------------------------------------------------------------------------
+
+class BlindingPool(threading.Thread):
+    """
+    Precomputes blinding factors (r, r^e mod n, r^-1 mod n) for one CA key in
+    the background, so that blind() and unblind() cost one multiplication
+    each. The factors are kept in a queue of at most depth entries.
+    """
+    def __init__(self, publicKey, depth=4, exponent=None):
+        """
+        @param publicKey: The public key of the CA.
+        @type publicKey: PublicKeyMessage or RSAPublicContext
+        @param depth: Number of factors to keep ready.
+        @param exponent: The exponent slot to blind for, see blind().
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.key = _context(publicKey, exponent)
+        self.factors = Queue.Queue(depth)
+        self.running = True
 
+    def compute(self):
+        """
+        Compute a new factor (r, r^e mod n, r^-1 mod n).
+        """
+        r = _blindingFactor(self.key)
+        return (r, pow(r, self.key.e, self.key.n),
+                crypto.modInverse(r, self.key.n))
+
+    def get(self):
+        """
+        Take a factor from the pool. If the pool is empty the factor is
+        computed by the caller.
+        """
+        try:
+            return self.factors.get_nowait()
+        except Queue.Empty:
+            return self.compute()
+
+    def run(self):
+        while self.running:
+            factor = self.compute()
+            while self.running:
+                try:
+                    self.factors.put(factor, timeout=1)
+                    break
+                except Queue.Full:
+                    pass
+
+    def shutdown(self):
+        self.running = False
+
+# ------------------------------------------------------------------------------
+
+def blind(publicKey, sigTime, data, exponent=None, factor=None,
+          hashAlgorithm=crypto.HASH_SHA256):
+    """
+    Blind data for a signature by the owner of publicKey.
+
+    @param publicKey: The public key of the CA.
+    @type publicKey: PublicKeyMessage or RSAPublicContext
+    @param sigTime: Signature creation time, None for a random time.
+    @param data: The data to sign.
+    @param exponent: The exponent slot of a batch signing CA to use instead of
+    the public exponent of the key. The slot is named in the signature,
+    verifySignature accepts it if the CA key publishes the slot.
+    @param factor: A precomputed blinding factor from BlindingPool.get(), None
+    to draw a new one.
+    @param hashAlgorithm: Hash algorithm of the signature, usually the first
+    one of hashPolicy(publicKey).
+    """
+    key = _context(publicKey, exponent)
 
     if sigTime is None:
-        sigTime = _randomTime(publicKey.creationTime(),
-                              publicKey.expirationTime())
+        sigTime = _randomTime(key.creationTime(), key.expirationTime())
     
-    sigPacket = _prepareSignature(crypto.HASH_SHA256, sigTime, keyID)
-    sigdata = (data + sigPacket.hashdata())
-    plainhash = crypto.hash(sigdata, sigPacket.hashAlgorithm.value)
-    codedhash = encoding.pkcs15(plainhash, n.bits(),
-                                sigPacket.hashAlgorithm.value)
-    m = elements.ScalarElement(codedhash).value
+    sigPacket = _prepareSignature(hashAlgorithm, sigTime, key.keyID, exponent)
+    h = crypto.hashNew(sigPacket.hashAlgorithm.value, data)
+    h.update(sigPacket.hashdata())
+    plainhash = h.digest()
+    m = encoding.pkcs15Int(plainhash, key.bits,
+                           sigPacket.hashAlgorithm.value)
     
-    while True:
-        r = elements.ScalarElement(crypto.randomBytes(n.octets())).value
-        if (r > 1 and
-            r < n.value and
-            crypto.gcd(n.value, r) == 1):
-            break
-        
     packet = packets.BlindMessagePacket()
-    packet.m = elements.MPIElement(crypto.rsaBlind(m, r, e.value, n.value))
+    if factor is None:
+        r = _blindingFactor(key)
+        packet.m = elements.MPIElement(crypto.rsaBlind(m, r, key.e, key.n))
+    else:
+        r, re, rInverse = factor
+        packet.m = elements.MPIElement(m * re % key.n)
     return r, plainhash[0:2], sigTime, messages.BlindMessageMessage.fromPackets((packet,))
 
 # ------------------------------------------------------------------------------
 
-def unblind(publicKey, sigTime, r, hashTwo, blindsig):
-    keyID = publicKey.packets[TAG_PUBKEY].keyID()
-    n = publicKey.packets[TAG_PUBKEY].n
-    e = publicKey.packets[TAG_PUBKEY].e
+def unblind(publicKey, sigTime, r, hashTwo, blindsig, exponent=None,
+            factor=None, hashAlgorithm=crypto.HASH_SHA256):
+    """
+    Remove the blinding factor r from a blind signature.
+
+    @param publicKey: The public key of the CA.
+    @type publicKey: PublicKeyMessage or RSAPublicContext
+    @param exponent: The exponent slot used with blind().
+    @param factor: The factor from BlindingPool.get() used with blind(), its
+    precomputed inverse replaces the inversion of r.
+    @param hashAlgorithm: The hash algorithm used with blind().
+    """
+    key = _context(publicKey, exponent)
     
     bs = blindsig.packets[TAG_BLINDSIG].s.value
-    s = crypto.rsaUnblind(r, n.value, bs)
-    sigPacket = _prepareSignature(crypto.HASH_SHA256, sigTime, keyID)
-    sigPacket.hashLeftTwo = hashTwo
-    sigPacket.sig = elements.MPIElement(s)
-    return messages.SignatureMessage().fromPackets((sigPacket,))
-        
+    if factor is None:
+        s = crypto.rsaUnblind(r, key.n, bs)
+    else:
+        s = factor[2] * bs % key.n
+    return _signatureMessage(key, sigTime, hashTwo, s, hashAlgorithm, exponent)
+
+# ------------------------------------------------------------------------------
+
+def unblindMany(publicKey, blindings, exponent=None,
+                hashAlgorithm=crypto.HASH_SHA256):
+    """
+    Unblind many blind signatures of the same CA key at once. Only one modular
+    inversion is computed for all blinding factors.
+
+    @param publicKey: The public key of the CA.
+    @type publicKey: PublicKeyMessage or RSAPublicContext
+    @param blindings: List of (sigTime, r, hashTwo, blindsig) as for unblind().
+    @param exponent: The exponent slot used with blind().
+    @param hashAlgorithm: The hash algorithm used with blind().
+    @return: List of SignatureMessage in the order of blindings.
+    """
+    key = _context(publicKey, exponent)
+
+    ss = crypto.rsaUnblindMany(
+        [r for sigTime, r, hashTwo, blindsig in blindings], key.n,
+        [blindsig.packets[TAG_BLINDSIG].s.value
+         for sigTime, r, hashTwo, blindsig in blindings])
+    return [_signatureMessage(key, sigTime, hashTwo, s, hashAlgorithm,
+                              exponent)
+            for (sigTime, r, hashTwo, blindsig), s in zip(blindings, ss)]
+
 # ------------------------------------------------------------------------------
@@ -18,13 +18,31 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
-import Crypto.PublicKey.RSA
-import Crypto.Cipher.CAST
-import Crypto.Cipher.DES3
-import Crypto.Cipher.Blowfish
-import Crypto.Cipher.AES
 import math
 import hashlib
+import binascii
+import multiprocessing
+
+import randomness
+import cryptobackend
+
+try:
+    import gmpy2
+except ImportError:
+    gmpy2 = None
+
+# ------------------------------------------------------------------------------
+
+backend = cryptobackend.load()
+
+def setBackend(name=None):
+    """
+    Select the library for exponentiations, key generation, ciphers and hashes.
+
+    @param name: One of cryptobackend.BACKENDS, None for the default.
+    """
+    global backend
+    backend = cryptobackend.load(name)
 
 # ------------------------------------------------------------------------------
 
@@ -80,19 +98,25 @@ SYMALGORITHM_BLOCKSIZE = {SYMALGORITHM_PLAIN:    0,
 
 def i2b(i, octets=0):
     """
-    Convert an integer to a string of bytes with the given number of octets..
+    Convert an integer to a string of bytes with at least the given number of
+    octets. With octets = 0 the minimal width is used (one octet for 0).
     """
-    b = []
-    value = i
-    while True:
-        b.append(chr(value % 256))
-        value /= 256
-        if octets != 0:
-            octets -= 1
-        if value == 0 and octets == 0:
-            break
-    b.reverse()
-    return ''.join(b)
+    h = '%x' % i
+    b = binascii.unhexlify('0' * (len(h) & 1) + h)
+    if len(b) < octets:
+        b = '\x00' * (octets - len(b)) + b
+    return b
+
+# ------------------------------------------------------------------------------
+
+def i2bFixed(i, octets):
+    """
+    Convert an integer to a string of exactly octets bytes (I2OSP).
+    """
+    b = i2b(i, octets)
+    if len(b) != octets:
+        raise Exception('integer too large')
+    return b
 
 # ------------------------------------------------------------------------------
 
@@ -100,12 +124,9 @@ def b2i(b):
     """
     Convert an string of bytes to an integer.
     """
-    value = 0
-    lenb = len(b)
-    for i in range(0, lenb):
-        shift = (lenb - i - 1) * 8
-        value += ord(b[i]) << shift
-    return value
+    if len(b) == 0:
+        return 0
+    return int(binascii.hexlify(b), 16)
 
 # ------------------------------------------------------------------------------
 
@@ -139,28 +160,50 @@ def hash_sha224(m):
 
 # ------------------------------------------------------------------------------
 
-def hash(data, algorithm):
-    if algorithm == HASH_MD5:
-        return hash_md5(data)
-    elif algorithm == HASH_SHA1:
-        return hash_sha1(data)
-    elif algorithm == HASH_RIPEMD:
-        raise Exception('not implemented')
-    elif algorithm == HASH_SHA256:
-        return hash_sha256(data)
-    elif algorithm == HASH_SHA384:
-        return hash_sha384(data)
-    elif algorithm == HASH_SHA512:
-        return hash_sha512(data)
-    elif algorithm == HASH_SHA224:
-        return hash_sha224(data)
-    else:
+HASH_NAME = {HASH_MD5:    'md5',
+             HASH_SHA1:   'sha1',
+             HASH_RIPEMD: 'ripemd160',
+             HASH_SHA256: 'sha256',
+             HASH_SHA384: 'sha384',
+             HASH_SHA512: 'sha512',
+             HASH_SHA224: 'sha224'}
+
+# ------------------------------------------------------------------------------
+
+def hashAlgorithmFromName(name):
+    """
+    The hash algorithm for a name like 'SHA512', 'sha-512' or 'RIPEMD160', for
+    configuration files and command lines.
+    """
+    name = name.strip().lower().replace('-', '')
+    for algorithm in HASH_NAME:
+        if HASH_NAME[algorithm] == name:
+            return algorithm
+    raise Exception('invalid hash algorithm %s' % name)
+
+# ------------------------------------------------------------------------------
+
+def hashNew(algorithm, data=''):
+    """
+    Create a context for incremental hashing. It has the methods of the
+    hashlib objects: update(), copy() and digest().
+
+    @param algorithm: Hash algorithm.
+    @param data: Data to hash first.
+    """
+    if not algorithm in HASH_NAME:
         raise Exception('invalid hash algorithm')
+    return backend.hashNew(HASH_NAME[algorithm], data)
+
+# ------------------------------------------------------------------------------
+
+def hash(data, algorithm):
+    return hashNew(algorithm, data).digest()
 
 # ------------------------------------------------------------------------------
 
 def rsaBlind(m, r, e, n):
-    return m * pow(r, e, n)
+    return m * backend.modExp(r, e, n)
 
 # ------------------------------------------------------------------------------
 
@@ -169,40 +212,475 @@ def rsaUnblind(r, n, s):
 
 # ------------------------------------------------------------------------------
 
+def rsaUnblindMany(rs, n, ss):
+    """
+    rsaUnblind for many signatures with a single modular inversion.
+    """
+    n = _integer(n)
+    return [int(r * s % n) for r, s in zip(_modInverseMany(rs, n), ss)]
+
+# ------------------------------------------------------------------------------
+
 def rsaSign(m, d, n):
-    return pow(m, d, n)
+    return backend.modExp(m, d, n)
 
 # ------------------------------------------------------------------------------
 
 def rsaVerify(sig, m, e, n):
-    return pow(sig, e, n) == m
+    return backend.modExp(sig, e, n) == m
+
+# ------------------------------------------------------------------------------
+
+def multiExp(bases, exponents, n, bits):
+    """
+    Compute the product of b_i^x_i mod n for exponents x_i < 2^bits with
+    Pippenger's bucket method. This needs about bits / w * (len(bases) + 2^w)
+    multiplications instead of bits per base.
+    """
+    w = 1
+    while w < 16 and 2 ** (w + 2) < len(bases):
+        w += 1
+    mask = 2 ** w - 1
+    result = 1
+    for shift in range((bits - 1) / w * w, -1, -w):
+        result = pow(result, 2 ** w, n)
+        buckets = [1] * (mask + 1)
+        for b, x in zip(bases, exponents):
+            digit = (x >> shift) & mask
+            if digit != 0:
+                buckets[digit] = buckets[digit] * b % n
+        running = 1
+        for digit in range(mask, 0, -1):
+            running = running * buckets[digit] % n
+            result = result * running % n
+    return result
+
+# ------------------------------------------------------------------------------
+
+def _screen(sigs, ms, indices, e, n, bits, valid):
+    if len(indices) == 1:
+        i = indices[0]
+        valid[i] = rsaVerify(sigs[i], ms[i], e, n)
+        return
+    octets = bits / 8
+    rand = randomBytes(octets * len(indices))
+    t = [b2i(rand[j * octets:(j + 1) * octets]) for j in range(0, len(indices))]
+    S = multiExp([sigs[i] for i in indices], t, n, bits)
+    M = multiExp([ms[i] for i in indices], t, n, bits)
+    if backend.modExp(S, e, n) == M:
+        for i in indices:
+            valid[i] = True
+        return
+    half = len(indices) / 2
+    _screen(sigs, ms, indices[:half], e, n, bits, valid)
+    _screen(sigs, ms, indices[half:], e, n, bits, valid)
+
+# ------------------------------------------------------------------------------
+
+def rsaBatchScreen(sigs, ms, e, n, bits=32):
+    """
+    Screen many RSA signatures of the same key at once with the small
+    exponents test: prod(s_i^t_i)^e == prod(m_i^t_i) mod n for random t_i.
+    If the test fails, the batch is split in halves to find the invalid
+    signatures.
+    Screening is not verification. It shows that every message has been
+    signed, but a signature replaced by n - s passes with a probability of
+    1/2, (n - s)^e = -m mod n. Other invalid signatures pass with a
+    probability of about 2^-bits. Use rsaVerify where a signature itself has
+    to be valid.
+
+    @param sigs: The signatures s_i.
+    @param ms: The expected values m_i.
+    @param bits: Size of the random exponents, a multiple of 8.
+    @return: List of booleans.
+    """
+    valid = [False] * len(sigs)
+    if len(sigs) > 0:
+        _screen(sigs, ms, range(0, len(sigs)), e, n, bits, valid)
+    return valid
 
 # ------------------------------------------------------------------------------
 
 def rsaEncrypt(m, e, n):
-    return pow(m, e, n)
+    return backend.modExp(m, e, n)
 
 # ------------------------------------------------------------------------------
 
 def rsaDecrypt(m, d, n):
-    return pow(m, d, n)
+    return backend.modExp(m, d, n)
+
+# ------------------------------------------------------------------------------
+
+def rsaCrtParameters(d, p, q, u, primes=()):
+    """
+    Precompute the parameters for private key operations using the chinese
+    remainder theorem.
+    u is the inverse of p modulo q as stored in OpenPGP secret keys. primes
+    are the additional prime factors of a multi-prime key (RFC 8017).
+    return (p, q, dP, dQ, u, ((r_i, d_i, t_i), ...))
+    """
+    others = []
+    R = p * q
+    for r in primes:
+        others.append((r, d % (r - 1), modInverse(R % r, r)))
+        R *= r
+    return (p, q, d % (p - 1), d % (q - 1), u, tuple(others))
+
+# ------------------------------------------------------------------------------
+
+def rsaSignCrt(m, crt, e, n):
+    """
+    Compute m^d mod n with one exponentiation per prime factor of n (Garner's
+    formula).
+    The result is checked with the public exponent e to detect faults in the
+    computation, which would otherwise leak the factorization of n.
+
+    @param m: The integer to sign.
+    @param crt: Parameters returned by rsaCrtParameters.
+    @param e: Public exponent.
+    @param n: Public modulus.
+    """
+    s = backend.signCrt(m, crt)
+    if backend.modExp(s, e, n) != m % n:
+        raise Exception('rsa crt fault')
+    return s
+
+# ------------------------------------------------------------------------------
+
+def rsaDecryptCrt(m, crt, e, n):
+    return rsaSignCrt(m, crt, e, n)
+
+# ------------------------------------------------------------------------------
+
+def rsaBaseBlindingPair(e, n):
+    """
+    A base blinding pair (v, v^-e mod n) for a random v. Squaring both values
+    gives the next pair.
+
+    @param e: Public exponent.
+    @param n: Public modulus.
+    """
+    while True:
+        v = randomInt(n - 1)
+        if v > 1 and gcd(v, n) == 1:
+            return v, modInverse(backend.modExp(v, e, n), n)
+
+# ------------------------------------------------------------------------------
+
+def rsaSignBlinded(m, crt, e, n, pair):
+    """
+    Compute m^d mod n like rsaSignCrt, but exponentiate m * v^-e instead of m,
+    so the timing of the private key operation does not depend on m.
+    (m * v^-e)^d * v = m^d.
+
+    @param pair: A base blinding pair from rsaBaseBlindingPair, it must not
+    be used twice.
+    """
+    v, vInverseE = pair
+    return rsaSignCrt(m * vInverseE % n, crt, e, n) * v % n
+
+# ------------------------------------------------------------------------------
+
+def rsaPhi(crt):
+    """
+    Euler's totient of the modulus given by the CRT parameters of a key.
+    """
+    p, q, dP, dQ, u, others = crt
+    phi = (p - 1) * (q - 1)
+    for r, dR, tR in others:
+        phi *= r - 1
+    return phi
+
+# ------------------------------------------------------------------------------
+
+def _batchTree(ms, es, n):
+    """
+    Build the product tree for rsaBatchSign.
+    A node is (e, v, left, right) with v = m^(e / e_m) for all messages m in
+    the subtree, so v^(1/e) is the product of the signatures of the subtree.
+    """
+    if len(ms) == 1:
+        return (es[0], ms[0] % n, None, None)
+    half = len(ms) / 2
+    left = _batchTree(ms[:half], es[:half], n)
+    right = _batchTree(ms[half:], es[half:], n)
+    return (left[0] * right[0],
+            pow(left[1], right[0], n) * pow(right[1], left[0], n) % n,
+            left, right)
 
 # ------------------------------------------------------------------------------
 
-def rsaGenerate(bits):
+def _batchSplit(node, s, n, sigs):
+    """
+    Split the signature s of a node of the product tree into the signatures
+    of its leaves.
+    """
+    e, v, left, right = node
+    if left is None:
+        sigs.append(s)
+        return
+    eL, vL = left[0], left[1]
+    eR, vR = right[0], right[1]
+    X = eL * modInverse(eL % eR, eR)          # X = 0 mod eL, X = 1 mod eR
+    sR = (pow(s, X, n) *
+          modInverse(pow(vL, X / eL, n) * pow(vR, (X - 1) / eR, n) % n, n) % n)
+    sL = s * modInverse(sR, n) % n
+    _batchSplit(left, sL, n, sigs)
+    _batchSplit(right, sR, n, sigs)
+
+# ------------------------------------------------------------------------------
+
+def rsaBatchSign(ms, es, crt, n):
+    """
+    Fiat's batch RSA. Compute m_i^(1/e_i) mod n for all messages with a single
+    full size exponentiation. The root of the product tree is base blinded
+    with a fresh pair for E = prod(e_i) (see rsaSignBlinded), so the
+    exponentiation does not see values derived from the messages alone.
+
+    @param ms: The integers to sign.
+    @param es: The public exponent for each message. The exponents must be
+    pairwise coprime and coprime to phi(n).
+    @param crt: CRT parameters of the key as returned by rsaCrtParameters.
+    @param n: Public modulus.
+    @return: The list of signatures in the order of ms.
+    """
+    if len(ms) == 0:
+        return []
+    p, q, dP, dQ, u, others = crt
+    tree = _batchTree(ms, es, n)
+    E = tree[0]
+    dE = modInverse(E, rsaPhi(crt))
+    root = rsaSignBlinded(tree[1],
+                          rsaCrtParameters(dE, p, q, u,
+                                           [r for r, dR, tR in others]),
+                          E, n, rsaBaseBlindingPair(E, n))
+    sigs = []
+    _batchSplit(tree, root, n, sigs)
+    return sigs
+
+# ------------------------------------------------------------------------------
+
+def rsaGenerate(bits, e=65537):
     """
     returns n, e, d, p, q, u
     """
-    key = Crypto.PublicKey.RSA.generate(bits, randomBytes)
-    return (key.n, key.e, key.d, key.p, key.q, key.u)
+    return backend.generate(bits, e, randomBytes)
+
+# ------------------------------------------------------------------------------
+
+def rsaGenerateMultiPrime(bits, primes=3, e=65537, exponents=()):
+    """
+    Generate a RSA key with a modulus of the given number of prime factors.
+    exponents are additional public exponents the key must be usable with,
+    e.g. for batch signatures.
+    returns n, e, d, p, q, u, (r_3, ...)
+    """
+    return rsaGenerateParallel(bits, primes, e, exponents, processes=1)
+
+# ------------------------------------------------------------------------------
+
+def _rsaKey(factors, e):
+    factors = sorted(factors)
+    n = 1
+    phi = 1
+    for r in factors:
+        n *= r
+        phi *= r - 1
+    d = modInverse(e, phi)
+    p, q = factors[0], factors[1]
+    return (n, e, d, p, q, modInverse(p, q), tuple(factors[2:]))
+
+# ------------------------------------------------------------------------------
+
+SIEVE_PRIMES = [q for q in range(3, 2048)
+                if all(q % x != 0 for x in range(2, int(q ** 0.5) + 1))]
+
+PRIME_WINDOW = 128
+
+# ------------------------------------------------------------------------------
+
+def _millerRabinRounds(bits):
+    """
+    Rounds for an error probability below 2^-80 for random candidates
+    (Handbook of Applied Cryptography, table 4.4).
+    """
+    for size, rounds in ((1300, 2), (850, 3), (650, 4), (550, 5), (450, 6),
+                         (400, 7), (350, 8), (300, 9), (250, 12), (200, 15),
+                         (150, 18), (100, 27)):
+        if bits >= size:
+            return rounds
+    return 40
+
+# ------------------------------------------------------------------------------
+
+def _isProbablePrime(n, rounds):
+    """
+    Miller-Rabin test. The bases are derived from n by hashing, so the test
+    gives the same answer in every process.
+    """
+    r = n - 1
+    s = 0
+    while r & 1 == 0:
+        r >>= 1
+        s += 1
+    octets = (n.bit_length() + 7) / 8
+    for i in range(0, rounds):
+        a = b2i(hash_sha256(i2b(n) + i2b(i, 4)) * (octets / 32 + 1)) % (n - 3) + 2
+        y = backend.modExp(a, r, n)
+        if y == 1 or y == n - 1:
+            continue
+        for j in range(1, s):
+            y = y * y % n
+            if y == n - 1:
+                break
+        else:
+            return False
+    return True
+
+# ------------------------------------------------------------------------------
+
+def _searchPrime(task):
+    """
+    Search the window of PRIME_WINDOW odd numbers from start for the smallest
+    prime r with gcd(x, r - 1) = 1 for all exponents x. Runs in the worker
+    processes of rsaGenerateParallel.
+    return r or None
+    """
+    start, exponents = task
+    candidate = bytearray('\x01' * PRIME_WINDOW)
+    for q in SIEVE_PRIMES:
+        # start + 2 i = 0 mod q  <=>  i = -start / 2 mod q
+        i = -start * ((q + 1) / 2) % q
+        candidate[i::q] = '\x00' * len(candidate[i::q])
+    rounds = _millerRabinRounds(start.bit_length())
+    for i in range(0, PRIME_WINDOW):
+        r = start + 2 * i
+        # the backend's test only serves to drop composites fast, the result
+        # is decided by _isProbablePrime
+        if (candidate[i] and
+            backend.isPrime(r, randomBytes) and
+            _isProbablePrime(r, rounds)):
+            for x in exponents:
+                if gcd(x, r - 1) != 1:
+                    break
+            else:
+                return r
+    return None
+
+# ------------------------------------------------------------------------------
+
+def _seededBytes(seed, index, n):
+    out = ''
+    block = 0
+    while len(out) < n:
+        out += hash_sha256(seed + i2b(index, 8) + i2b(block, 4))
+        block += 1
+    return out[:n]
+
+# ------------------------------------------------------------------------------
+
+def rsaGenerateParallel(bits, primes=2, e=65537, exponents=(), processes=None,
+                        seed=None):
+    """
+    Generate a RSA key like rsaGenerateMultiPrime, with the prime search
+    spread over a pool of processes. Each task sieves a window of candidates
+    by the small primes and runs Miller-Rabin on the remaining ones. Of every
+    round of tasks the first window containing a prime wins, so the result
+    only depends on the candidates and not on the number of processes.
+
+    @param processes: Number of worker processes, None for one per CPU.
+    @param seed: Derive all candidates from this string instead of the random
+    source. Only meant for test vectors.
+    returns n, e, d, p, q, u, (r_3, ...)
+    """
+    if primes < 2 or bits / primes < 256:
+        raise Exception('invalid number of primes')
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    pool = None
+    mapper = map
+    if processes > 1:
+        pool = multiprocessing.Pool(processes)
+        mapper = pool.map
+    try:
+        window = [0]
+        def findPrime(size):
+            while True:
+                tasks = []
+                for i in range(0, processes):
+                    if seed is None:
+                        b = randomBytes((size + 7) / 8)
+                    else:
+                        b = _seededBytes(seed, window[0], (size + 7) / 8)
+                    window[0] += 1
+                    start = b2i(b) >> (len(b) * 8 - size)
+                    start |= (3 << (size - 2)) | 1
+                    tasks.append((start, (e,) + tuple(exponents)))
+                for i, r in enumerate(mapper(_searchPrime, tasks)):
+                    if r is not None and r.bit_length() == size:
+                        window[0] += i + 1 - len(tasks)
+                        return r
+        while True:
+            factors = []
+            for i in range(0, primes):
+                if i < primes - 1:
+                    size = bits / primes
+                else:
+                    size = bits - (primes - 1) * (bits / primes)
+                r = findPrime(size)
+                while r in factors:
+                    r = findPrime(size)
+                factors.append(r)
+            n = 1
+            for r in factors:
+                n *= r
+            if n.bit_length() == bits:
+                break
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return _rsaKey(factors, e)
+
+# ------------------------------------------------------------------------------
+
+def ed25519Supported():
+    """
+    Whether the backend can create Ed25519 keys and signatures.
+    """
+    return backend.ed25519Supported()
+
+# ------------------------------------------------------------------------------
+
+def ed25519Generate():
+    """
+    returns secret, public
+    """
+    if not ed25519Supported():
+        raise Exception('Ed25519 needs a native implementation, the %s '
+                        'backend has none' % backend.NAME)
+    secret = randomBytes(32)
+    return secret, backend.ed25519PublicKey(secret)
+
+# ------------------------------------------------------------------------------
+
+def ed25519Sign(secret, m):
+    return backend.ed25519Sign(secret, m)
+
+# ------------------------------------------------------------------------------
+
+def ed25519Verify(public, m, signature):
+    return backend.ed25519Verify(public, m, signature)
 
 # ------------------------------------------------------------------------------
 
 def gcd(a, b):
     """
     Use the euclidian algorithm to compute the greatest common divisor of two
-    integers != 0.
+    integers != 0. gmpy2 is used if it is installed.
     """
+    if gmpy2 is not None:
+        return int(gmpy2.gcd(a, b))
     while b != 0:
         a, b = b, a % b
     return a
@@ -228,9 +706,14 @@ def extEuclid(u, v):
 def modInverse(u, v):
     """
     The inverse of u modulo v is calculated using the extended euclidean
-    algorithm.
+    algorithm, by gmpy2 if it is installed.
     return u^-1 mod v
     """
+    if gmpy2 is not None:
+        try:
+            return int(gmpy2.invert(u, v))
+        except ZeroDivisionError:
+            raise Exception('no inverse')
     u1, u3 = 1, u
     v1, v3 = 0, v
     while v3 != 0:
@@ -245,11 +728,50 @@ def modInverse(u, v):
 
 # ------------------------------------------------------------------------------
 
+def _integer(i):
+    """
+    i as gmpy2.mpz if gmpy2 is installed, its products are much faster than
+    those of Python longs.
+    """
+    if gmpy2 is not None:
+        return gmpy2.mpz(i)
+    return i
+
+# ------------------------------------------------------------------------------
+
+def _modInverseMany(us, v):
+    """
+    modInverseMany, the inverses are of the type of v.
+    """
+    if len(us) == 0:
+        return []
+    prefix = [_integer(us[0]) % v]
+    for u in us[1:]:
+        prefix.append(prefix[-1] * u % v)
+    inverse = _integer(modInverse(prefix[-1], v))
+    result = [0] * len(us)
+    for i in range(len(us) - 1, 0, -1):
+        result[i] = inverse * prefix[i - 1] % v
+        inverse = inverse * us[i] % v
+    result[0] = inverse
+    return result
+
+# ------------------------------------------------------------------------------
+
+def modInverseMany(us, v):
+    """
+    Montgomery's simultaneous inversion: the inverses of all us modulo v with
+    one call of modInverse and 3 (len(us) - 1) multiplications. The products
+    are computed by gmpy2 if it is installed, with Python longs they are
+    slower than one native inversion per element.
+    return [u^-1 mod v for u in us]
+    """
+    return [int(u) for u in _modInverseMany(us, _integer(v))]
+
+# ------------------------------------------------------------------------------
+
 def randomBytes(n):
-    r = open('/dev/urandom', 'rb')
-    b = r.read(n)
-    r.close()
-    return b
+    return randomness.read(n)
 
 # ------------------------------------------------------------------------------
 
@@ -262,91 +784,62 @@ def randomInt(max):
 
 # ------------------------------------------------------------------------------
 
+SYMALGORITHM_CIPHER = {SYMALGORITHM_3DES:     '3DES',
+                       SYMALGORITHM_CAST5:    'CAST5',
+                       SYMALGORITHM_BLOWFISH: 'Blowfish',
+                       SYMALGORITHM_AES128:   'AES',
+                       SYMALGORITHM_AES192:   'AES',
+                       SYMALGORITHM_AES256:   'AES'}
+
+# ------------------------------------------------------------------------------
+
+def _symCipher(algorithm):
+    if algorithm in (SYMALGORITHM_IDEA, SYMALGORITHM_TWOFISH):
+        raise Exception('not implemented')
+    if not algorithm in SYMALGORITHM_CIPHER:
+        raise Exception('unknown symmetric algorithm')
+    return SYMALGORITHM_CIPHER[algorithm]
+
+# ------------------------------------------------------------------------------
+
 def symEncrypt(key, plaintext, algorithm):
     if algorithm == SYMALGORITHM_PLAIN:
         return plaintext
-    elif algorithm == SYMALGORITHM_IDEA:
-        raise Exception('not implemented')
-    elif algorithm == SYMALGORITHM_3DES:
-        cipher = Crypto.Cipher.DES3.new(key)
-    elif algorithm == SYMALGORITHM_CAST5:
-        cipher = Crypto.Cipher.CAST.new(key, Crypto.Cipher.CAST.MODE_ECB)
-    elif algorithm ==  SYMALGORITHM_BLOWFISH:
-        cipher = Crypto.Cipher.Blowfish.new(key)
-    elif algorithm == SYMALGORITHM_AES128:
-        cipher = Crypto.Cipher.AES.new(key, Crypto.Cipher.AES.MODE_ECB)
-    elif algorithm == SYMALGORITHM_AES192:
-        cipher = Crypto.Cipher.AES.new(key)
-    elif algorithm == SYMALGORITHM_AES256:
-        cipher = Crypto.Cipher.AES.new(key)
-    elif algorithm == SYMALGORITHM_TWOFISH:
-        raise Exception('not implemented')
-    else:
-        raise Exception('unknown symmetric algorithm')
-    return cipher.encrypt(plaintext)
+    return backend.cipher(_symCipher(algorithm), key).encrypt(plaintext)
 
 # ------------------------------------------------------------------------------
 
 def symDecrypt(key, ciphertext, algorithm):
     if algorithm == SYMALGORITHM_PLAIN:
         return ciphertext
-    elif algorithm == SYMALGORITHM_IDEA:
-        raise Exception('not implemented')
-    elif algorithm == SYMALGORITHM_3DES:
-        cipher = Crypto.Cipher.DES3.new(key, Crypto.Cipher.DES3.MODE_ECB)
-    elif algorithm == SYMALGORITHM_CAST5:
-        cipher = Crypto.Cipher.CAST.new(key, Crypto.Cipher.CAST.MODE_ECB)
-    elif algorithm ==  SYMALGORITHM_BLOWFISH:
-        cipher = Crypto.Cipher.Blowfish.new(key)
-    elif algorithm == SYMALGORITHM_AES128:
-        cipher = Crypto.Cipher.AES.new(key, Crypto.Cipher.AES.MODE_ECB)
-    elif algorithm == SYMALGORITHM_AES192:
-        cipher = Crypto.Cipher.AES.new(key)
-    elif algorithm == SYMALGORITHM_AES256:
-        cipher = Crypto.Cipher.AES.new(key)
-    elif algorithm == SYMALGORITHM_TWOFISH:
-        raise Exception('not implemented')
-    else:
-        raise Exception('unknown symmetric algorithm')
-    return cipher.decrypt(ciphertext)
+    return backend.cipher(_symCipher(algorithm), key).decrypt(ciphertext)
 
 # ------------------------------------------------------------------------------
 
-def encryptCFB(key, plaintext, iv, algorithm):
+def _cfb(key, data, iv, algorithm, decrypt):
+    """
+    OpenPGP CFB without resynchronisation is CFB with full block segments and
+    a short last block. The backend's CFB mode only takes whole segments, so
+    the data is padded and the output cut to the input length, which leaves
+    every real byte unchanged. The key schedule is built once per call.
+    """
+    if algorithm == SYMALGORITHM_PLAIN:
+        return data
     blocksize = SYMALGORITHM_BLOCKSIZE[algorithm]
-    fr = iv
-    block = 0
-    out = ''
-    while block * blocksize < len(plaintext):
-        fre = symEncrypt(key, fr, algorithm)
-        if (block * blocksize) + blocksize > len(plaintext):
-            size = len(plaintext) - (block * blocksize)
-        else:
-            size = blocksize
-        fr = ''
-        for i in range(0, size):
-            fr += chr(ord(fre[i]) ^ ord(plaintext[(block * blocksize) + i]))
-        block += 1
-        out += fr
-    return out
+    engine = backend.cipherCFB(_symCipher(algorithm), key, iv)
+    padded = data + '\x00' * (-len(data) % blocksize)
+    if decrypt:
+        return engine.decrypt(padded)[:len(data)]
+    return engine.encrypt(padded)[:len(data)]
+
+# ------------------------------------------------------------------------------
+
+def encryptCFB(key, plaintext, iv, algorithm):
+    return _cfb(key, plaintext, iv, algorithm, False)
 
 # ------------------------------------------------------------------------------
 
 def decryptCFB(key, ciphertext, iv, algorithm):
-    blocksize = SYMALGORITHM_BLOCKSIZE[algorithm]
-    fr = iv
-    block = 0
-    out = ''
-    while block * blocksize < len(ciphertext):
-        fre = symEncrypt(key, fr, algorithm)
-        if (block * blocksize) + blocksize > len(ciphertext):
-            size = len(ciphertext) - (block * blocksize)
-        else:
-            size = blocksize
-        fr = ciphertext[(block * blocksize):(block * blocksize) + size]
-        for i in range(0, size):
-            out += chr(ord(fre[i]) ^ ord(fr[i]))
-        block += 1
-    return out
+    return _cfb(key, ciphertext, iv, algorithm, True)
 
 # ------------------------------------------------------------------------------
@@ -0,0 +1,421 @@
+__copyright__ = """
+Copyright (C) Timo Engel (timo-e@freenet.de), Berlin 2012.
+This program was written as part of a master thesis advised by 
+Prof. Dr. Ruediger Weis at the Beuth University of Applied 
+Sciences Berlin.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Backends for the primitives crypto.py does not implement itself: modular
+exponentiation, CRT signatures, RSA key generation, Ed25519, block ciphers and
+hashes.
+A backend is chosen with crypto.setBackend() or the environment variable
+CRYPTO_BACKEND, the default is the first available one of BACKEND_ORDER.
+
+Ciphers are named 'AES', 'CAST5', '3DES' and 'Blowfish', hashes by their
+hashlib names.
+"""
+
+import os
+import hashlib
+
+import ed25519
+
+try:
+    import gmpy2
+except ImportError:
+    gmpy2 = None
+
+# Ed25519 of PyCryptodome (3.15 or later), as pycryptodomex or as Crypto
+try:
+    from Cryptodome.PublicKey import ECC
+    from Cryptodome.Signature import eddsa
+except ImportError:
+    try:
+        from Crypto.PublicKey import ECC
+        from Crypto.Signature import eddsa
+    except ImportError:
+        ECC = eddsa = None
+
+BACKEND_ENV = 'CRYPTO_BACKEND'
+
+# ------------------------------------------------------------------------------
+
+class Backend:
+    """
+    The interface with plain Python implementations where one is possible.
+    Subclasses import their library in __init__ and raise ImportError if it is
+    missing.
+    """
+    NAME = None
+
+    def modExp(self, b, e, n):
+        """
+        return b^e mod n
+        """
+        if gmpy2 is not None:
+            return int(gmpy2.powmod(b, e, n))
+        return pow(b, e, n)
+
+    def signCrt(self, m, crt):
+        """
+        Compute m^d mod n with one exponentiation per prime factor (Garner's
+        formula).
+
+        @param crt: Parameters returned by crypto.rsaCrtParameters.
+        """
+        p, q, dP, dQ, u, others = crt
+        s1 = self.modExp(m % p, dP, p)
+        s2 = self.modExp(m % q, dQ, q)
+        s = s1 + ((s2 - s1) * u % q) * p
+        R = p * q
+        for r, dR, tR in others:
+            sR = self.modExp(m % r, dR, r)
+            s += ((sR - s) * tR % r) * R
+            R *= r
+        return s
+
+    def generate(self, bits, e, randfunc):
+        """
+        Generate a two prime RSA key.
+        returns n, e, d, p, q, u with p < q and u = p^-1 mod q
+        """
+        raise Exception('not implemented')
+
+    def isPrime(self, n, randfunc):
+        """
+        A fast test which only has to drop most composites, the caller decides
+        with its own Miller-Rabin test.
+        """
+        return self.modExp(2, n - 1, n) == 1
+
+    def ed25519Supported(self):
+        """
+        Whether Ed25519 keys can be created and used for signing. This needs a
+        native implementation, PyCryptodome's is used if it is installed.
+        Signatures can be verified with every backend.
+        """
+        return eddsa is not None
+
+    def _ed25519Key(self, secret):
+        if not self.ed25519Supported():
+            raise Exception('Ed25519 signing needs a native implementation')
+        return ECC.construct(curve='Ed25519', seed=secret)
+
+    def ed25519PublicKey(self, secret):
+        """
+        return the 32 octet public key of a 32 octet Ed25519 secret key
+        """
+        return self._ed25519Key(secret).public_key().export_key(format='raw')
+
+    def ed25519Sign(self, secret, m):
+        """
+        return the 64 octet Ed25519 signature of m
+        """
+        return eddsa.new(self._ed25519Key(secret), 'rfc8032').sign(m)
+
+    def ed25519Verify(self, public, m, signature):
+        if eddsa is None:
+            return ed25519.verify(public, m, signature)
+        try:
+            key = eddsa.import_public_key(public)
+            eddsa.new(key, 'rfc8032').verify(m, signature)
+            return True
+        except ValueError:
+            return False
+
+    def cipher(self, name, key):
+        """
+        return an object with encrypt() and decrypt() in ECB mode
+        """
+        raise Exception('not implemented')
+
+    def cipherCFB(self, name, key, iv):
+        """
+        return an object with encrypt() and decrypt() in CFB mode with full
+        block segments. The data must be a multiple of the block size.
+        """
+        raise Exception('not implemented')
+
+    def hashNew(self, name, data=''):
+        """
+        return a hash context with update(), copy() and digest()
+        """
+        try:
+            return hashlib.new(name, data)
+        except ValueError:
+            return self._hashNew(name, data)
+
+    def _hashNew(self, name, data):
+        raise Exception('invalid hash algorithm')
+
+# ------------------------------------------------------------------------------
+
+class PyCryptoBackend(Backend):
+    """
+    PyCrypto 2.x. Exponentiations use gmpy2 if installed, else Python.
+    """
+    NAME = 'pycrypto'
+
+    def __init__(self):
+        import Crypto
+        if not Crypto.__version__.startswith('2.'):
+            raise ImportError('Crypto is not PyCrypto')
+        import Crypto.PublicKey.RSA
+        import Crypto.Util.number
+        import Crypto.Cipher.CAST
+        import Crypto.Cipher.DES3
+        import Crypto.Cipher.Blowfish
+        import Crypto.Cipher.AES
+        import Crypto.Hash.RIPEMD
+        self.RSA = Crypto.PublicKey.RSA
+        self.number = Crypto.Util.number
+        self.ciphers = {'AES': Crypto.Cipher.AES,
+                        'CAST5': Crypto.Cipher.CAST,
+                        '3DES': Crypto.Cipher.DES3,
+                        'Blowfish': Crypto.Cipher.Blowfish}
+        self.ripemd = Crypto.Hash.RIPEMD
+
+    def generate(self, bits, e, randfunc):
+        key = self.RSA.generate(bits, randfunc, e=e)
+        return (key.n, key.e, key.d, key.p, key.q, key.u)
+
+    def isPrime(self, n, randfunc):
+        return self.number.isPrime(n, 0.25, randfunc)
+
+    def cipher(self, name, key):
+        module = self.ciphers[name]
+        return module.new(key, module.MODE_ECB)
+
+    def cipherCFB(self, name, key, iv):
+        module = self.ciphers[name]
+        return module.new(key, module.MODE_CFB, iv,
+                          segment_size=module.block_size * 8)
+
+    def _hashNew(self, name, data):
+        if name != 'ripemd160':
+            raise Exception('invalid hash algorithm')
+        return self.ripemd.new(data)
+
+# ------------------------------------------------------------------------------
+
+class PyCryptodomeBackend(PyCryptoBackend):
+    """
+    PyCryptodome, installed as Cryptodome (pycryptodomex) or as a replacement
+    of PyCrypto. Exponentiations use its GMP integers if libgmp was found.
+    """
+    NAME = 'pycryptodome'
+
+    def __init__(self):
+        try:
+            import Cryptodome as package
+            prefix = 'Cryptodome'
+        except ImportError:
+            import Crypto as package
+            prefix = 'Crypto'
+            if package.__version__.startswith('2.'):
+                raise ImportError('Crypto is not PyCryptodome')
+        def load(name):
+            return __import__('%s.%s' % (prefix, name), fromlist=['*'])
+        self.RSA = load('PublicKey.RSA')
+        self.number = load('Util.number')
+        self.ciphers = {'AES': load('Cipher.AES'),
+                        'CAST5': load('Cipher.CAST'),
+                        '3DES': load('Cipher.DES3'),
+                        'Blowfish': load('Cipher.Blowfish')}
+        self.ripemd = load('Hash.RIPEMD160')
+        self.Integer = load('Math.Numbers').Integer
+        if self.Integer.__name__ != 'IntegerGMP':
+            self.Integer = None
+
+    def modExp(self, b, e, n):
+        if self.Integer is None or n < 3:
+            return pow(b, e, n)
+        return int(pow(self.Integer(b % n), e, n))
+
+    def cipherCFB(self, name, key, iv):
+        module = self.ciphers[name]
+        return module.new(key, module.MODE_CFB, iv=iv,
+                          segment_size=module.block_size * 8)
+
+# ------------------------------------------------------------------------------
+
+class _CryptographyEngine:
+    """
+    Adapter from the cryptography contexts to encrypt() and decrypt().
+    """
+    def __init__(self, cipher):
+        self.encryptor = cipher.encryptor()
+        self.decryptor = cipher.decryptor()
+
+    def encrypt(self, data):
+        return self.encryptor.update(data)
+
+    def decrypt(self, data):
+        return self.decryptor.update(data)
+
+# ------------------------------------------------------------------------------
+
+class _CryptographyHash:
+    """
+    Adapter from a cryptography hash context to the hashlib interface.
+    """
+    def __init__(self, context):
+        self.context = context
+
+    def update(self, data):
+        self.context.update(data)
+
+    def copy(self):
+        return _CryptographyHash(self.context.copy())
+
+    def digest(self):
+        return self.context.copy().finalize()
+
+# ------------------------------------------------------------------------------
+
+class CryptographyBackend(Backend):
+    """
+    The cryptography package (OpenSSL). It has no raw RSA operation, so
+    exponentiations use gmpy2 if installed, else Python. Ed25519 is native if
+    OpenSSL supports it, else PyCryptodome's. Keys are generated from
+    OpenSSL's random source, the randfunc argument is not used.
+    """
+    NAME = 'cryptography'
+
+    def __init__(self):
+        from cryptography.hazmat.backends import default_backend
+        from cryptography.hazmat.primitives.asymmetric import rsa
+        from cryptography.hazmat.primitives import ciphers, hashes
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.exceptions import InvalidSignature
+        self.backend = default_backend()
+        self.ed25519 = None
+        if self.backend.ed25519_supported():
+            from cryptography.hazmat.primitives.asymmetric import ed25519
+            self.ed25519 = ed25519
+        self.serialization = serialization
+        self.InvalidSignature = InvalidSignature
+        self.rsa = rsa
+        self.Cipher = ciphers.Cipher
+        self.modes = ciphers.modes
+        self.algorithms = {'AES': ciphers.algorithms.AES,
+                           'CAST5': ciphers.algorithms.CAST5,
+                           '3DES': ciphers.algorithms.TripleDES,
+                           'Blowfish': ciphers.algorithms.Blowfish}
+        self.hashes = hashes
+
+    def generate(self, bits, e, randfunc):
+        key = self.rsa.generate_private_key(e, bits, self.backend)
+        numbers = key.private_numbers()
+        p, q = sorted((numbers.p, numbers.q))
+        return (numbers.public_numbers.n, e, numbers.d, p, q,
+                self.rsa.rsa_crt_iqmp(q, p))
+
+    def ed25519Supported(self):
+        return self.ed25519 is not None or Backend.ed25519Supported(self)
+
+    def ed25519PublicKey(self, secret):
+        if self.ed25519 is None:
+            return Backend.ed25519PublicKey(self, secret)
+        key = self.ed25519.Ed25519PrivateKey.from_private_bytes(secret)
+        return key.public_key().public_bytes(
+            self.serialization.Encoding.Raw, self.serialization.PublicFormat.Raw)
+
+    def ed25519Sign(self, secret, m):
+        if self.ed25519 is None:
+            return Backend.ed25519Sign(self, secret, m)
+        return self.ed25519.Ed25519PrivateKey.from_private_bytes(secret).sign(m)
+
+    def ed25519Verify(self, public, m, signature):
+        if self.ed25519 is None:
+            return Backend.ed25519Verify(self, public, m, signature)
+        try:
+            key = self.ed25519.Ed25519PublicKey.from_public_bytes(public)
+            key.verify(signature, m)
+            return True
+        except (ValueError, self.InvalidSignature):
+            return False
+
+    def cipher(self, name, key):
+        return _CryptographyEngine(self.Cipher(self.algorithms[name](key),
+                                               self.modes.ECB(), self.backend))
+
+    def cipherCFB(self, name, key, iv):
+        return _CryptographyEngine(self.Cipher(self.algorithms[name](key),
+                                               self.modes.CFB(iv),
+                                               self.backend))
+
+    def _hashNew(self, name, data):
+        if name != 'ripemd160':
+            raise Exception('invalid hash algorithm')
+        if not hasattr(self.hashes, 'RIPEMD160'):
+            raise Exception('ripemd160 not available')
+        h = _CryptographyHash(self.hashes.Hash(self.hashes.RIPEMD160(),
+                                               self.backend))
+        h.update(data)
+        return h
+
+# ------------------------------------------------------------------------------
+
+BACKENDS = {PyCryptoBackend.NAME: PyCryptoBackend,
+            PyCryptodomeBackend.NAME: PyCryptodomeBackend,
+            CryptographyBackend.NAME: CryptographyBackend}
+
+BACKEND_ORDER = (PyCryptoBackend.NAME, PyCryptodomeBackend.NAME,
+                 CryptographyBackend.NAME)
+
+# ------------------------------------------------------------------------------
+
+def available():
+    """
+    return the names of the backends whose library is installed
+    """
+    names = []
+    for name in BACKEND_ORDER:
+        try:
+            BACKENDS[name]()
+            names.append(name)
+        except ImportError:
+            pass
+    return names
+
+# ------------------------------------------------------------------------------
+
+def load(name=None):
+    """
+    Create a backend.
+
+    @param name: Name of the backend. With None the environment variable
+    CRYPTO_BACKEND is used if set, else the first available backend.
+    """
+    if name is None:
+        name = os.environ.get(BACKEND_ENV)
+    if name is None or name == '':
+        for name in BACKEND_ORDER:
+            try:
+                return BACKENDS[name]()
+            except ImportError:
+                pass
+        raise Exception('no crypto backend available')
+    if not name in BACKENDS:
+        raise Exception('unknown crypto backend %s' % name)
+    try:
+        return BACKENDS[name]()
+    except ImportError, e:
+        raise Exception('crypto backend %s not available: %s' % (name, e))
+
+# ------------------------------------------------------------------------------
@@ -0,0 +1,156 @@
+__copyright__ = """
+Copyright (C) Timo Engel (timo-e@freenet.de), Berlin 2012.
+This program was written as part of a master thesis advised by 
+Prof. Dr. Ruediger Weis at the Beuth University of Applied 
+Sciences Berlin.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Ed25519 signature verification (RFC 8032) in Python. This is the fallback for
+crypto backends without a native implementation. Keys are the 32 octet strings
+of the RFC, signatures 64 octets.
+There is no signing: the scalar multiplications branch on the bits of the
+scalar, which is harmless for the public values of a verification but would
+leak a secret key through timing.
+"""
+
+import hashlib
+import binascii
+
+P = 2 ** 255 - 19
+L = 2 ** 252 + 27742317777372353535851937790883648493
+
+# ------------------------------------------------------------------------------
+
+def _inverse(x):
+    return pow(x, P - 2, P)
+
+D = -121665 * _inverse(121666) % P
+SQRT_M1 = pow(2, (P - 1) / 4, P)
+
+# ------------------------------------------------------------------------------
+
+def _decodeInt(b):
+    return int(binascii.hexlify(b[::-1]), 16)
+
+# ------------------------------------------------------------------------------
+
+def _add(A, B):
+    """
+    Add two points in extended coordinates (X, Y, Z, T) with x = X / Z,
+    y = Y / Z and x y = T / Z.
+    """
+    a = (A[1] - A[0]) * (B[1] - B[0]) % P
+    b = (A[1] + A[0]) * (B[1] + B[0]) % P
+    c = 2 * A[3] * B[3] * D % P
+    d = 2 * A[2] * B[2] % P
+    e, f, g, h = b - a, d - c, d + c, b + a
+    return (e * f % P, g * h % P, f * g % P, e * h % P)
+
+# ------------------------------------------------------------------------------
+
+def _multiply(s, A):
+    Q = (0, 1, 1, 0)
+    while s > 0:
+        if s & 1:
+            Q = _add(Q, A)
+        A = _add(A, A)
+        s >>= 1
+    return Q
+
+# ------------------------------------------------------------------------------
+
+def _equal(A, B):
+    return ((A[0] * B[2] - B[0] * A[2]) % P == 0 and
+            (A[1] * B[2] - B[1] * A[2]) % P == 0)
+
+# ------------------------------------------------------------------------------
+
+def _recoverX(y, sign):
+    if y >= P:
+        return None
+    x2 = (y * y - 1) * _inverse(D * y * y + 1) % P
+    if x2 == 0:
+        if sign:
+            return None
+        return 0
+    x = pow(x2, (P + 3) / 8, P)
+    if (x * x - x2) % P != 0:
+        x = x * SQRT_M1 % P
+    if (x * x - x2) % P != 0:
+        return None
+    if x & 1 != sign:
+        x = P - x
+    return x
+
+# ------------------------------------------------------------------------------
+
+def _decompress(b):
+    if len(b) != 32:
+        return None
+    y = _decodeInt(b)
+    sign = y >> 255
+    y &= 2 ** 255 - 1
+    x = _recoverX(y, sign)
+    if x is None:
+        return None
+    return (x, y, 1, x * y % P)
+
+# ------------------------------------------------------------------------------
+
+_GY = 4 * _inverse(5) % P
+_GX = _recoverX(_GY, 0)
+G = (_GX, _GY, 1, _GX * _GY % P)
+
+def _baseTable():
+    """
+    G * 2^i, so multiples of the base point need additions only.
+    """
+    table = [G]
+    for i in range(1, 253):
+        table.append(_add(table[-1], table[-1]))
+    return table
+
+_BASE = _baseTable()
+
+# ------------------------------------------------------------------------------
+
+def _multiplyBase(s):
+    Q = (0, 1, 1, 0)
+    for i in range(0, 253):
+        if (s >> i) & 1:
+            Q = _add(Q, _BASE[i])
+    return Q
+
+# ------------------------------------------------------------------------------
+
+def verify(public, m, signature):
+    """
+    Check the signature of m with the 32 octet public key.
+    """
+    if len(public) != 32 or len(signature) != 64:
+        return False
+    A = _decompress(public)
+    R = _decompress(signature[:32])
+    if A is None or R is None:
+        return False
+    s = _decodeInt(signature[32:])
+    if s >= L:
+        return False
+    h = _decodeInt(hashlib.sha512(signature[:32] + public + m).digest()) % L
+    return _equal(_multiplyBase(s), _add(R, _multiply(h, A)))
+
+# ------------------------------------------------------------------------------
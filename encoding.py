@@ -19,6 +19,7 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 import math
+import struct
 
 import crypto
 
@@ -45,6 +46,10 @@ HASH_PREFIX = {crypto.HASH_MD5:   '\x30\x20\x30\x0C\x06\x08\x2A\x86\x48\x86\xF7'
                crypto.HASH_SHA224:'\x30\x31\x30\x0d\x06\x09\x60\x86\x48\x01\x65'
                                   '\x03\x04\x02\x04\x05\x00\x04\x1C'}
 
+# Integer values of the EMSA-PKCS1-v1_5 encodings of an all zero hash, by
+# (emBits, algorithm), see pkcs15Template.
+_PKCS15_TEMPLATES = {}
+
 # ------------------------------------------------------------------------------
 
 def pkcs15(pHash, emBits, algorithm):
@@ -65,6 +70,39 @@ def pkcs15(pHash, emBits, algorithm):
 
 # ------------------------------------------------------------------------------
 
+def pkcs15Template(emBits, algorithm):
+    """
+    The EMSA-PKCS1-v1_5 encoding 0x00 0x01 FF...FF 0x00 DigestInfo of an all
+    zero hash as an integer. The encoding of a hash h is the template plus h
+    as an integer. Templates are computed once for each emBits and algorithm.
+
+    @param emBits: Desired number of bits.
+    @param algorithm: Hash algorithm.
+    """
+    template = _PKCS15_TEMPLATES.get((emBits, algorithm))
+    if template is None:
+        template = crypto.b2i(pkcs15('\x00' * (crypto.HASH_SIZE[algorithm] / 8),
+                                     emBits, algorithm))
+        _PKCS15_TEMPLATES[(emBits, algorithm)] = template
+    return template
+
+# ------------------------------------------------------------------------------
+
+def pkcs15Int(pHash, emBits, algorithm):
+    """
+    Encode a hash using EMSA-PKCS1-v1_5, the result is the integer value of
+    pkcs15(pHash, emBits, algorithm).
+
+    @param pHash: The hash over the message M to encode.
+    @param emBits: Desired number of bits.
+    @param algorithm: Hash algorithm.
+    """
+    if len(pHash) * 8 != crypto.HASH_SIZE[algorithm]:
+        raise Exception('invalid hash length')
+    return pkcs15Template(emBits, algorithm) + crypto.b2i(pHash)
+
+# ------------------------------------------------------------------------------
+
 def ecash(data, emBits, algorithm):
     """
     Implementation of the ecash encoding scheme for signatures.
@@ -72,19 +110,51 @@ def ecash(data, emBits, algorithm):
     x_0 = x
     x_i = H(x_0 || ... || x_(i-1))
 
+    The hash over the growing prefix is kept in one running context, each x_i
+    is taken from a copy of it.
+
     @param data: string to encode
     @param emBits: Number of bits of output.
     """
 
     t = ((emBits - len(data) * 8)) / crypto.HASH_SIZE[algorithm]
+    h = crypto.hashNew(algorithm, data)
     xList = [data]
     for xi in range(1, t + 1):
-        x_i = crypto.hash(''.join(xList), algorithm)
-        xList.append(x_i)    
+        x_i = h.copy().digest()
+        h.update(x_i)
+        xList.append(x_i)
     return ''.join(xList)
 
 # ------------------------------------------------------------------------------
 
+def ecashInt(data, emBits, algorithm):
+    """
+    The ecash encoding of data as an integer, ready for the RSA primitives.
+    """
+    return crypto.b2i(ecash(data, emBits, algorithm))
+
+# ------------------------------------------------------------------------------
+
+def mgf1(mgfSeed, algorithm):
+    """
+    MGF1 Mask Generation Function as an endless stream of hash blocks, the
+    mask is their concatenation. The seed is hashed once, each block
+    continues a copy of that state with the counter.
+
+    @param mgfSeed: The seed from which the bitmask is generated from.
+    @param algorithm: Hash algorithm to use.
+    """
+    seed = crypto.hashNew(algorithm, mgfSeed)
+    counter = 0
+    while True:
+        h = seed.copy()
+        h.update(struct.pack('>I', counter))
+        yield h.digest()
+        counter += 1
+
+# ------------------------------------------------------------------------------
+
 def pssMGF(mgfSeed, maskLen, algorithm):
     """
     MGF1 Mask Generation Function.
@@ -93,11 +163,11 @@ def pssMGF(mgfSeed, maskLen, algorithm):
     @param maskLen: Number of bytes in output.
     """
     hLen = crypto.HASH_SIZE[algorithm] / 8
-    T = ""
-    for counter in range(0, int(math.ceil(maskLen / float(hLen)))) :
-        C = crypto.i2b(counter, 4)
-        T = T + crypto.hash(mgfSeed + C, algorithm)
-    return T[0:maskLen]
+    T = bytearray(maskLen)
+    blocks = mgf1(mgfSeed, algorithm)
+    for offset in range(0, maskLen, hLen):
+        T[offset:offset + hLen] = blocks.next()[0:maskLen - offset]
+    return str(T)
 
 # ------------------------------------------------------------------------------
 
@@ -113,24 +183,28 @@ def pssEncode(M, sLen, emBits, algorithm):
     if len(M) > 2**61 - 1:                                            # 1.
         raise Exception('message too long')
     mHash = crypto.hash(M, algorithm)                                 # 2.
-    hLen = crypto.HASH_SIZE[algorithm] / 8
+    salt = crypto.randomBytes(sLen)                                   # 4.
+    return crypto.i2b(_pssEncodeInt(mHash, salt, emBits, algorithm),
+                      int(math.ceil(emBits / 8.0)))
+
+# ------------------------------------------------------------------------------
+
+def _pssEncodeInt(mHash, salt, emBits, algorithm):
+    """
+    Steps 3 and 5 to 12 of pssEncode, the encoding is built as an integer.
+    """
+    hLen = len(mHash)
+    sLen = len(salt)
     emLen = int(math.ceil(emBits / 8.0))                              # 3.
     if emLen < hLen + sLen + 2:
         raise Exception('encoding error')
-    salt = crypto.randomBytes(sLen)                                   # 4.
     M_ = '\x00\x00\x00\x00\x00\x00\x00\x00' + mHash + salt            # 5.
     H = crypto.hash(M_, algorithm)                                    # 6.
-    PS = (emLen - sLen - hLen - 2) * '\x00'                           # 7.
-    DB = PS + '\x01' + salt                                           # 8.
-    dbMask = pssMGF(H, emLen - hLen - 1, algorithm)                   # 9.
-    maskedDBList = []                                                 # 10.
-    for i in range(0, len(dbMask)):
-        maskedDBList.append(chr(ord(DB[i]) ^ ord(dbMask[i])))
-    bits = 8 * emLen - emBits                                         # 11.
-    maskedDBList[0] = chr(ord(maskedDBList[0]) & 0xff >> bits)
-    maskedDB = ''.join(maskedDBList)
-    EM = maskedDB + H + '\xbc'                                        # 12.
-    return EM
+    DB = 1 << 8 * sLen | crypto.b2i(salt)                             # 7. 8.
+    dbMask = crypto.b2i(pssMGF(H, emLen - hLen - 1, algorithm))       # 9.
+    maskedDB = DB ^ dbMask                                            # 10.
+    maskedDB &= (1 << emBits - 8 * hLen - 8) - 1                      # 11.
+    return maskedDB << 8 * hLen + 8 | crypto.b2i(H) << 8 | 0xbc       # 12.
 
 # ------------------------------------------------------------------------------
 
@@ -144,33 +218,42 @@ def pssVerify(M, EM, sLen, emBits, algorithm):
     @param emBits: Number of bits in signature (in EM)
     @param algorithm: Hash algorithm to use.
     """
+    return pssVerifyInt(M, crypto.b2i(EM), sLen, emBits, algorithm)
+
+# ------------------------------------------------------------------------------
+
+def pssVerifyInt(M, em, sLen, emBits, algorithm):
+    """
+    Verify an RSASSA-PSS encoded signature given as an integer, the result of
+    the RSA verification primitive. The trailer and the top bits are checked
+    before the mask is computed, DB is unmasked and checked as an integer.
+
+    @param M: Message to verify.
+    @param em: Signature to check as an integer.
+    @param sLen: Number of bytes for salt
+    @param emBits: Number of bits in signature (in em)
+    @param algorithm: Hash algorithm to use.
+    @return: False for an invalid or malformed signature.
+    """
     hLen = crypto.HASH_SIZE[algorithm] / 8
     if len(M) > 2**61 - 1:                                            # 1.
         raise Exception('message too long')
-    mHash = crypto.hash(M, algorithm)                                 # 2.
     emLen = int(math.ceil(emBits / 8.0))                              # 3.
     if emLen < hLen + sLen + 2:
         raise Exception('inconsistant')
-    if ord(EM[emLen - 1]) is not 0xbc:                                # 4.
-        raise Exception('inconsistant')
-    maskedDB = EM[0:emLen - hLen - 1]                                 # 5.
-    H = EM[emLen - hLen - 1: emLen - 1]
-    bits = 8 * emLen - emBits                                         # 6.
-    if (~(0xff >> bits)) & ord(maskedDB[0]) != 0:
-        raise Exception('inconsistant')
-    dbMask = pssMGF(H, emLen - hLen - 1, algorithm)                   # 7.
-    DBList = []                                                       # 8.
-    for i in range(0, emLen - hLen - 1):
-        DBList.append(chr(ord(maskedDB[i]) ^ ord(dbMask[i])))
-    bits = 8 * emLen - emBits                                         # 9.
-    DBList[0] = chr(ord(DBList[0]) & 0xff >> bits)
-    DB = ''.join(DBList)
-    for i in range(0, emLen - hLen - sLen - 2):                       # 10.
-        if DB[i] != '\x00':
-            raise Exception('inconsistant')
-    if DB[emLen - hLen - sLen - 2] != '\x01':
-        raise Exception('inconsistant')
-    salt = DB[emLen - hLen - sLen - 1:emLen - hLen]                   # 11.
+    if em & 0xff != 0xbc:                                             # 4.
+        return False
+    if em >> emBits != 0:                                             # 6.
+        return False
+    dbBits = emBits - 8 * hLen - 8                                    # 5.
+    maskedDB = em >> (8 * hLen + 8)
+    H = crypto.i2b((em >> 8) & ((1 << 8 * hLen) - 1), hLen)
+    dbMask = crypto.b2i(pssMGF(H, emLen - hLen - 1, algorithm))       # 7.
+    DB = (maskedDB ^ dbMask) & ((1 << dbBits) - 1)                    # 8. 9.
+    if DB >> (8 * sLen) != 1:                                         # 10.
+        return False
+    salt = crypto.i2b(DB & ((1 << 8 * sLen) - 1), sLen)               # 11.
+    mHash = crypto.hash(M, algorithm)                                 # 2.
     M_ = '\x00\x00\x00\x00\x00\x00\x00\x00' + mHash + salt            # 12.
     H_ = crypto.hash(M_, algorithm)                                   # 13.
     return H_ == H
@@ -197,3 +280,36 @@ def hashEncode(data, emBits, hashAlgorithm, encoding):
         raise Exception('invalid hash encoding')
 
 # ------------------------------------------------------------------------------
+
+def hashEncodeMany(messages, emBits, hashAlgorithm, encoding):
+    """
+    Create the encoded hashvalues of many messages, as hashEncode does for
+    one. The PKCS#1 v1.5 template, the hash context to copy and the PSS salts
+    are set up once for the whole batch.
+
+    @param messages: List of data to hash and encode.
+    @param emBits: Desired number of bits in output.
+    @param hashAlgorithm: The algorithm to use.
+    @param encoding: The encoding scheme to use.
+    @return: List of the encodings as integers, in the order of messages.
+    """
+    if encoding == ENCODING_ECASH:
+        return [ecashInt(data, emBits, hashAlgorithm) for data in messages]
+    if encoding != ENCODING_PKCS15 and encoding != ENCODING_PKCSPSS:
+        raise Exception('invalid hash encoding')
+    empty = crypto.hashNew(hashAlgorithm)
+    hashes = []
+    for data in messages:
+        h = empty.copy()
+        h.update(data)
+        hashes.append(h.digest())
+    if encoding == ENCODING_PKCS15:
+        template = pkcs15Template(emBits, hashAlgorithm)
+        return [template + crypto.b2i(pHash) for pHash in hashes]
+    sLen = crypto.HASH_SIZE[hashAlgorithm] / 8
+    salts = crypto.randomBytes(sLen * len(hashes))
+    return [_pssEncodeInt(mHash, salts[i * sLen:(i + 1) * sLen], emBits,
+                          hashAlgorithm)
+            for i, mHash in enumerate(hashes)]
+
+# ------------------------------------------------------------------------------
@@ -20,6 +20,7 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import OpenPGP
 import blinding
+import crypto
 import socket
 import sys
 import ssl
@@ -34,22 +35,46 @@ class Config:
         self.idPort = 9999
         self.keyHost = 'localhost'
         self.keyPort = 11371
+        self.blindingPool = 4
+        # ask for a signature in an exponent slot of the CA, which the server
+        # signs in a batch; only this package verifies such signatures
+        self.batchSlot = False
 
 class IDClient:
     def __init__(self, config):
         self.config = config
+        self.pool = None
         self.loadKey(config.publicKey)
         self.sslContext = ssl.create_default_context()
         self.sslContext.load_verify_locations(self.config.sslCert)
         self.sslContext.check_hostname = False
 
     def loadKey(self, filename):
+        self.shutdown()
+        self.exponent = None
         try:
             self.caKey = OpenPGP.messages.fromRadix64(open(filename, 'r').read())
+            self.caContext = OpenPGP.RSAPublicContext(self.caKey)
         except:
             self.caKey = None
+            self.caContext = None
+            return
+        slots = self.caContext.batchExponents()
+        if self.config.batchSlot and len(slots) > 0:
+            # a random slot spreads the clients over all slots of a batch
+            self.exponent = slots[crypto.randomInt(len(slots)) - 1]
+        if self.config.blindingPool > 0:
+            self.pool = blinding.BlindingPool(self.caContext,
+                                              self.config.blindingPool,
+                                              self.exponent)
+            self.pool.start()
 
-    def _sendRequest(self, auth, requestData=''):
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def _sendRequest(self, auth, requestData='', exponent=None):
         s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         sslsocket = ssl.wrap_socket(s, ca_certs = self.config.sslCert,
                                     cert_reqs=ssl.CERT_REQUIRED)
@@ -58,8 +83,11 @@ class IDClient:
         except ssl.SSLError, e:
             print 'IDClient: Exception: ', e
             raise e
-        msg = ('Authorization: %s\r\nLength: %d\r\n\r\n%s\r\n' %
-               (auth.strip(), len(requestData), requestData))
+        slot = ''
+        if exponent is not None:
+            slot = 'Exponent: %d\r\n' % exponent
+        msg = ('Authorization: %s\r\n%sLength: %d\r\n\r\n%s\r\n' %
+               (auth.strip(), slot, len(requestData), requestData))
         sent = 0
         while sent < len(msg):
             sent += sslsocket.send(msg[sent:])
@@ -87,14 +115,22 @@ class IDClient:
         if self.caKey is None:
             raise Exception('no public key')
 
-        r, hashTwo, sigTime, blinded = blinding.blind(self.caKey, None, nym)
+        factor = None
+        if self.pool is not None:
+            factor = self.pool.get()
+        hashAlgorithm = blinding.hashPolicy(self.caContext)[0]
+        r, hashTwo, sigTime, blinded = blinding.blind(
+            self.caContext, None, nym, self.exponent, factor=factor,
+            hashAlgorithm=hashAlgorithm)
 
-        data, result = self._sendRequest(auth, blinded.rep())
+        data, result = self._sendRequest(auth, blinded.rep(), self.exponent)
         if data is None or result != 'ok':
             return None, result
 
         blindSig = OpenPGP.messages.fromRadix64(data)
-        sig = blinding.unblind(self.caKey, sigTime, r, hashTwo, blindSig)
+        sig = blinding.unblind(self.caContext, sigTime, r, hashTwo, blindSig,
+                               self.exponent, factor=factor,
+                               hashAlgorithm=hashAlgorithm)
         return sig, result
 
     def fetchKey(self):
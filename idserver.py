@@ -23,6 +23,7 @@ import sys
 import socket
 import blindca
 import OpenPGP
+import crypto
 import re
 import ssl
 import threading
@@ -31,6 +32,7 @@ import os
 import time
 
 ca = None
+batchSigner = None
 users = None
 config = None
 
@@ -46,6 +48,8 @@ class Users:
     def __init__(self, file):
         self.usersFile = file
         self.users = {}
+        self.pending = set()
+        self.lock = threading.Lock()
         f = open(file)
         for s in f:
             user, passwd, keyid = s.strip().split(':')
@@ -80,6 +84,28 @@ class Users:
             raise Exception('user not found')
         self.users[user][1] = keyid
 
+    def begin(self, user, keyid):
+        """
+        Reserve the signature of user while the request is served, requests
+        are handled concurrently. False if user has already signed or another
+        request of user is pending.
+        """
+        with self.lock:
+            if self.hasSigned(user, keyid) or user in self.pending:
+                return False
+            self.pending.add(user)
+            return True
+
+    def end(self, user, keyid=None):
+        """
+        Release the reservation of begin(), record keyid if the signature was
+        sent.
+        """
+        with self.lock:
+            self.pending.discard(user)
+            if keyid is not None:
+                self.setKeyId(user, keyid)
+
 # ------------------------------------------------------------------------------
 
 class Config:
@@ -91,6 +117,11 @@ class Config:
     USERSFILE = 'usersfile'
     TLSKEY = 'tlskey'
     TLSCERT = 'tlscert'
+    CRYPTOBACKEND = 'cryptobackend'
+    HASHALGORITHMS = 'hashalgorithms'
+    BLINDINGPOOL = 'blindingpool'
+    BATCHEXPONENTS = 'batchexponents'
+    BATCHWINDOW = 'batchwindow'
     
     def __init__(self, cfgFile):
         self.cfg = {self.HOST: 'localhost',
@@ -100,7 +131,12 @@ class Config:
                     self.PUBLICKEY: '',
                     self.USERSFILE: '',
                     self.TLSKEY: '',
-                    self.TLSCERT: ''}
+                    self.TLSCERT: '',
+                    self.CRYPTOBACKEND: '',
+                    self.HASHALGORITHMS: '',
+                    self.BLINDINGPOOL: 4,
+                    self.BATCHEXPONENTS: '',
+                    self.BATCHWINDOW: 0.05}
                     
         try:
             f = open(os.path.expanduser(cfgFile), 'r')
@@ -119,6 +155,19 @@ class Config:
             self.cfg[self.TLSCERT] = os.path.expanduser(self.cfg[self.TLSCERT])
             self.cfg[self.IDPORT] = int(self.cfg[self.IDPORT])
             self.cfg[self.KEYPORT] = int(self.cfg[self.KEYPORT])
+            self.cfg[self.BLINDINGPOOL] = int(self.cfg[self.BLINDINGPOOL])
+            self.cfg[self.BATCHWINDOW] = float(self.cfg[self.BATCHWINDOW])
+            if len(self.cfg[self.BATCHEXPONENTS]) > 0:
+                self.cfg[self.BATCHEXPONENTS] = tuple(
+                    [int(e) for e in self.cfg[self.BATCHEXPONENTS].split(',')])
+            else:
+                self.cfg[self.BATCHEXPONENTS] = ()
+            if len(self.cfg[self.HASHALGORITHMS]) > 0:
+                self.cfg[self.HASHALGORITHMS] = tuple(
+                    [crypto.hashAlgorithmFromName(name)
+                     for name in self.cfg[self.HASHALGORITHMS].split(',')])
+            else:
+                self.cfg[self.HASHALGORITHMS] = None
         except Exception, e:
             print >>sys.stderr, 'error in configfile: ', e
             raise e
@@ -148,19 +197,26 @@ class IDServerThread(threading.Thread):
                 print 'IDServer: accept: Exception: ', e
                 continue
             print 'IDServer: connection from ', fromaddr
-            try:
-                sslsocket = ssl.wrap_socket(
-                    newsocket, server_side=True,
-                    certfile = self.config.cfg[self.config.TLSCERT],
-                    keyfile = self.config.cfg[self.config.TLSKEY])
-            except ssl.SSLError, e:
-                print 'IDServer: wrap_socket: Exception: ', e
-                newsocket.shutdown(socket.SHUT_RDWR)
-                newsocket.close()
-                continue
-            handleConnection(sslsocket)
-            sslsocket.shutdown(socket.SHUT_RDWR)
-            sslsocket.close()
+            # concurrent requests for exponent slots are signed in a batch
+            connection = threading.Thread(target=self.serve,
+                                          args=(newsocket,))
+            connection.daemon = True
+            connection.start()
+
+    def serve(self, newsocket):
+        try:
+            sslsocket = ssl.wrap_socket(
+                newsocket, server_side=True,
+                certfile = self.config.cfg[self.config.TLSCERT],
+                keyfile = self.config.cfg[self.config.TLSKEY])
+        except ssl.SSLError, e:
+            print 'IDServer: wrap_socket: Exception: ', e
+            newsocket.shutdown(socket.SHUT_RDWR)
+            newsocket.close()
+            return
+        handleConnection(sslsocket)
+        sslsocket.shutdown(socket.SHUT_RDWR)
+        sslsocket.close()
 
     def shutdown(self):
         print 'IDServer: shutdown'
@@ -187,13 +243,23 @@ class KeyServerThread(threading.Thread):
 class IDServer:
     def __init__(self, config):
         global ca
+        global batchSigner
         global users
         self.config = config
+        if len(self.config.cfg[self.config.CRYPTOBACKEND]) > 0:
+            crypto.setBackend(self.config.cfg[self.config.CRYPTOBACKEND])
         caConfig = blindca.Config()
         caConfig.secretKey = self.config.cfg[self.config.SECRETKEY]
         caConfig.publicKey = self.config.cfg[self.config.PUBLICKEY]
         caConfig.passwordCallback = enterPassword
+        caConfig.hashAlgorithms = self.config.cfg[self.config.HASHALGORITHMS]
+        caConfig.blindingPool = self.config.cfg[self.config.BLINDINGPOOL]
+        caConfig.batchExponents = self.config.cfg[self.config.BATCHEXPONENTS]
         ca = blindca.BlindCA(caConfig)
+        batchSigner = None
+        if len(ca.batchExponents) > 0:
+            batchSigner = blindca.BatchSigner(
+                ca, self.config.cfg[self.config.BATCHWINDOW])
         users = Users(self.config.cfg[self.config.USERSFILE])
 
         self.idThread = IDServerThread(self.config)
@@ -204,10 +270,16 @@ class IDServer:
         self.keyThread = KeyServerThread(keyServerConfig)
 
     def run(self):
+        if batchSigner is not None:
+            batchSigner.start()
         self.keyThread.start()
         self.idThread.start()
 
     def shutdown(self):
+        if batchSigner is not None:
+            batchSigner.shutdown()
+            batchSigner.join()
+        ca.shutdown()
         self.idThread.shutdown()
         self.keyThread.shutdown()
         self.idThread.join()
@@ -220,11 +292,13 @@ def handleConnection(socket):
     received = socket.recv(1024)
     try:
         match=re.match(
-            'Authorization:\s*(\S+)\r\nLength:\s*(\d+)\r\n(.*)',
+            'Authorization:\s*(\S+)\r\n(?:Exponent:\s*(\d+)\r\n)?'
+            'Length:\s*(\d+)\r\n(.*)',
             received, re.MULTILINE | re.DOTALL)
         user, password = match.group(1).decode('base64').split(':')
-        length = int(match.group(2))
-        data = match.group(3)
+        exponent = match.group(2)
+        length = int(match.group(3))
+        data = match.group(4)
     except:
         print 'IDServer: invalid request'
         send(socket, 'IDServer: invalid request\r\n')
@@ -237,19 +311,27 @@ def handleConnection(socket):
         print 'IDServer: not authorized'
         send(socket, 'IDServer: not authorized\r\n')
         return
+    keyid = ca.key.keyID.encode('hex')
+    if not users.begin(user, keyid):
+        print 'IDServer: user has already signed'
+        send(socket, 'IDServer: user has already signed\r\n')
+        return
+    signed = None
     try:
-        keyid = ca.secretKey.packets[OpenPGP.TAG_SECKEY].keyID().encode('hex')
-        if users.hasSigned(user, keyid):
-            print 'IDServer: user has already signed'
-            send(socket, 'IDServer: user has already signed\r\n')
-            return
         blindMessage = OpenPGP.messages.fromRadix64(data.strip())
-        blindSig = ca.sign(blindMessage)
-        users.setKeyId(user, keyid)
+        if exponent is None:
+            blindSig = ca.sign(blindMessage)
+        elif batchSigner is None:
+            raise Exception('no exponent slots')
+        else:
+            blindSig = batchSigner.sign(int(exponent), blindMessage)
+        signed = keyid
         send(socket, 'IDServer: ok\r\n' + blindSig.rep())
     except Exception, e:
         print 'IDServer: ', e
         send(socket, 'IDServer: signature failed')
+    finally:
+        users.end(user, signed)
 
 # ------------------------------------------------------------------------------
 
@@ -0,0 +1,152 @@
+#!/usr/bin/python
+__copyright__ = """
+Copyright (C) Timo Engel (timo-e@freenet.de), Berlin 2012.
+This program was written as part of a master thesis advised by 
+Prof. Dr. Ruediger Weis at the Beuth University of Applied 
+Sciences Berlin.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Pool of pre-generated key pairs, so that a new nym key is available at once.
+Every pair is stored in the pool directory as <keyid>.pub and <keyid>.sec,
+the secret key encrypted with the pool passphrase. Taking a pair renames the
+secret key file first, so each pair is handed out only once, even if several
+processes share the directory.
+
+To fill a pool for a batch enrollment:
+    ./keypool.py <DIRECTORY> <COUNT> [<BITS>]
+"""
+
+import os
+import sys
+import threading
+import getpass
+
+from OpenPGP import *
+
+# ------------------------------------------------------------------------------
+
+class KeyPool(threading.Thread):
+    """
+    Keeps size unused key pairs in a directory, generating them in the
+    background once start() is called.
+    """
+    def __init__(self, directory, passphrase, size=4, bits=2048,
+                 processes=None):
+        """
+        @param directory: Directory of the pool, created if needed.
+        @param passphrase: Passphrase the stored secret keys are encrypted with.
+        @param size: Number of key pairs to keep ready.
+        @param bits: Size of the generated keys.
+        @param processes: Processes per key generation, see generateKey.
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.directory = os.path.expanduser(directory)
+        self.passphrase = passphrase
+        self.size = size
+        self.bits = bits
+        self.processes = processes
+        self.running = True
+        self.wakeup = threading.Event()
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory, 0700)
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def count(self):
+        """
+        Number of unused key pairs in the pool.
+        """
+        return len([f for f in os.listdir(self.directory)
+                    if f.endswith('.sec')])
+
+    def generate(self):
+        """
+        Generate a key pair and add it to the pool.
+        """
+        pubKey, secKey = generateKey(self.bits, processes=self.processes)
+        name = pubKey.packets[TAG_PUBKEY].keyID().encode('hex')
+        for ext, data in (('.pub', pubKey.rep()),
+                          ('.sec', secKey.rep(self.passphrase))):
+            tmp = self._path(name + ext + '.tmp')
+            f = os.fdopen(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+                                  0600), 'w')
+            f.write(data)
+            f.close()
+            os.rename(tmp, self._path(name + ext))
+
+    def fill(self):
+        """
+        Generate key pairs until the pool holds size of them.
+        """
+        while self.running and self.count() < self.size:
+            self.generate()
+
+    def take(self):
+        """
+        Remove a key pair from the pool. If the pool is empty a new pair is
+        generated.
+
+        @return: (PublicKeyMessage, SecretKeyMessage)
+        """
+        for f in sorted(os.listdir(self.directory)):
+            if not f.endswith('.sec'):
+                continue
+            name = f[:-len('.sec')]
+            claimed = self._path('%s.%d' % (f, os.getpid()))
+            try:
+                os.rename(self._path(f), claimed)
+            except OSError:
+                continue
+            try:
+                secKey = messages.fromRadix64(open(claimed).read(),
+                                              lambda: self.passphrase)
+                pubKey = messages.fromRadix64(
+                    open(self._path(name + '.pub')).read())
+            except:
+                # a wrong passphrase must not cost the pair
+                os.rename(claimed, self._path(f))
+                raise
+            os.remove(claimed)
+            os.remove(self._path(name + '.pub'))
+            self.wakeup.set()
+            return pubKey, secKey
+        self.wakeup.set()
+        return generateKey(self.bits, processes=self.processes)
+
+    def run(self):
+        while self.running:
+            self.fill()
+            self.wakeup.wait(60)
+            self.wakeup.clear()
+
+    def shutdown(self):
+        self.running = False
+        self.wakeup.set()
+
+# ------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print >>sys.stderr, 'usage: keypool.py <DIRECTORY> <COUNT> [<BITS>]'
+        sys.exit(2)
+    bits = 2048
+    if len(sys.argv) > 3:
+        bits = int(sys.argv[3])
+    KeyPool(sys.argv[1], getpass.getpass('pool passphrase: '),
+            int(sys.argv[2]), bits).fill()
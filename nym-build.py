@@ -22,20 +22,13 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import sys
 from OpenPGP import *
 
-def verifySelfSignature(nym):
-    key = messages.PublicKeyMessage.fromPackets((
-            packets.PublicKeyPacket.fromParameter(nym.n,
-                                                  elements.MPIElement(65537)),))
-    return nym.isValid(key)
-
-
 if len(sys.argv) != 3:
     print >>sys.stderr, 'usage: nym-build.py <NYMFILE> <SIGFILE>'
     sys.exit(2)
 
 nymMessage = messages.fromRadix64(open(sys.argv[1], 'r').read())
-nym = nymMessage.packets[TAG_NYM]
-if not verifySelfSignature(nym):
+nym = getNym(nymMessage)
+if not nym.verifySelfSignature():
     print '%s: self signature invalid' % sys.argv[0]
     sys.exit(1)
 
@@ -20,17 +20,49 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 import sys
+import os
+import getpass
 from OpenPGP import *
+import keypool
 
-if len(sys.argv) != 3:
-    print >>sys.stderr, 'usage: nym-prepare.py <NYM> <SECRETKEYFILE>'
+args = sys.argv[1:]
+pool = None
+ed25519 = False
+if len(args) > 1 and args[0] == '--pool':
+    pool = args[1]
+    args = args[2:]
+elif len(args) > 0 and args[0] == '--ed25519':
+    ed25519 = True
+    args = args[1:]
+if len(args) != 2:
+    print >>sys.stderr, ('usage: nym-prepare.py [--pool <POOLDIR> | --ed25519] '
+                         '<NYM> <SECRETKEYFILE>')
     sys.exit(2)
+if ed25519 and not crypto.ed25519Supported():
+    print >>sys.stderr, ('%s: --ed25519 needs PyCryptodome or the cryptography '
+                         'backend' % sys.argv[0])
+    sys.exit(1)
 
-secretKey = messages.fromRadix64(open(sys.argv[2], 'r').read())
-nym = packets.NymPacket.fromParameter(
-    sys.argv[1],
-    secretKey.packets[TAG_SECKEY].n)
-nym.computeSignature(secretKey)
+if pool is None and not ed25519:
+    secretKey = messages.fromRadix64(open(args[1], 'r').read(),
+                                     lambda: getpass.getpass('passphrase: '))
+else:
+    # create a new key and store it encrypted in SECRETKEYFILE
+    if os.path.exists(args[1]):
+        print >>sys.stderr, '%s: %s exists' % (sys.argv[0], args[1])
+        sys.exit(1)
+    if ed25519:
+        publicKey, secretKey = generateEd25519Key()
+    else:
+        publicKey, secretKey = keypool.KeyPool(
+            pool, getpass.getpass('pool passphrase: ')).take()
+    passphrase = getpass.getpass('passphrase for %s: ' % args[1])
+    f = os.fdopen(os.open(args[1], os.O_WRONLY | os.O_CREAT | os.O_EXCL,
+                          0600), 'w')
+    f.write(secretKey.rep(passphrase))
+    f.close()
+
+nym = createNym(args[0], secretKey)
 if not nym.isValid(secretKey):
     print >>sys.stderr, '%s: failed to create nym' % sys.argv[0]
 fname = nym.id.replace(' ', '_') + '.nym'
@@ -22,22 +22,66 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import sys
 from os.path import *
 from OpenPGP import *
+import blinding
+
+def verifyMany(nymFiles, keyMessage, screen=False):
+    """
+    Verify the CA signatures of many nyms. With screen, the signatures are
+    only screened in one batch, which is faster but does not reject a
+    signature replaced by n - s (see screenSignatures).
+    """
+    name = basename(sys.argv[0])
+    if keyMessage.isExpired():
+        print '%s: Key is expired since %s' % (name,
+                                               keyMessage.expirationTime())
+    failed = False
+    pairs = []
+    verified = []
+    for nymFile in nymFiles:
+        nymMessage = messages.fromRadix64(open(nymFile, 'r').read())
+        nym = getNym(nymMessage)
+        if not nym.verifySelfSignature():
+            print '%s: %s: Self signature invalid' % (name, nymFile)
+            failed = True
+            continue
+        pairs.append((nym.rep(), nymMessage))
+        verified.append(nymFile)
+    policy = blinding.hashPolicy(keyMessage)
+    if screen:
+        results = screenSignatures(pairs, keyMessage, policy)
+    else:
+        results = [verifySignature(data, sig, keyMessage, policy)
+                   for data, sig in pairs]
+    for nymFile, valid in zip(verified, results):
+        if valid and screen:
+            print '%s: %s: Signature passed screening' % (name, nymFile)
+        elif valid:
+            print '%s: %s: Signature is VALID' % (name, nymFile)
+        else:
+            print '%s: %s: Signature is INVALID' % (name, nymFile)
+            failed = True
+    if failed:
+        sys.exit(1)
+    sys.exit(0)
 
-def verifySelfSignature(nym):
-    key = messages.PublicKeyMessage.fromPackets((
-            packets.PublicKeyPacket.fromParameter(nym.n,
-                                                  elements.MPIElement(65537)),))
-    return nym.isValid(key)
 
+screen = '--screen' in sys.argv[1:]
+if screen:
+    sys.argv.remove('--screen')
 
-if len(sys.argv) != 3:
-    print >>sys.stderr, 'usage: nym-verify.py <NYMFILE> <CAKEY>'
+if len(sys.argv) < 3:
+    print >>sys.stderr, ('usage: nym-verify.py [--screen] <NYMFILE> '
+                         '[<NYMFILE> ...] <CAKEY>')
     sys.exit(2)
 
+if len(sys.argv) > 3 or screen:
+    verifyMany(sys.argv[1:-1],
+               messages.fromRadix64(open(sys.argv[-1]).read()), screen)
+
 nymMessage = messages.fromRadix64(open(sys.argv[1], 'r').read())
-nym = nymMessage.packets[TAG_NYM]
+nym = getNym(nymMessage)
 sig = nymMessage.packets[TAG_SIGNATURE]
-if not verifySelfSignature(nym):
+if not nym.verifySelfSignature():
     print '%s: Self signature invalid' % basename(sys.argv[0])
     sys.exit(1)
 
@@ -50,11 +94,14 @@ print '%s: Signature from %s ' % (
     sig.subpackets.get(subpackets.IssuerSubpacket.TAG))
 print '%s: %s' % (basename(sys.argv[0]),
                   sig.hashedSubpackets.get(subpackets.CreationTimeSubpacket.TAG))
+print '%s: Hash algorithm %s' % (basename(sys.argv[0]),
+                                 elements.hashToString(sig.hashAlgorithm.value))
 if keyMessage.isExpired():
     print '%s: Key is expired since %s' % (basename(sys.argv[0]),
                                            keyMessage.expirationTime())
 
-if verifySignature(nym.rep(), nymMessage, keyMessage):
+if verifySignature(nym.rep(), nymMessage, keyMessage,
+                   blinding.hashPolicy(keyMessage)):
     print '%s: Signature is VALID' % (basename(sys.argv[0]))
     sys.exit(0)
 else:
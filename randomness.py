@@ -0,0 +1,120 @@
+__copyright__ = """
+Copyright (C) Timo Engel (timo-e@freenet.de), Berlin 2012.
+This program was written as part of a master thesis advised by 
+Prof. Dr. Ruediger Weis at the Beuth University of Applied 
+Sciences Berlin.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Source of cryptographically secure random bytes. The bytes come from the
+operating system through os.urandom. Optionally they are read in blocks of
+bufferSize bytes and handed out from a buffer, which is discarded whenever the
+process id changes, so a forked child never reuses random bytes of its parent.
+"""
+
+import os
+import threading
+
+_locks = {}
+_pid = os.getpid()
+_buffer = ''
+_offset = 0
+_bufferSize = 0
+_calls = 0
+_bytes = 0
+_systemCalls = 0
+
+_osRandom = os.urandom
+
+# ------------------------------------------------------------------------------
+
+def _lock():
+    """
+    The lock of the current process. A child forked while another thread of
+    the parent held the lock would wait for it forever, so every process id
+    gets a lock of its own. setdefault gives all threads the same one.
+    """
+    pid = os.getpid()
+    lock = _locks.get(pid)
+    if lock is None:
+        lock = _locks.setdefault(pid, threading.Lock())
+    return lock
+
+# ------------------------------------------------------------------------------
+
+def read(n):
+    """
+    Return n random bytes. Thread safe.
+    """
+    global _pid, _buffer, _offset, _calls, _bytes, _systemCalls
+    lock = _lock()
+    lock.acquire()
+    try:
+        _calls += 1
+        _bytes += n
+        if _pid != os.getpid():
+            _pid = os.getpid()
+            _buffer = ''
+            _offset = 0
+        if len(_buffer) - _offset >= n:
+            _offset += n
+            return _buffer[_offset - n:_offset]
+        _systemCalls += 1
+        if n >= _bufferSize:
+            return _osRandom(n)
+        _buffer = _osRandom(_bufferSize)
+        _offset = n
+        return _buffer[:n]
+    finally:
+        lock.release()
+
+# ------------------------------------------------------------------------------
+
+def setBufferSize(size):
+    """
+    Read random bytes from the operating system in blocks of size bytes.
+    0 disables the buffer, every read() then asks the operating system.
+    """
+    global _bufferSize, _buffer, _offset
+    lock = _lock()
+    lock.acquire()
+    try:
+        _bufferSize = size
+        _buffer = ''
+        _offset = 0
+    finally:
+        lock.release()
+
+# ------------------------------------------------------------------------------
+
+def counters():
+    """
+    return (calls of read(), bytes returned, reads from the operating system)
+    """
+    return _calls, _bytes, _systemCalls
+
+# ------------------------------------------------------------------------------
+
+def resetCounters():
+    global _calls, _bytes, _systemCalls
+    lock = _lock()
+    lock.acquire()
+    try:
+        _calls = _bytes = _systemCalls = 0
+    finally:
+        lock.release()
+
+# ------------------------------------------------------------------------------
@@ -24,15 +24,25 @@ import sys
 import blindca
 from OpenPGP import *
 
-if len(sys.argv) < 2:
-    print >>sys.stderr, 'usage: sign.py <SECRETKEYFILE>'
+args = sys.argv[1:]
+exponent = None
+if len(args) > 1 and args[0] == '--slot':
+    exponent = int(args[1])
+    args = args[2:]
+if len(args) < 1:
+    print >>sys.stderr, 'usage: sign.py [--slot <EXPONENT>] <SECRETKEYFILE>'
     sys.exit(2)
 
 caConfig = blindca.Config()
-caConfig.secretKey = sys.argv[1]
+caConfig.secretKey = args[0]
+if exponent is not None:
+    caConfig.batchExponents = (exponent,)
 ca = blindca.BlindCA(caConfig)
 
 blindMessageRadix = sys.stdin.read().strip()
 blindMessage = messages.fromRadix64(blindMessageRadix)
-blindSig = ca.sign(blindMessage)
+if exponent is None:
+    blindSig = ca.sign(blindMessage)
+else:
+    blindSig = ca.signBatch([(exponent, blindMessage)])[0]
 print blindSig.rep()
@@ -0,0 +1,434 @@
+#!/usr/bin/python
+__copyright__ = """
+Copyright (C) Timo Engel (timo-e@freenet.de), Berlin 2012.
+This program was written as part of a master thesis advised by
+Prof. Dr. Ruediger Weis at the Beuth University of Applied
+Sciences Berlin.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Benchmarks for the expensive operations. Run from the tests directory:
+    ./benchmark.py [name ...]
+"""
+
+import sys
+sys.path.append('..')
+
+import time
+import glob
+import os
+import multiprocessing
+
+import crypto
+import cryptobackend
+import encoding
+from OpenPGP import *
+
+KEYS = {1024: 'testdata/foo-bar.com_secret_openpgp.txt',
+        2048: 'testdata/foobar-bar.com_secret_2048.txt',
+        4096: 'testdata/foobar-bar.com_secret_4096.txt'}
+
+# ------------------------------------------------------------------------------
+
+def _measure(f, repeat):
+    """
+    Return the average time of f() in seconds.
+    """
+    start = time.time()
+    for i in range(0, repeat):
+        f()
+    return (time.time() - start) / repeat
+
+# ------------------------------------------------------------------------------
+
+def _loadKey(bits):
+    return messages.fromRadix64(open(KEYS[bits], 'r').read())
+
+# ------------------------------------------------------------------------------
+
+def benchCrt():
+    print 'RSA signature: pow(m, d, n) vs. CRT'
+    for bits in sorted(KEYS):
+        key = _loadKey(bits).packets[TAG_SECKEY]
+        m = crypto.randomInt(key.n.value - 1)
+        repeat = 2 ** 20 / bits ** 2 + 10
+        plain = _measure(lambda: crypto.rsaSign(m, key.d.value, key.n.value),
+                         repeat)
+        crt = _measure(lambda: key.sign(m), repeat)
+        print '  %4d bits: %8.2f ms %8.2f ms  speedup %.2f' % (
+            bits, plain * 1000, crt * 1000, plain / crt)
+
+# ------------------------------------------------------------------------------
+
+def benchBaseBlinding():
+    print 'CA signature: unblinded, new blinding pair, squared pair'
+    for bits in sorted(KEYS):
+        key = packets.RSAPrivateContext(_loadKey(bits))
+        m = crypto.randomInt(key.n - 1)
+        pair = crypto.rsaBaseBlindingPair(key.e, key.n)
+        repeat = 2 ** 20 / bits ** 2 + 10
+        plain = _measure(lambda: key.sign(m), repeat)
+        fresh = _measure(lambda: crypto.rsaSignBlinded(
+                m, key.crt, key.e, key.n,
+                crypto.rsaBaseBlindingPair(key.e, key.n)), repeat)
+        squared = _measure(lambda: crypto.rsaSignBlinded(
+                m, key.crt, key.e, key.n,
+                (pair[0] ** 2 % key.n, pair[1] ** 2 % key.n)), repeat)
+        print '  %4d bits: %8.2f ms %8.2f ms %8.2f ms  overhead %.1f%%' % (
+            bits, plain * 1000, fresh * 1000, squared * 1000,
+            (squared / plain - 1) * 100)
+
+# ------------------------------------------------------------------------------
+
+def benchKeygen():
+    print 'RSA key generation: keys per minute by size and processes'
+    for bits in (1024, 2048, 4096):
+        repeat = 2 ** 24 / bits ** 2 + 1
+        t = _measure(lambda: crypto.rsaGenerate(bits), repeat)
+        print '  %4d bits, PyCrypto:     %8.1f keys/min' % (bits, 60 / t)
+        for processes in (1, 2, 4, multiprocessing.cpu_count()):
+            t = _measure(lambda: crypto.rsaGenerateParallel(
+                    bits, processes=processes), repeat)
+            print '  %4d bits, %2d processes: %8.1f keys/min' % (bits,
+                                                               processes,
+                                                               60 / t)
+
+# ------------------------------------------------------------------------------
+
+def benchMultiPrime():
+    print 'RSA CRT signature: 2 primes vs. 3 primes'
+    for bits in (2048, 4096):
+        key2 = packets.RSAPrivateContext(_loadKey(bits))
+        key3 = packets.RSAPrivateContext(generateKey(bits, 3)[1])
+        m = crypto.randomInt(key2.n - 1)
+        repeat = 2 ** 20 / bits ** 2 + 10
+        two = _measure(lambda: key2.sign(m), repeat)
+        three = _measure(lambda: key3.sign(m), repeat)
+        print '  %4d bits: %8.2f ms %8.2f ms  speedup %.2f' % (
+            bits, two * 1000, three * 1000, two / three)
+
+# ------------------------------------------------------------------------------
+
+def benchBatch():
+    print 'Batch RSA: signatures per second by batch size'
+    exponents = (3, 5, 7, 11, 13, 17, 19, 23)
+    for bits in (2048, 4096):
+        key = packets.RSAPrivateContext(generateKey(bits, 2, exponents)[1])
+        repeat = 2 ** 20 / bits ** 2 + 3
+        for size in (1, 2, 4, 8):
+            ms = [crypto.randomInt(key.n - 1) for i in range(0, size)]
+            if size == 1:
+                t = _measure(lambda: key.sign(ms[0]), repeat)
+            else:
+                t = _measure(lambda: crypto.rsaBatchSign(ms, exponents[:size],
+                                                         key.crt, key.n),
+                             repeat)
+            print '  %4d bits, batch %d: %8.1f signatures/s' % (bits, size,
+                                                               size / t)
+
+# ------------------------------------------------------------------------------
+
+def benchScreen():
+    print 'RSA verification: one by one vs. batch screening'
+    for bits in (2048, 4096):
+        key = packets.RSAPrivateContext(_loadKey(bits))
+        for size in (16, 64, 256):
+            ms = [crypto.randomInt(key.n - 1) for i in range(0, size)]
+            sigs = [key.sign(m) for m in ms]
+            single = _measure(lambda: [crypto.rsaVerify(s, m, key.e, key.n)
+                                       for s, m in zip(sigs, ms)], 3)
+            batch = _measure(lambda: crypto.rsaBatchScreen(sigs, ms, key.e,
+                                                           key.n), 3)
+            print '  %4d bits, %3d signatures: %8.2f ms %8.2f ms  speedup %.2f' % (
+                bits, size, single * 1000, batch * 1000, single / batch)
+
+# ------------------------------------------------------------------------------
+
+def benchUnblind():
+    print 'RSA unblinding: one inversion per signature vs. batch inversion'
+    for bits in (2048, 4096):
+        key = packets.RSAPrivateContext(_loadKey(bits))
+        for size in (10, 100, 1000):
+            rs = [crypto.randomInt(key.n - 1) for i in range(0, size)]
+            ss = [crypto.randomInt(key.n - 1) for i in range(0, size)]
+            single = _measure(lambda: [crypto.rsaUnblind(r, key.n, s)
+                                       for r, s in zip(rs, ss)], 3)
+            batch = _measure(lambda: crypto.rsaUnblindMany(rs, key.n, ss), 3)
+            print '  %4d bits, %4d signatures: %8.2f ms %8.2f ms  speedup %.2f' % (
+                bits, size, single * 1000, batch * 1000, single / batch)
+
+# ------------------------------------------------------------------------------
+
+def _i2bLoop(i, octets=0):
+    b = []
+    value = i
+    while True:
+        b.append(chr(value % 256))
+        value /= 256
+        if octets != 0:
+            octets -= 1
+        if value == 0 and octets == 0:
+            break
+    b.reverse()
+    return ''.join(b)
+
+# ------------------------------------------------------------------------------
+
+def _b2iLoop(b):
+    value = 0
+    lenb = len(b)
+    for i in range(0, lenb):
+        shift = (lenb - i - 1) * 8
+        value += ord(b[i]) << shift
+    return value
+
+# ------------------------------------------------------------------------------
+
+def benchCodec():
+    print 'Integer/byte conversion: byte loop vs. binascii'
+    for bits in sorted(KEYS):
+        i = crypto.randomInt(2 ** bits - 1)
+        b = crypto.i2b(i, bits / 8)
+        repeat = 2 ** 22 / bits
+        for name, loop, fast in (('i2b', lambda: _i2bLoop(i, bits / 8),
+                                  lambda: crypto.i2b(i, bits / 8)),
+                                 ('b2i', lambda: _b2iLoop(b),
+                                  lambda: crypto.b2i(b))):
+            before = _measure(loop, repeat)
+            after = _measure(fast, repeat)
+            print '  %4d bits, %s: %8.2f us %8.2f us  speedup %.1f' % (
+                bits, name, before * 1e6, after * 1e6, before / after)
+
+# ------------------------------------------------------------------------------
+
+def benchS2K():
+    print 'Unlocking encrypted secret keys (S2K and CFB)'
+    for name in sorted(glob.glob('testdata/secretkey_*.txt')):
+        data = open(name, 'r').read()
+        s2k = messages.fromRadix64(data, lambda: 'secret').packets[TAG_SECKEY].s2k
+        t = _measure(lambda: messages.fromRadix64(data, lambda: 'secret'), 5)
+        print '  %-28s count %8d: %8.2f ms' % (os.path.basename(name),
+                                                s2k.count, t * 1000)
+    s2k = elements.S2KElement()
+    s2k.count = 65011712
+    t = _measure(lambda: s2k.generateKey('secret', crypto.SYMALGORITHM_AES256),
+                 1)
+    print '  %-28s count %8d: %8.2f ms' % ('SHA-1, AES-256', s2k.count,
+                                            t * 1000)
+
+# ------------------------------------------------------------------------------
+
+def benchBackend():
+    print 'Crypto backends: RSA, key generation, ciphers and hashes'
+    key = packets.RSAPrivateContext(_loadKey(2048))
+    m = crypto.randomInt(key.n - 1)
+    data = 2 ** 20 * 'x'
+    for name in cryptobackend.available():
+        backend = cryptobackend.load(name)
+        print '  %s' % name
+        t = _measure(lambda: backend.modExp(m, key.d, key.n), 10)
+        print '    2048 bits, pow(m, d, n): %8.2f ms' % (t * 1000)
+        t = _measure(lambda: backend.signCrt(m, key.crt), 20)
+        print '    2048 bits, CRT:          %8.2f ms' % (t * 1000)
+        t = _measure(lambda: backend.modExp(m, key.e, key.n), 100)
+        print '    2048 bits, pow(s, e, n): %8.2f ms' % (t * 1000)
+        t = _measure(lambda: backend.generate(2048, 65537,
+                                              crypto.randomBytes), 3)
+        print '    2048 bits, keygen:       %8.1f keys/min' % (60 / t)
+        for cipher, size, blocksize in (('AES', 32, 16), ('CAST5', 16, 8)):
+            t = _measure(lambda: backend.cipherCFB(
+                    cipher, size * 'k', blocksize * '\x00').encrypt(data), 5)
+            print '    %-6s CFB:              %8.1f MB/s' % (cipher, 1 / t)
+        t = _measure(lambda: backend.hashNew('sha256', data).digest(), 5)
+        print '    SHA-256:                 %8.1f MB/s' % (1 / t)
+
+# ------------------------------------------------------------------------------
+
+def benchGmpy2():
+    print 'Big integers: Python vs. gmpy2'
+    gmpy2 = crypto.gmpy2
+    if gmpy2 is None:
+        print '  gmpy2 is not installed'
+        return
+    backend = cryptobackend.Backend()
+    for bits in sorted(KEYS):
+        key = packets.RSAPrivateContext(_loadKey(bits))
+        m = crypto.randomInt(key.n - 1)
+        r = crypto.randomInt(key.n - 1)
+        repeat = 2 ** 20 / bits ** 2 + 10
+        for name, f in (('sign', lambda: backend.modExp(m, key.d, key.n)),
+                        ('CRT', lambda: backend.signCrt(m, key.crt)),
+                        ('verify', lambda: backend.modExp(m, key.e, key.n)),
+                        ('modInverse', lambda: crypto.modInverse(r, key.n)),
+                        ('gcd', lambda: crypto.gcd(r, key.n))):
+            try:
+                crypto.gmpy2 = cryptobackend.gmpy2 = None
+                before = _measure(f, repeat)
+            finally:
+                crypto.gmpy2 = cryptobackend.gmpy2 = gmpy2
+            after = _measure(f, repeat)
+            print '  %4d bits, %-10s: %8.3f ms %8.3f ms  speedup %.1f' % (
+                bits, name, before * 1000, after * 1000, before / after)
+
+# ------------------------------------------------------------------------------
+
+def benchNym():
+    print 'Nyms: RSA 2048 vs. Ed25519'
+    for name, generate in (('RSA 2048', lambda: generateKey(2048)),
+                           ('Ed25519', generateEd25519Key)):
+        publicKey, secretKey = generate()
+        nym = createNym('Foo', secretKey)
+        keygen = _measure(generate, 3)
+        sign = _measure(lambda: createNym('Foo', secretKey), 10)
+        verify = _measure(nym.verifySelfSignature, 10)
+        print ('  %-8s: key %8.2f ms  self signature %6.2f ms  check %6.2f ms'
+               '  packet %3d octets' % (name, keygen * 1000, sign * 1000,
+                                        verify * 1000, len(nym.rep())))
+
+# ------------------------------------------------------------------------------
+
+def benchHash():
+    print 'Hash throughput: 1 MiB message, 100 byte message (nym sized)'
+    large = crypto.randomBytes(2 ** 20)
+    small = crypto.randomBytes(100)
+    for algorithm in sorted(crypto.HASH_SIZE):
+        try:
+            crypto.hash(small, algorithm)
+        except Exception, e:
+            print '  %-16s: %s' % (elements.hashToString(algorithm), e)
+            continue
+        t = _measure(lambda: crypto.hash(large, algorithm), 20)
+        ts = _measure(lambda: crypto.hash(small, algorithm), 20000)
+        print '  %-16s: %8.1f MB/s %8.2f us' % (
+            elements.hashToString(algorithm), len(large) / t / 1e6, ts * 1e6)
+
+# ------------------------------------------------------------------------------
+
+def _mgfConcat(mgfSeed, maskLen, algorithm):
+    hLen = crypto.HASH_SIZE[algorithm] / 8
+    T = ""
+    for counter in range(0, (maskLen + hLen - 1) / hLen):
+        T = T + crypto.hash(mgfSeed + crypto.i2bFixed(counter, 4), algorithm)
+    return T[0:maskLen]
+
+# ------------------------------------------------------------------------------
+
+def benchMgf():
+    print 'MGF1: hashing seed and counter vs. copying the seed state'
+    seed = crypto.randomBytes(32)
+    for algorithm in (crypto.HASH_SHA1, crypto.HASH_SHA256,
+                      crypto.HASH_SHA512):
+        for maskLen in (223, 479, 4096):
+            before = _measure(lambda: _mgfConcat(seed, maskLen, algorithm),
+                              2000)
+            after = _measure(lambda: encoding.pssMGF(seed, maskLen, algorithm),
+                             2000)
+            print '  %-12s %5d bytes: %8.2f us %8.2f us  speedup %.2f' % (
+                elements.hashToString(algorithm), maskLen, before * 1e6,
+                after * 1e6, before / after)
+    key = packets.RSAPrivateContext(_loadKey(2048))
+    m = crypto.randomBytes(300)
+    em = encoding.pssEncode(m, 32, key.bits - 1, crypto.HASH_SHA256)
+    i = crypto.b2i(em)
+    print ('  PSS 2048 bits: encode %8.2f us  verify %8.2f us  '
+           'verify integer %8.2f us' % (
+        _measure(lambda: encoding.pssEncode(m, 32, key.bits - 1,
+                                            crypto.HASH_SHA256), 2000) * 1e6,
+        _measure(lambda: encoding.pssVerify(m, em, 32, key.bits - 1,
+                                            crypto.HASH_SHA256), 2000) * 1e6,
+        _measure(lambda: encoding.pssVerifyInt(m, i, 32, key.bits - 1,
+                                               crypto.HASH_SHA256), 2000) * 1e6))
+
+# ------------------------------------------------------------------------------
+
+def _ecashJoin(data, emBits, algorithm):
+    t = ((emBits - len(data) * 8)) / crypto.HASH_SIZE[algorithm]
+    xList = [data]
+    for xi in range(1, t + 1):
+        xList.append(crypto.hash(''.join(xList), algorithm))
+    return ''.join(xList)
+
+# ------------------------------------------------------------------------------
+
+def benchEcash():
+    print 'Ecash encoding: hashing the prefix vs. a running hash context'
+    data = crypto.randomBytes(20)
+    for bits in (2048, 4096):
+        for algorithm in (crypto.HASH_MD5, crypto.HASH_SHA1,
+                          crypto.HASH_SHA256):
+            before = _measure(lambda: _ecashJoin(data, bits, algorithm), 2000)
+            after = _measure(lambda: encoding.ecashInt(data, bits, algorithm),
+                             2000)
+            print '  %4d bits, %-12s: %8.2f us %8.2f us  speedup %.2f' % (
+                bits, elements.hashToString(algorithm), before * 1e6,
+                after * 1e6, before / after)
+
+# ------------------------------------------------------------------------------
+
+def benchPkcs15():
+    print 'PKCS#1 v1.5 encoding: bytes and b2i vs. integer template'
+    for bits in sorted(KEYS):
+        for algorithm in (crypto.HASH_SHA256, crypto.HASH_SHA512):
+            pHash = crypto.hash('Foobar', algorithm)
+            before = _measure(lambda: crypto.b2i(
+                    encoding.pkcs15(pHash, bits, algorithm)), 20000)
+            after = _measure(lambda: encoding.pkcs15Int(pHash, bits,
+                                                        algorithm), 20000)
+            print '  %4d bits, %-12s: %8.2f us %8.2f us  speedup %.2f' % (
+                bits, elements.hashToString(algorithm), before * 1e6,
+                after * 1e6, before / after)
+
+# ------------------------------------------------------------------------------
+
+def benchEncodeMany():
+    print 'Hash encoding of 1000 messages: hashEncode vs. hashEncodeMany'
+    data = [crypto.randomBytes(100) for i in range(0, 1000)]
+    for name, scheme in (('PKCS#1 v1.5', encoding.ENCODING_PKCS15),
+                         ('PSS', encoding.ENCODING_PKCSPSS),
+                         ('ecash', encoding.ENCODING_ECASH)):
+        before = _measure(lambda: [crypto.b2i(encoding.hashEncode(
+                        m, 2047, crypto.HASH_SHA256, scheme)) for m in data], 5)
+        after = _measure(lambda: encoding.hashEncodeMany(
+                data, 2047, crypto.HASH_SHA256, scheme), 5)
+        print '  2048 bits, %-12s: %8.2f ms %8.2f ms  speedup %.2f' % (
+            name, before * 1000, after * 1000, before / after)
+
+# ------------------------------------------------------------------------------
+
+BENCHMARKS = {'backend': benchBackend,
+              'baseblinding': benchBaseBlinding,
+              'batch': benchBatch,
+              'codec': benchCodec,
+              'crt': benchCrt,
+              'ecash': benchEcash,
+              'encodemany': benchEncodeMany,
+              'gmpy2': benchGmpy2,
+              'hash': benchHash,
+              'keygen': benchKeygen,
+              'mgf': benchMgf,
+              'multiprime': benchMultiPrime,
+              'nym': benchNym,
+              'pkcs15': benchPkcs15,
+              's2k': benchS2K,
+              'screen': benchScreen,
+              'unblind': benchUnblind}
+
+if __name__ == '__main__':
+    names = sys.argv[1:]
+    if len(names) == 0:
+        names = sorted(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
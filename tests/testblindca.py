@@ -23,6 +23,8 @@ import sys
 sys.path.append('..')
 
 import unittest
+import tempfile
+import threading
 
 import blindca
 import crypto
@@ -55,6 +57,118 @@ class TestBlindCa(unittest.TestCase):
                 self.ca.secretKey.packets[TAG_SECKEY].e.value,
                 self.ca.secretKey.packets[TAG_SECKEY].n.value))
 
+
+    def testBaseBlindingPool(self):
+        key = self.ca.key
+        pool = blindca.BaseBlindingPool(key, 2)
+        pool.RESEED = 3
+        pool.start()
+        pairs = [pool.pairs.get(timeout=10) for i in range(0, 7)]
+        pool.shutdown()
+        pool.join()
+        for v, vInverseE in pairs:
+            self.assertEqual(pow(v, key.e, key.n) * vInverseE % key.n, 1)
+        self.assertEqual(pairs[1][0], pairs[0][0] ** 2 % key.n)
+        self.assertEqual(pairs[2][0], pairs[1][0] ** 2 % key.n)
+        self.assertNotEqual(pairs[3][0], pairs[2][0] ** 2 % key.n)
+        self.assertEqual(len(set([v for v, vInverseE in pairs])), len(pairs))
+
+        # without precomputed pairs every signature draws a new one
+        self.assertFalse(self.ca.pool.isAlive())
+        self.caConfig.blindingPool = 2
+        ca = blindca.BlindCA(self.caConfig)
+        self.assertTrue(ca.pool.isAlive())
+        for c in (self.ca, ca, ca, ca):
+            packet = packets.BlindMessagePacket()
+            packet.m = elements.MPIElement(crypto.randomInt(key.n - 1))
+            sig = c.sign(messages.BlindMessageMessage.fromPackets((packet,)))
+            self.assertTrue(crypto.rsaVerify(sig.packets[TAG_BLINDSIG].s.value,
+                                             packet.m.value, key.e, key.n))
+        ca.shutdown()
+        self.assertFalse(ca.pool.isAlive())
+
+    def testSignBatch(self):
+        exponents = (3, 5, 7, 11)
+        publicKey, secretKey = generateKey(1024, 2, exponents)
+        keyFile = tempfile.NamedTemporaryFile(mode='w')
+        keyFile.write(secretKey.rep())
+        keyFile.flush()
+        caConfig = blindca.Config()
+        caConfig.secretKey = keyFile.name
+        caConfig.batchExponents = exponents
+        ca = blindca.BlindCA(caConfig)
+
+        n = publicKey.packets[TAG_PUBKEY].n.value
+        requests = []
+        for e in (3, 5, 7, 3, 11, 3):
+            packet = packets.BlindMessagePacket()
+            packet.m = elements.MPIElement(crypto.randomInt(n - 1))
+            requests.append((e, messages.BlindMessageMessage.fromPackets(
+                        (packet,))))
+        sigs = ca.signBatch(requests)
+        self.assertEqual(len(sigs), len(requests))
+        for (e, bm), sig in zip(requests, sigs):
+            self.assertTrue(crypto.rsaVerify(sig.packets[TAG_BLINDSIG].s.value,
+                                             bm.packets[TAG_BLINDMSG].m.value,
+                                             e, n))
+        self.assertRaises(Exception, ca.signBatch, [(13, requests[0][1])])
+
+        # batches stay valid with the base blinding pool running
+        caConfig.blindingPool = 4
+        ca = blindca.BlindCA(caConfig)
+        sigs = ca.signBatch(requests)
+        for (e, bm), sig in zip(requests, sigs):
+            self.assertTrue(crypto.rsaVerify(sig.packets[TAG_BLINDSIG].s.value,
+                                             bm.packets[TAG_BLINDMSG].m.value,
+                                             e, n))
+        ca.shutdown()
+
+        caConfig.batchExponents = (3, 9)
+        self.assertRaises(Exception, blindca.BlindCA, caConfig)
+
+    def testBatchSigner(self):
+        caConfig = blindca.Config()
+        caConfig.secretKey = 'testdata/foo-bar.com_secret_openpgp.txt'
+        caConfig.batchExponents = (3, 5, 11)
+        ca = blindca.BlindCA(caConfig)
+        batches = []
+        signBatch = ca.signBatch
+        def recordBatch(blindMessages):
+            batches.append(sorted([e for e, bm in blindMessages]))
+            return signBatch(blindMessages)
+        ca.signBatch = recordBatch
+        signer = blindca.BatchSigner(ca, 5)
+        signer.start()
+
+        # concurrent requests for all slots are signed in one batch
+        n = ca.key.n
+        results = {}
+        def request(e):
+            packet = packets.BlindMessagePacket()
+            packet.m = elements.MPIElement(crypto.randomInt(n - 1))
+            sig = signer.sign(e, messages.BlindMessageMessage.fromPackets(
+                    (packet,)))
+            results[e] = crypto.rsaVerify(sig.packets[TAG_BLINDSIG].s.value,
+                                          packet.m.value, e, n)
+        threads = [threading.Thread(target=request, args=(e,))
+                   for e in (3, 5, 11)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(batches, [[3, 5, 11]])
+        self.assertEqual(results, {3: True, 5: True, 11: True})
+
+        # a single request is signed when the window ends
+        signer.window = 0.01
+        request(5)
+        self.assertEqual(batches[-1], [5])
+        self.assertTrue(results[5])
+        self.assertRaises(Exception, request, 7)
+        signer.shutdown()
+        signer.join()
+        self.assertRaises(Exception, request, 3)
+
 # ------------------------------------------------------------------------------
 
 if __name__ == '__main__':
@@ -72,6 +72,173 @@ class TestBlinding(unittest.TestCase):
         self.assertTrue(sigTime.value >= publicKey.creationTime().value)
         self.assertTrue(sigTime.value <= publicKey.expirationTime().value)
 
+    def testHashPolicy(self):
+        caConfig = blindca.Config()
+        caConfig.secretKey = 'testdata/foo-bar.com_secret_openpgp.txt'
+        caConfig.publicKey = 'testdata/foo-bar.com_public_openpgp.txt'
+        caConfig.hashAlgorithms = (crypto.HASH_SHA512, crypto.HASH_SHA256)
+        ca = blindca.BlindCA(caConfig)
+        publicKey = ca.publicKey
+        self.assertTrue(publicKey.verifySignature())
+        self.assertEqual(blinding.hashPolicy(publicKey),
+                         (crypto.HASH_SHA512, crypto.HASH_SHA256))
+        self.assertEqual(blinding.hashPolicy(RSAPublicContext(publicKey)),
+                         (crypto.HASH_SHA512, crypto.HASH_SHA256))
+        data = 'The quick brown fox jumps over the lazy dog\n'
+
+        hashAlgorithm = blinding.hashPolicy(publicKey)[0]
+        r, hashtwo, sigTime, blinded = blinding.blind(
+            publicKey, None, data, hashAlgorithm=hashAlgorithm)
+        sig = blinding.unblind(publicKey, sigTime, r, hashtwo,
+                               ca.sign(blinded), hashAlgorithm=hashAlgorithm)
+        self.assertEqual(sig.packets[TAG_SIGNATURE].hashAlgorithm.value,
+                         crypto.HASH_SHA512)
+        self.assertTrue(verifySignature(data, sig, publicKey))
+        self.assertTrue(verifySignature(data, sig, publicKey,
+                                        blinding.hashPolicy(publicKey)))
+        self.assertFalse(verifySignature(data, sig, publicKey,
+                                         (crypto.HASH_SHA256,)))
+        self.assertEqual(screenSignatures([(data, sig)], publicKey,
+                                          (crypto.HASH_SHA256,)), [False])
+
+        # keys without a SHA-2 preference sign with SHA-256
+        caConfig.hashAlgorithms = (crypto.HASH_SHA1,)
+        self.assertRaises(Exception, blindca.BlindCA, caConfig)
+        caConfig.hashAlgorithms = ()
+        self.assertRaises(Exception, blindca.BlindCA, caConfig)
+        publicKey.setHashAlgorithms((crypto.HASH_SHA1,), ca.key)
+        self.assertEqual(blinding.hashPolicy(publicKey), (crypto.HASH_SHA256,))
+
+    def testExponentSlot(self):
+        publicKey, secretKey = generateKey(1024, 2, (3, 5))
+        signedKey = messages.fromRadix64(
+            open('testdata/foo-bar.com_public_openpgp.txt', 'r').read())
+        for tag in (TAG_USERID, TAG_SIGNATURE):
+            publicKey.packets[tag] = signedKey.packets[tag]
+        key = RSAPrivateContext(secretKey)
+        publicKey.setBatchExponents((3, 5), key)
+        data = 'The quick brown fox jumps over the lazy dog\n'
+
+        r, hashTwo, sigTime, blinded = blinding.blind(publicKey, None, data, 5)
+        blindSig = crypto.rsaBatchSign([blinded.packets[TAG_BLINDMSG].m.value],
+                                       [5], key.crt, key.n)[0]
+        packet = packets.BlindSignaturePacket()
+        packet.s = elements.MPIElement(blindSig)
+        message = messages.BlindSignatureMessage.fromPackets((packet,))
+        sig = blinding.unblind(publicKey, sigTime, r, hashTwo, message, 5)
+        sigPacket = sig.packets[TAG_SIGNATURE]
+        self.assertEqual(sigPacket.hashedSubpackets.notation(
+                subpackets.NOTATION_EXPONENT), '5')
+        issuer = sigPacket.subpackets.get(subpackets.IssuerSubpacket.TAG)
+        self.assertEqual(issuer.keyid.rep(), RSAPublicContext(publicKey).keyID)
+        self.assertTrue(verifySignature(data, sig, publicKey))
+        self.assertTrue(verifySignature(data, sig,
+                                        RSAPublicContext(publicKey)))
+        self.assertEqual(screenSignatures([(data, sig)], publicKey), [True])
+
+        # only slots published with the key are accepted
+        publicKey.setBatchExponents((3,), key)
+        self.assertTrue(publicKey.verifySignature())
+        self.assertFalse(verifySignature(data, sig, publicKey))
+        self.assertEqual(screenSignatures([(data, sig)], publicKey), [False])
+        del publicKey.packets[TAG_SIGNATURE]
+        self.assertFalse(verifySignature(data, sig, publicKey))
+
+    def testSignBatchPublished(self):
+        caConfig = blindca.Config()
+        caConfig.secretKey = 'testdata/foo-bar.com_secret_openpgp.txt'
+        caConfig.publicKey = 'testdata/foo-bar.com_public_openpgp.txt'
+        caConfig.batchExponents = (3, 5, 11)
+        ca = blindca.BlindCA(caConfig)
+        # clients read the slots from the published key
+        publicKey = messages.fromRadix64(ca.publicKey.rep())
+        self.assertTrue(publicKey.verifySignature())
+        self.assertEqual(publicKey.batchExponents(), (3, 5, 11))
+        self.assertEqual(RSAPublicContext(publicKey).batchExponents(),
+                         (3, 5, 11))
+        data = ['Message %d\n' % i for i in range(0, 4)]
+        slots = (3, 5, 11, 3)
+
+        blindings = []
+        for d, e in zip(data, slots):
+            blindings.append(blinding.blind(publicKey, None, d, e))
+        blindSigs = ca.signBatch([(e, b[3]) for e, b in zip(slots, blindings)])
+        pairs = []
+        for d, e, (r, hashTwo, sigTime, blinded), blindSig in zip(
+                data, slots, blindings, blindSigs):
+            sig = blinding.unblind(publicKey, sigTime, r, hashTwo, blindSig, e)
+            sig = messages.fromRadix64(sig.rep())
+            self.assertTrue(sigTime.value <= publicKey.expirationTime().value)
+            self.assertTrue(verifySignature(d, sig, publicKey))
+            pairs.append((d, sig))
+        self.assertEqual(screenSignatures(pairs, publicKey), [True] * 4)
+
+        # clients blind with a key context, as idclient does
+        context = RSAPublicContext(publicKey)
+        pool = blinding.BlindingPool(context, 1, 5)
+        self.assertEqual(pool.key.e, 5)
+        self.assertEqual(pool.key.keyID, context.keyID)
+        factor = pool.get()
+        r, hashTwo, sigTime, blinded = blinding.blind(context, None, data[0],
+                                                      5, factor)
+        self.assertTrue(sigTime.value <= context.expirationTime().value)
+        blindSig = ca.signBatch([(5, blinded)])[0]
+        sig = blinding.unblind(context, sigTime, r, hashTwo, blindSig, 5,
+                               factor)
+        self.assertTrue(verifySignature(data[0], sig, publicKey))
+        pairs[1] = (data[0], pairs[1][1])
+        self.assertEqual(screenSignatures(pairs, publicKey),
+                         [True, False, True, True])
+
+    def testUnblindMany(self):
+        caConfig = blindca.Config()
+        caConfig.secretKey = 'testdata/foo-bar.com_secret_openpgp.txt'
+        caConfig.publicKey = 'testdata/foo-bar.com_public_openpgp.txt'
+        ca = blindca.BlindCA(caConfig)
+        publicKey  = messages.fromRadix64(
+            open('testdata/foo-bar.com_public_openpgp.txt', 'r').read())
+        data = ['Message %d\n' % i for i in range(0, 5)]
+
+        blindings = []
+        for d in data:
+            r, hashTwo, sigTime, blinded = blinding.blind(publicKey, None, d)
+            blindings.append((sigTime, r, hashTwo, ca.sign(blinded)))
+        sigs = blinding.unblindMany(publicKey, blindings)
+        self.assertEqual(len(sigs), len(data))
+        for d, sig, (sigTime, r, hashTwo, blindSig) in zip(data, sigs,
+                                                          blindings):
+            self.assertTrue(verifySignature(d, sig, publicKey))
+            self.assertEqual(sig.rep(), blinding.unblind(
+                    publicKey, sigTime, r, hashTwo, blindSig).rep())
+        self.assertEqual(blinding.unblindMany(publicKey, []), [])
+
+    def testBlindingPool(self):
+        caConfig = blindca.Config()
+        caConfig.secretKey = 'testdata/foo-bar.com_secret_openpgp.txt'
+        caConfig.publicKey = 'testdata/foo-bar.com_public_openpgp.txt'
+        ca = blindca.BlindCA(caConfig)
+        publicKey  = messages.fromRadix64(
+            open('testdata/foo-bar.com_public_openpgp.txt', 'r').read())
+        n = publicKey.packets[TAG_PUBKEY].n.value
+        e = publicKey.packets[TAG_PUBKEY].e.value
+        data = 'The quick brown fox jumps over the lazy dog\n'
+
+        pool = blinding.BlindingPool(publicKey, 2)
+        pool.start()
+        for i in range(0, 4):
+            factor = pool.get()
+            r, re, rInverse = factor
+            self.assertEqual(pow(r, e, n), re)
+            self.assertEqual(r * rInverse % n, 1)
+            r, hashTwo, sigTime, blinded = blinding.blind(publicKey, None, data,
+                                                          factor=factor)
+            self.assertEqual(r, factor[0])
+            sig = blinding.unblind(publicKey, sigTime, r, hashTwo,
+                                   ca.sign(blinded), factor=factor)
+            self.assertTrue(verifySignature(data, sig, publicKey))
+        pool.shutdown()
+        pool.join()
+
 # ------------------------------------------------------------------------------
 
 if __name__ == '__main__':
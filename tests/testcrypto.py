@@ -24,6 +24,7 @@ sys.path.append('..')
 
 import unittest
 import crypto
+import cryptobackend
 
 # ------------------------------------------------------------------------------
 
@@ -44,6 +45,101 @@ class TestCrypto(unittest.TestCase):
         self.assertTrue(crypto.rsaVerify(s, m, e, n))
 
 
+    def testRsaCrt(self):
+        e = 17
+        n = 3233
+        d = 2753
+        p = 61
+        q = 53
+        u = crypto.modInverse(p, q)
+        crt = crypto.rsaCrtParameters(d, p, q, u)
+        for m in (0, 1, 3000, 3232, 5000):
+            self.assertEqual(crypto.rsaSignCrt(m, crt, e, n),
+                             crypto.rsaSign(m, d, n))
+        self.assertRaises(Exception, crypto.rsaSignCrt, 3000,
+                          (p, q, 7, 11, u, ()), e, n)
+
+        r = 67
+        n = p * q * r
+        d = crypto.modInverse(e, (p - 1) * (q - 1) * (r - 1))
+        crt = crypto.rsaCrtParameters(d, p, q, u, (r,))
+        for m in (0, 1, 3000, 12345, n - 1):
+            self.assertEqual(crypto.rsaSignCrt(m, crt, e, n),
+                             crypto.rsaSign(m, d, n))
+
+    def testRsaSignBlinded(self):
+        n, e, d, p, q, u, primes = crypto.rsaGenerateMultiPrime(512, 2)
+        crt = crypto.rsaCrtParameters(d, p, q, u)
+        v, vInverseE = crypto.rsaBaseBlindingPair(e, n)
+        self.assertEqual(pow(v, e, n) * vInverseE % n, 1)
+        for m in (0, 1, 3000, crypto.randomInt(n - 1), n - 1):
+            self.assertEqual(crypto.rsaSignBlinded(m, crt, e, n,
+                                                   (v, vInverseE)),
+                             crypto.rsaSign(m, d, n))
+            # the next pair is the square of the previous one
+            v, vInverseE = v * v % n, vInverseE * vInverseE % n
+
+
+    def testRsaBatchSign(self):
+        n, e, d, p, q, u, primes = crypto.rsaGenerateMultiPrime(
+            1024, 2, exponents=(3, 5, 7, 11, 13))
+        crt = crypto.rsaCrtParameters(d, p, q, u, primes)
+        for es in ((3,), (3, 5), (3, 5, 7, 11, 13), (13, 7, 3)):
+            ms = [crypto.randomInt(n - 1) for e in es]
+            sigs = crypto.rsaBatchSign(ms, es, crt, n)
+            self.assertEqual(len(sigs), len(ms))
+            for s, m, e in zip(sigs, ms, es):
+                self.assertTrue(crypto.rsaVerify(s, m, e, n))
+
+        # the full exponentiation only sees the blinded root
+        es = (3, 5, 7)
+        ms = [crypto.randomInt(n - 1) for e in es]
+        exponentiated = []
+        rsaSignCrt = crypto.rsaSignCrt
+        def recordSignCrt(m, crt, e, n):
+            exponentiated.append(m)
+            return rsaSignCrt(m, crt, e, n)
+        crypto.rsaSignCrt = recordSignCrt
+        try:
+            sigs = crypto.rsaBatchSign(ms, es, crt, n)
+        finally:
+            crypto.rsaSignCrt = rsaSignCrt
+        self.assertEqual(len(exponentiated), 1)
+        self.assertNotEqual(exponentiated[0], crypto._batchTree(ms, es, n)[1])
+        for s, m, e in zip(sigs, ms, es):
+            self.assertTrue(crypto.rsaVerify(s, m, e, n))
+
+
+    def testMultiExp(self):
+        n = 1000003
+        bases = [2, 3, 5, 7, 11]
+        exponents = [123, 0, 65535, 1, 40000]
+        r = 1
+        for b, x in zip(bases, exponents):
+            r = r * pow(b, x, n) % n
+        self.assertEqual(crypto.multiExp(bases, exponents, n, 16), r)
+
+
+    def testRsaBatchScreen(self):
+        n, e, d, p, q, u, primes = crypto.rsaGenerateMultiPrime(1024, 2)
+        ms = [crypto.randomInt(n - 1) for i in range(0, 9)]
+        sigs = [crypto.rsaSign(m, d, n) for m in ms]
+        self.assertEqual(crypto.rsaBatchScreen(sigs, ms, e, n), [True] * 9)
+        self.assertEqual(crypto.rsaBatchScreen([], [], e, n), [])
+        sigs[2] = (sigs[2] + 1) % n
+        sigs[7] = sigs[0]
+        self.assertEqual(crypto.rsaBatchScreen(sigs, ms, e, n),
+                         [i not in (2, 7) for i in range(0, 9)])
+        # screening cannot tell n - s from s, only rsaVerify can
+        sigs = [crypto.rsaSign(m, d, n) for m in ms]
+        sigs[3] = n - sigs[3]
+        sigs[5] = n - sigs[5]
+        self.assertFalse(crypto.rsaVerify(sigs[3], ms[3], e, n))
+        passed = [crypto.rsaBatchScreen(sigs, ms, e, n)[3]
+                  for i in range(0, 32)]
+        self.assertTrue(True in passed)
+
+
     def testForge(self):
         e = 17
         n = 3233
@@ -67,6 +163,26 @@ class TestCrypto(unittest.TestCase):
                                          crypto.modInverse(m1, n), e, n))
 
 
+    def testI2b(self):
+        self.assertEqual(crypto.i2b(0), '\x00')
+        self.assertEqual(crypto.i2b(1), '\x01')
+        self.assertEqual(crypto.i2b(0x1234), '\x12\x34')
+        self.assertEqual(crypto.i2b(0x123), '\x01\x23')
+        self.assertEqual(crypto.i2b(0x123, 4), '\x00\x00\x01\x23')
+        self.assertEqual(crypto.i2b(0x123456, 2), '\x12\x34\x56')
+        self.assertEqual(crypto.i2b(2 ** 4096 - 1), '\xff' * 512)
+        self.assertEqual(crypto.i2bFixed(0, 4), '\x00\x00\x00\x00')
+        self.assertEqual(crypto.i2bFixed(0x123, 2), '\x01\x23')
+        self.assertRaises(Exception, crypto.i2bFixed, 0x123456, 2)
+        self.assertEqual(crypto.b2i(''), 0)
+        self.assertEqual(crypto.b2i('\x00\x01\x23'), 0x123)
+        self.assertEqual(crypto.b2i('\xff' * 512), 2 ** 4096 - 1)
+        for bits in (1024, 2048, 4096):
+            i = crypto.randomInt(2 ** bits)
+            self.assertEqual(crypto.b2i(crypto.i2b(i)), i)
+            self.assertEqual(len(crypto.i2b(i, bits / 8 + 1)), bits / 8 + 1)
+
+
     def testHash(self):
         self.assertEqual(crypto.hash_sha1('abc').encode('hex'),
                          'a9993e364706816aba3e25717850c26c9cd0d89d')
@@ -84,6 +200,30 @@ class TestCrypto(unittest.TestCase):
                         'ee64b55d39a2192992a274fc1a836ba3c23a3feebbd454d442364'
                         '3ce80e2a9ac94fa54ca49f')
 
+    def testHashNew(self):
+        for algorithm in (crypto.HASH_MD5, crypto.HASH_SHA1, crypto.HASH_RIPEMD,
+                          crypto.HASH_SHA256, crypto.HASH_SHA384,
+                          crypto.HASH_SHA512, crypto.HASH_SHA224):
+            h = crypto.hashNew(algorithm, 'a')
+            c = h.copy()
+            h.update('bc')
+            self.assertEqual(h.digest(), crypto.hash('abc', algorithm))
+            self.assertEqual(len(h.digest()) * 8, crypto.HASH_SIZE[algorithm])
+            c.update('b')
+            self.assertEqual(c.digest(), crypto.hash('ab', algorithm))
+        self.assertEqual(crypto.hash('abc', crypto.HASH_RIPEMD).encode('hex'),
+                         '8eb208f7e05d987a9b044a8e98c6b087f15a0bfc')
+        self.assertRaises(Exception, crypto.hashNew, 99)
+
+    def testHashAlgorithmFromName(self):
+        self.assertEqual(crypto.hashAlgorithmFromName('SHA512'),
+                         crypto.HASH_SHA512)
+        self.assertEqual(crypto.hashAlgorithmFromName(' sha-256'),
+                         crypto.HASH_SHA256)
+        self.assertEqual(crypto.hashAlgorithmFromName('RIPEMD160'),
+                         crypto.HASH_RIPEMD)
+        self.assertRaises(Exception, crypto.hashAlgorithmFromName, 'SHA3')
+
     def testGcd(self):
         self.assertEqual(crypto.gcd(3, 9), 3)
         self.assertEqual(crypto.gcd(4, 10), 2)
@@ -106,6 +246,15 @@ class TestCrypto(unittest.TestCase):
         self.assertRaises(Exception, crypto.modInverse, (2, 10))
 
 
+    def testModInverseMany(self):
+        us = [5, 3, 9, 11, 1]
+        self.assertEqual(crypto.modInverseMany(us, 14),
+                         [crypto.modInverse(u, 14) for u in us])
+        self.assertEqual(crypto.modInverseMany([5], 14), [3])
+        self.assertEqual(crypto.modInverseMany([], 14), [])
+        self.assertRaises(Exception, crypto.modInverseMany, [5, 2], 14)
+
+
     def testRandom(self):
         r1 = crypto.randomBytes(10)
         self.assertEqual(len(r1), 10)
@@ -124,6 +273,41 @@ class TestCrypto(unittest.TestCase):
         crypto.rsaGenerate(1024)
 
 
+    def testRsaGenerateMultiPrime(self):
+        n, e, d, p, q, u, primes = crypto.rsaGenerateMultiPrime(1024, 3)
+        self.assertEqual(n.bit_length(), 1024)
+        self.assertEqual(len(primes), 1)
+        self.assertEqual(p * q * primes[0], n)
+        self.assertEqual(p * u % q, 1)
+        crt = crypto.rsaCrtParameters(d, p, q, u, primes)
+        self.assertTrue(crypto.rsaVerify(crypto.rsaSignCrt(1234, crt, e, n),
+                                         1234, e, n))
+
+
+    def testRsaGenerateParallel(self):
+        for processes in (1, 2):
+            n, e, d, p, q, u, primes = crypto.rsaGenerateParallel(
+                1024, processes=processes, seed='test vector')
+            self.assertEqual(crypto.hash_sha1(crypto.i2b(n)).encode('hex'),
+                             '8e080162b01e1b8dcf69bf7f97544f0dff2931a5')
+            self.assertEqual(p * q, n)
+            self.assertEqual(p * u % q, 1)
+            self.assertEqual(primes, ())
+            self.assertTrue(crypto.rsaVerify(crypto.rsaSign(1234, d, n),
+                                             1234, e, n))
+        n, e, d, p, q, u, primes = crypto.rsaGenerateParallel(
+            1536, 3, exponents=(3,), processes=2, seed='test vector')
+        self.assertEqual(crypto.hash_sha1(crypto.i2b(n)).encode('hex'),
+                         '7606f46f595c50aaebdfb87ce189d61f6a782e4f')
+        self.assertEqual(p * q * primes[0], n)
+        for r in (p, q, primes[0]):
+            self.assertEqual(crypto.gcd(3, r - 1), 1)
+        n, e, d, p, q, u, primes = crypto.rsaGenerateParallel(1024,
+                                                              processes=2)
+        self.assertEqual(n.bit_length(), 1024)
+        self.assertEqual(p * q, n)
+
+
     def testCFB(self):
         key = 'ebb7109b9203ce8570722a947d548913'.decode('hex')
         iv = '4b31d8f203ffc5d6'.decode('hex')
@@ -197,6 +381,28 @@ class TestCrypto(unittest.TestCase):
                                            crypto.SYMALGORITHM_AES128),
                          'f0df6cc895ab3dfd7f30b4ebe6545ea442ec'.decode('hex'))
 
+    def testCFBBlocks(self):
+        for algorithm in (crypto.SYMALGORITHM_3DES, crypto.SYMALGORITHM_CAST5,
+                          crypto.SYMALGORITHM_BLOWFISH,
+                          crypto.SYMALGORITHM_AES128,
+                          crypto.SYMALGORITHM_AES256):
+            key = crypto.randomBytes(crypto.SYMALGORITHM_KEYSIZE[algorithm])
+            blocksize = crypto.SYMALGORITHM_BLOCKSIZE[algorithm]
+            iv = crypto.randomBytes(blocksize)
+            m = crypto.randomBytes(3 * blocksize + 5)
+            c = crypto.encryptCFB(key, m, iv, algorithm)
+            self.assertEqual(len(c), len(m))
+            fr = iv
+            for i in range(0, len(m), blocksize):
+                fre = crypto.symEncrypt(key, fr, algorithm)
+                fr = c[i:i + blocksize]
+                self.assertEqual(fr, ''.join(
+                        chr(ord(a) ^ ord(b)) for a, b in zip(fre,
+                                                             m[i:i + blocksize])))
+            self.assertEqual(crypto.decryptCFB(key, c, iv, algorithm), m)
+            self.assertEqual(crypto.decryptCFB(key, c[:blocksize + 1], iv,
+                                               algorithm), m[:blocksize + 1])
+
     def testSymEncryptDecrypt(self):
         m = 'Foobarrr'
         key = '1234567890123456'
@@ -227,6 +433,105 @@ class TestCrypto(unittest.TestCase):
         c = crypto.symEncrypt(key,m, crypto.SYMALGORITHM_AES256)
         self.assertEqual(m, crypto.symDecrypt(key, c, crypto.SYMALGORITHM_AES256))
 
+    def testEd25519(self):
+        # RFC 8032, 7.1, test 2
+        secret = ('4ccd089b28ff96da9db6c346ec114e0f'
+                  '5b8a319f35aba624da8cf6ed4fb8a6fb').decode('hex')
+        public = ('3d4017c3e843895a92b70aa74d1b7ebc'
+                  '9c982ccf2ec4968cc0cd55f12af4660c').decode('hex')
+        signature = ('92a009a9f0d4cab8720e820b5f642540'
+                     'a2b27b5416503f8fb3762223ebdb69da'
+                     '085ac1e43e15996e458f3613d0f11d8c'
+                     '387b2eaeb4302aeeb00d291612bb0c00').decode('hex')
+        for name in cryptobackend.available():
+            backend = cryptobackend.load(name)
+            self.assertEqual(backend.ed25519PublicKey(secret), public)
+            self.assertEqual(backend.ed25519Sign(secret, '\x72'), signature)
+            self.assertTrue(backend.ed25519Verify(public, '\x72', signature))
+            self.assertFalse(backend.ed25519Verify(public, '\x73', signature))
+            self.assertFalse(backend.ed25519Verify(public, '\x72',
+                                                   signature[:63] + '\x10'))
+            self.assertFalse(backend.ed25519Verify(public, '\x72',
+                                                   signature[:32]))
+        secret, public = crypto.ed25519Generate()
+        signature = crypto.ed25519Sign(secret, 'Foobar')
+        self.assertTrue(crypto.ed25519Verify(public, 'Foobar', signature))
+        self.assertFalse(crypto.ed25519Verify(public, 'Foobaz', signature))
+
+        # without a native implementation only verification is possible
+        eddsa = cryptobackend.eddsa
+        cryptobackend.eddsa = None
+        try:
+            backend = cryptobackend.Backend()
+            self.assertFalse(backend.ed25519Supported())
+            self.assertRaises(Exception, backend.ed25519PublicKey, secret)
+            self.assertRaises(Exception, backend.ed25519Sign, secret, 'Foobar')
+            self.assertTrue(backend.ed25519Verify(public, 'Foobar', signature))
+            self.assertFalse(backend.ed25519Verify(public, 'Foobaz',
+                                                   signature))
+            if not crypto.backend.ed25519Supported():
+                self.assertRaises(Exception, crypto.ed25519Generate)
+        finally:
+            cryptobackend.eddsa = eddsa
+
+    def testGmpy2(self):
+        gmpy2 = crypto.gmpy2
+        if gmpy2 is None:
+            return
+        n, e, d, p, q, u, primes = crypto.rsaGenerateMultiPrime(1024, 2)
+        us = [crypto.randomInt(n - 1) for i in range(0, 10)]
+        fast = ([crypto.modInverse(x, n) for x in us],
+                [crypto.gcd(x, n) for x in us + [p * 12345, q]],
+                cryptobackend.Backend().modExp(us[0], d, n))
+        self.assertRaises(Exception, crypto.modInverse, p * 3, n)
+        try:
+            crypto.gmpy2 = None
+            cryptobackend.gmpy2 = None
+            self.assertEqual(fast[0], [crypto.modInverse(x, n) for x in us])
+            self.assertEqual(fast[1], [crypto.gcd(x, n)
+                                       for x in us + [p * 12345, q]])
+            self.assertEqual(fast[2],
+                             cryptobackend.Backend().modExp(us[0], d, n))
+            self.assertRaises(Exception, crypto.modInverse, p * 3, n)
+        finally:
+            crypto.gmpy2 = gmpy2
+            cryptobackend.gmpy2 = gmpy2
+        self.assertEqual(type(crypto.modInverse(3, 7)), int)
+
+    def testBackends(self):
+        names = cryptobackend.available()
+        self.assertTrue(len(names) > 0)
+        n, e, d, p, q, u, primes = crypto.rsaGenerateMultiPrime(1024, 2)
+        crt = crypto.rsaCrtParameters(d, p, q, u)
+        m = crypto.randomInt(n - 1)
+        key = 16 * 'k'
+        iv = 16 * 'i'
+        data = 100 * 'x'
+        for name in names:
+            backend = cryptobackend.load(name)
+            self.assertEqual(backend.modExp(m, d, n), pow(m, d, n))
+            self.assertEqual(backend.signCrt(m, crt), pow(m, d, n))
+            self.assertTrue(backend.isPrime(p, crypto.randomBytes))
+            N, E, D, P, Q, U = backend.generate(1024, 65537, crypto.randomBytes)
+            self.assertEqual(N, P * Q)
+            self.assertTrue(P < Q)
+            self.assertEqual(U * P % Q, 1)
+            self.assertEqual(pow(pow(m % N, E, N), D, N), m % N)
+            for cipher, blocksize in (('AES', 16), ('CAST5', 8),
+                                      ('Blowfish', 8)):
+                c = backend.cipherCFB(cipher, key, iv[:blocksize]).encrypt(
+                    data[:96])
+                self.assertEqual(c, crypto.backend.cipherCFB(
+                        cipher, key, iv[:blocksize]).encrypt(data[:96]))
+                self.assertEqual(backend.cipherCFB(
+                        cipher, key, iv[:blocksize]).decrypt(c), data[:96])
+                c = backend.cipher(cipher, key).encrypt(data[:96])
+                self.assertEqual(backend.cipher(cipher, key).decrypt(c),
+                                 data[:96])
+            self.assertEqual(backend.hashNew('sha256', data).digest(),
+                             crypto.hash_sha256(data))
+        self.assertRaises(Exception, cryptobackend.load, 'nonexistent')
+
 # ------------------------------------------------------------------------------
 
 if __name__ == '__main__':
@@ -116,6 +116,36 @@ class TestElements(unittest.TestCase):
                             crypto.SYMALGORITHM_AES256).encode('hex'),
             'ebb7109b9203ce8570722a947d5489137a92675032c5264a71508ca3aed5e008')
         s2k = elements.S2KElement()
+
+    def testS2kCodedCount(self):
+        for c in range(0, 256):
+            count = elements.S2KElement.decodeCount(c)
+            self.assertEqual(elements.S2KElement.encodeCount(count), c)
+            if c > 0:
+                self.assertEqual(elements.S2KElement.encodeCount(count - 1), c)
+        self.assertEqual(elements.S2KElement.decodeCount(96), 65536)
+        self.assertEqual(elements.S2KElement.encodeCount(0), 0)
+        self.assertEqual(elements.S2KElement.encodeCount(2 ** 30), 255)
+        s2k = elements.S2KElement(count=1000000)
+        self.assertEqual(s2k.count, 1015808)
+        self.assertEqual(elements.S2KElement(s2k.rep()).count, 1015808)
+        self.assertEqual(elements.S2KElement().rep()[-1], chr(96))
+        count = elements.S2KElement.calibrate(0.01)
+        self.assertEqual(
+            elements.S2KElement.decodeCount(
+                elements.S2KElement.encodeCount(count)), count)
+
+    def testS2kCount(self):
+        s2k = elements.S2KElement('\x03\x08\x96\x24\x3f\xe7\xc3\xb7\x22\x81'
+                                  '\xff')
+        self.assertEqual(s2k.count, 65011712)
+        for count in (1000003, 10):
+            s2k.count = count
+            m = s2k.salt + 'passphrase'
+            data = (m * (max(count, len(m)) / len(m) + 1))[:max(count, len(m))]
+            self.assertEqual(
+                s2k.generateKey('passphrase', crypto.SYMALGORITHM_AES256),
+                crypto.hash(data, crypto.HASH_SHA256))
         
 
 # ------------------------------------------------------------------------------
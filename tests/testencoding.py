@@ -23,6 +23,7 @@ import sys
 sys.path.append('..')
 
 import unittest
+import encoding
 from encoding import *
 import crypto
 
@@ -33,6 +34,12 @@ class TestEncoding(unittest.TestCase):
     def testEcash(self):
         self.assertTrue(len(ecash('foobar', 1024, crypto.HASH_SHA1)) * 8 <= 1024)
         self.assertTrue(ecash('foobar', 1024, crypto.HASH_SHA1).startswith('foobar'))
+        x = ['foobar']
+        for i in range(0, (1024 - 48) / 160):
+            x.append(crypto.hash(''.join(x), crypto.HASH_SHA1))
+        self.assertEqual(ecash('foobar', 1024, crypto.HASH_SHA1), ''.join(x))
+        self.assertEqual(ecashInt('foobar', 1024, crypto.HASH_SHA1),
+                         crypto.b2i(''.join(x)))
 
 # ------------------------------------------------------------------------------
 
@@ -51,6 +58,13 @@ class TestEncoding(unittest.TestCase):
             pssMGF('abcdefghijklmnopqrst', 43, crypto.HASH_SHA1).encode('hex'),
             '23cf4b6d0149c1edfe4444807deb454e1e15369437679463961c86426180c0736dabd'
             'cbb38464e1cca90df')
+        stream = mgf1('abc', crypto.HASH_SHA256)
+        blocks = [stream.next() for counter in range(0, 3)]
+        for counter, block in enumerate(blocks):
+            self.assertEqual(block, crypto.hash(
+                    'abc' + crypto.i2bFixed(counter, 4), crypto.HASH_SHA256))
+        self.assertEqual(pssMGF('abc', 70, crypto.HASH_SHA256),
+                         ''.join(blocks)[0:70])
         
 # ------------------------------------------------------------------------------
 
@@ -100,8 +114,43 @@ class TestEncoding(unittest.TestCase):
             pssVerify(M,
                       hashEncode(M, 1024, crypto.HASH_SHA256, ENCODING_PKCSPSS),
                       32, 1024, crypto.HASH_SHA256))
+
+    def testPssVerifyInt(self):
+        M = 'Foobar'
+        for emBits in (600, 1023, 1024):
+            em = crypto.b2i(pssEncode(M, 32, emBits, crypto.HASH_SHA256))
+            self.assertTrue(pssVerifyInt(M, em, 32, emBits, crypto.HASH_SHA256))
+            self.assertFalse(pssVerifyInt('FooBar', em, 32, emBits,
+                                          crypto.HASH_SHA256))
+            # trailer, top bits, salt and padding
+            self.assertFalse(pssVerifyInt(M, em ^ 1, 32, emBits,
+                                          crypto.HASH_SHA256))
+            self.assertFalse(pssVerifyInt(M, em | 1 << emBits, 32, emBits,
+                                          crypto.HASH_SHA256))
+            self.assertFalse(pssVerifyInt(M, em ^ 1 << 8 * 33 + 8, 32, emBits,
+                                          crypto.HASH_SHA256))
+            self.assertFalse(pssVerifyInt(M, em ^ 1 << emBits - 1, 32, emBits,
+                                          crypto.HASH_SHA256))
+            self.assertFalse(pssVerifyInt(M, em, 20, emBits,
+                                          crypto.HASH_SHA256))
         
 
+# ------------------------------------------------------------------------------
+
+    def testPkcs15Int(self):
+        for algorithm in (crypto.HASH_SHA1, crypto.HASH_SHA256,
+                          crypto.HASH_SHA512):
+            for emBits in (1023, 1024, 2048):
+                pHash = crypto.hash('Foobar', algorithm)
+                self.assertEqual(pkcs15Int(pHash, emBits, algorithm),
+                                 crypto.b2i(pkcs15(pHash, emBits, algorithm)))
+                self.assertTrue((emBits, algorithm) in
+                                encoding._PKCS15_TEMPLATES)
+        self.assertRaises(Exception, pkcs15Int, 'abc', 1024, crypto.HASH_SHA1)
+        self.assertRaises(Exception, pkcs15Int,
+                          crypto.hash('Foobar', crypto.HASH_SHA512), 512,
+                          crypto.HASH_SHA512)
+
 # ------------------------------------------------------------------------------
 
     def testHashEncode(self):
@@ -128,6 +177,26 @@ class TestEncoding(unittest.TestCase):
         hashEncode('Foobar', 1024, crypto.HASH_SHA224, ENCODING_PKCS15)
         hashEncode('Foobar', 1024, crypto.HASH_SHA224, ENCODING_ECASH)
         hashEncode('Foobar', 1024, crypto.HASH_SHA224, ENCODING_PKCSPSS)
+
+    def testHashEncodeMany(self):
+        messages = ['Foobar', '', 'The quick brown fox' * 10]
+        for algorithm in (crypto.HASH_SHA1, crypto.HASH_SHA256,
+                          crypto.HASH_SHA512):
+            for encoding in (ENCODING_PKCS15, ENCODING_ECASH):
+                self.assertEqual(
+                    hashEncodeMany(messages, 2048, algorithm, encoding),
+                    [crypto.b2i(hashEncode(m, 2048, algorithm, encoding))
+                     for m in messages])
+            ems = hashEncodeMany(messages, 2047, algorithm, ENCODING_PKCSPSS)
+            self.assertEqual(len(ems), len(messages))
+            for m, em in zip(messages, ems):
+                self.assertTrue(pssVerifyInt(m, em,
+                                             crypto.HASH_SIZE[algorithm] / 8,
+                                             2047, algorithm))
+        self.assertEqual(hashEncodeMany([], 1024, crypto.HASH_SHA256,
+                                        ENCODING_PKCSPSS), [])
+        self.assertRaises(Exception, hashEncodeMany, messages, 1024,
+                          crypto.HASH_SHA256, 99)
         
 # ------------------------------------------------------------------------------
         
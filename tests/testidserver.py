@@ -100,6 +100,14 @@ class TestIDServer(unittest.TestCase):
         self.assertTrue(users.hasSigned('mmustermann', 'abc123'))
         self.assertFalse(users.hasSigned('mmustermann', 'notsigned'))
         self.assertFalse(users.hasSigned('jdoe', 'notsigned'))
+        # concurrent requests of a user are refused until the first one ends
+        self.assertTrue(users.begin('jdoe', 'abc123'))
+        self.assertFalse(users.begin('jdoe', 'abc123'))
+        users.end('jdoe')
+        self.assertTrue(users.begin('jdoe', 'abc123'))
+        users.end('jdoe', 'abc123')
+        self.assertFalse(users.begin('jdoe', 'abc123'))
+        self.assertFalse(users.begin('mmustermann', 'abc123'))
 
     def testSign(self):
         m = 'Foobar'
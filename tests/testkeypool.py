@@ -0,0 +1,97 @@
+#!/usr/bin/python
+__copyright__ = """
+Copyright (C) Timo Engel (timo-e@freenet.de), Berlin 2012.
+This program was written as part of a master thesis advised by 
+Prof. Dr. Ruediger Weis at the Beuth University of Applied 
+Sciences Berlin.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import sys
+sys.path.append('..')
+
+import unittest
+import tempfile
+import shutil
+import os
+import time
+
+import keypool
+from OpenPGP import *
+
+# ------------------------------------------------------------------------------
+
+class TestKeyPool(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def testTake(self):
+        pool = keypool.KeyPool(self.directory, 'secret', 2, 1024, 1)
+        pool.fill()
+        self.assertEqual(pool.count(), 2)
+        files = sorted(os.listdir(self.directory))
+        self.assertEqual(len(files), 4)
+        self.assertRaises(Exception, messages.fromRadix64,
+                          open(os.path.join(self.directory, files[1])).read())
+
+        keys = [pool.take() for i in range(0, 3)]
+        self.assertEqual(pool.count(), 0)
+        self.assertEqual(os.listdir(self.directory), [])
+        for pubKey, secKey in keys:
+            self.assertEqual(pubKey.packets[TAG_PUBKEY].keyID(),
+                             secKey.packets[TAG_SECKEY].keyID())
+            self.assertTrue(nymValid(pubKey, secKey))
+        self.assertEqual(len(set(pubKey.packets[TAG_PUBKEY].n.value
+                                 for pubKey, secKey in keys)), 3)
+
+    def testTakeWrongPassphrase(self):
+        keypool.KeyPool(self.directory, 'secret', 1, 1024, 1).fill()
+        files = sorted(os.listdir(self.directory))
+        pool = keypool.KeyPool(self.directory, 'wrong', 1, 1024, 1)
+        self.assertRaises(Exception, pool.take)
+        self.assertEqual(sorted(os.listdir(self.directory)), files)
+        pool.passphrase = 'secret'
+        pubKey, secKey = pool.take()
+        self.assertTrue(nymValid(pubKey, secKey))
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def testBackground(self):
+        pool = keypool.KeyPool(self.directory, 'secret', 1, 1024, 1)
+        pool.start()
+        for i in range(0, 100):
+            if pool.count() == 1:
+                break
+            time.sleep(0.1)
+        self.assertEqual(pool.count(), 1)
+        pubKey, secKey = pool.take()
+        pool.shutdown()
+        pool.join()
+        self.assertTrue(nymValid(pubKey, secKey))
+
+# ------------------------------------------------------------------------------
+
+def nymValid(pubKey, secKey):
+    nym = packets.NymPacket.fromParameter('Foo', secKey.packets[TAG_SECKEY].n)
+    nym.computeSignature(secKey)
+    return nym.isValid(pubKey)
+
+# ------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+        unittest.main()
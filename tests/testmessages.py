@@ -140,6 +140,26 @@ class TestMessages(unittest.TestCase):
                          '\x34\x59\xf0\x05\xf5\x0d\xc3\xef\xbe\x97\x4c\x32')
         self.assertEqual(secretkey.checksum, '\x9e\x47')
 
+    def testSecretKeyS2KCount(self):
+        radix64 = open('testdata/foo-bar.com_secret_openpgp.txt', 'r').read()
+        m = messages.fromRadix64(radix64)
+        data = m.rep('secret', 1000000)
+        key = messages.fromRadix64(data, lambda: 'secret').packets[TAG_SECKEY]
+        self.assertEqual(key.s2k.count, 1015808)
+        self.assertEqual(key.d.value, m.packets[TAG_SECKEY].d.value)
+        key = messages.fromRadix64(
+            messages.SecretKeyMessage.fromPackets((key,)).rep('secret'),
+            lambda: 'secret').packets[TAG_SECKEY]
+        self.assertEqual(key.s2k.count, 1015808)
+        key = messages.fromRadix64(m.rep('secret'),
+                                   lambda: 'secret').packets[TAG_SECKEY]
+        self.assertEqual(key.s2k.count, 1015808)
+        key = messages.fromRadix64(radix64).packets[TAG_SECKEY]
+        key = messages.fromRadix64(
+            messages.SecretKeyMessage.fromPackets((key,)).rep('secret'),
+            lambda: 'secret').packets[TAG_SECKEY]
+        self.assertEqual(key.s2k.count, elements.S2KElement.DEFAULT_COUNT)
+
 
     def testKeySignature(self):
         secretKey  = messages.fromRadix64(
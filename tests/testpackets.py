@@ -36,7 +36,7 @@ class TestPackets(unittest.TestCase):
         self.assertTrue(ord(h[0]) & 0x80, 0x80)
         self.assertTrue(ord(h[0]) & 0x40, 0x40)
         self.assertTrue(ord(h[0]) & 0x3f, 1)
-        self.assertTrue(h[1:2], '\xc8\x32')
+        self.assertEqual(h[1:3], '\xc7\x72')
         packets.Packet.parse(io.BytesIO(h))
         h = packets.Packet.createHeader(1, 191)
         self.assertTrue(len(h), 2)
@@ -96,6 +96,33 @@ class TestPackets(unittest.TestCase):
         self.assertEqual(s2.hashLeftTwo, '\x01\x02')
         self.assertEqual(s2.sig.value, 2**256)
 
+    def testNotationDataSubpacket(self):
+        s1 = packets.SignaturePacket()
+        s1.version = elements.ScalarElement(4)
+        s1.signatureType = elements.ScalarElement(0)
+        s1.pubAlgorithm = elements.ScalarElement(1)
+        s1.hashAlgorithm = elements.ScalarElement(2)
+        s1.hashedSubpackets.setNotation('a@example.org', '3,5')
+        s1.hashedSubpackets.setNotation('b@example.org', '7')
+        s1.hashedSubpackets.setNotation('a@example.org', '3,5,7')
+        s1.hashLeftTwo = '\x01\x02'
+        s1.sig = elements.MPIElement(2**256)
+
+        s2 = packets.SignaturePacket.fromData(io.BytesIO(s1.rep()[2:]))
+        self.assertEqual(len(s2.hashedSubpackets.packets), 2)
+        self.assertEqual(s2.hashedSubpackets.notation('a@example.org'),
+                         '3,5,7')
+        self.assertEqual(s2.hashedSubpackets.notation('b@example.org'), '7')
+        self.assertEqual(s2.hashedSubpackets.notation('c@example.org'), None)
+        self.assertEqual(s2.hashedSubpackets.packets[0].flags,
+                         '\x80\x00\x00\x00')
+        self.assertEqual(s2.rep(), s1.rep())
+        self.assertEqual(packets.parseExponents('3,5,7'), (3, 5, 7))
+        self.assertEqual(packets.parseExponents(None), ())
+        self.assertRaises(Exception, packets.parseExponents, '3,x')
+        self.assertRaises(Exception, subpackets.NotationDataSubpacket,
+                          '\x80\x00\x00\x00\x00\x02\x00\x01ab')
+
 
     def testBlindMessageMessage(self):
         mpi = elements.MPIElement(23)
@@ -121,6 +148,73 @@ class TestPackets(unittest.TestCase):
         n.computeSignature(secretKey)
         self.assertTrue(n.isValid(publicKey))
 
+    def testEd25519NymPacket(self):
+        publicKey, secretKey = generateEd25519Key()
+        n = createNym('Foo Bar', secretKey)
+        self.assertEqual(n.TAG, TAG_ED25519NYM)
+        self.assertEqual(len(n.rep()), 2 + 1 + 7 + 32 + 64)
+        self.assertTrue(n.isValid(publicKey))
+        self.assertTrue(n.verifySelfSignature())
+        m = messages.fromRadix64(messages.Message.fromPackets((n,)).rep())
+        n1 = getNym(m)
+        self.assertEqual(n1.id, n.id)
+        self.assertEqual(n1.key, n.key)
+        self.assertEqual(n1.signature, n.signature)
+        self.assertTrue(n1.verifySelfSignature())
+        self.assertEqual(n1.fingerprint(), n.fingerprint())
+        n1.id = 'Foo Baz'
+        self.assertFalse(n1.verifySelfSignature())
+        otherPublic, otherSecret = generateEd25519Key()
+        self.assertFalse(n.isValid(otherPublic))
+
+        secretKey  = messages.fromRadix64(
+            open('testdata/foo-bar.com_secret_openpgp.txt', 'r').read())
+        n = createNym('Foo', secretKey)
+        self.assertEqual(n.TAG, TAG_NYM)
+        self.assertTrue(n.verifySelfSignature())
+
+    def testEd25519Key(self):
+        publicKey, secretKey = generateEd25519Key()
+        pub = publicKey.packets[TAG_PUBKEY]
+        sec = secretKey.packets[TAG_SECKEY]
+        self.assertEqual(pub.algorithm.value, packets.ALGORITHM_ED25519)
+        self.assertEqual(pub.fingerprint(), sec.fingerprint())
+        pub1 = messages.fromRadix64(publicKey.rep()).packets[TAG_PUBKEY]
+        self.assertEqual(pub1.ed25519Public, pub.ed25519Public)
+        self.assertEqual(pub1.fingerprint(), pub.fingerprint())
+        sec1 = messages.fromRadix64(secretKey.rep()).packets[TAG_SECKEY]
+        self.assertEqual(sec1.ed25519Secret, sec.ed25519Secret)
+        self.assertEqual(sec1.ed25519Public, sec.ed25519Public)
+        sec1 = messages.fromRadix64(secretKey.rep('secret', 1024),
+                                    passphraseCallback).packets[TAG_SECKEY]
+        self.assertEqual(sec1.ed25519Secret, sec.ed25519Secret)
+        self.assertEqual(sec1.primes, [])
+        self.assertTrue('Ed25519' in str(sec1))
+
+    def testRSAContext(self):
+        secretKey  = messages.fromRadix64(
+            open('testdata/foo-bar.com_secret_openpgp.txt', 'r').read())
+        publicKey  = messages.fromRadix64(
+            open('testdata/foo-bar.com_public_openpgp.txt', 'r').read())
+        pub = RSAPublicContext(publicKey)
+        sec = RSAPrivateContext(secretKey)
+        self.assertEqual(pub.n, publicKey.packets[TAG_PUBKEY].n.value)
+        self.assertEqual(pub.bits, 1024)
+        self.assertEqual(pub.octets, 128)
+        self.assertEqual(pub.keyID, '\x7B\x4F\x9A\xAF\x42\x65\x20\x10')
+        self.assertEqual(sec.keyID, pub.keyID)
+        self.assertEqual(pub.expirationTime().value,
+                         publicKey.expirationTime().value)
+        self.assertTrue(pub.verify(sec.sign(12345), 12345))
+        self.assertRaises(Exception, RSAPrivateContext, publicKey)
+        self.assertTrue(packets.publicContext(pub) is pub)
+
+        signature = computeSignature('Foobar', sec)
+        self.assertTrue(verifySignature('Foobar', signature, pub))
+        n = packets.NymPacket.fromParameter('Foo', pub.packet.n)
+        n.computeSignature(sec)
+        self.assertTrue(n.isValid(pub))
+
     def testPublicKeyPacket(self):
         p1 = packets.PublicKeyPacket.fromParameter(elements.MPIElement(1234),
                                                   elements.MPIElement(3))
@@ -149,6 +243,42 @@ class TestPackets(unittest.TestCase):
         self.assertEqual(s1.q.value, s2.q.value)
         self.assertEqual(s1.u.value, s2.u.value)
 
+    def testSecretKeyMultiPrime(self):
+        publicKey, secretKey = generateKey(1024, 3)
+        key = secretKey.packets[TAG_SECKEY]
+        self.assertEqual(len(key.primes), 1)
+        data = key.rep()
+        plain = packets.SecretKeyPacket(io.BytesIO(data[3:]), len(data) - 3)
+        self.assertEqual(plain.primes[0].value, key.primes[0].value)
+        plain = messages.fromRadix64(secretKey.rep()).packets[TAG_SECKEY]
+        self.assertEqual(plain.primes[0].value, key.primes[0].value)
+        self.assertEqual(plain.checksum, '\x00\x00')
+        plain = packets.SecretKeyPacket(io.BytesIO(data[3:]))
+        self.assertEqual(plain.primes[0].value, key.primes[0].value)
+        # a zero MPI, a truncated body and a short length are rejected
+        zero = data[3:-2] + '\x00\x00' + data[-2:]
+        self.assertRaises(Exception, packets.SecretKeyPacket,
+                          io.BytesIO(zero), len(zero))
+        self.assertRaises(Exception, packets.SecretKeyPacket,
+                          io.BytesIO(data[3:-1]), len(data) - 3)
+        self.assertRaises(Exception, packets.SecretKeyPacket,
+                          io.BytesIO(data[3:]), len(data) - 4)
+        data = key.rep('secret')
+        encrypted = packets.SecretKeyPacket(io.BytesIO(data[3:]),
+                                            len(data) - 3, passphraseCallback)
+        self.assertEqual(encrypted.primes[0].value, key.primes[0].value)
+        self.assertEqual(publicKey.packets[TAG_PUBKEY].n.value, key.n.value)
+        n = packets.NymPacket.fromParameter('Foo', key.n)
+        n.computeSignature(messages.SecretKeyMessage.fromPackets((encrypted,)))
+        self.assertTrue(n.isValid(publicKey))
+
+    def testSecretKeyEncryptedInMessage(self):
+        m = messages.fromRadix64(
+            open('testdata/foo-bar.com_secret_openpgp.txt', 'r').read())
+        key = messages.fromRadix64(m.rep('secret'),
+                                   passphraseCallback).packets[TAG_SECKEY]
+        self.assertEqual(key.d.value, m.packets[TAG_SECKEY].d.value)
+
     def testSecretKeyEncrypted(self):
         key = messages.fromRadix64(
             open('testdata/foobar-bar.com_secret_2048encrypted.txt', 'r').read(),
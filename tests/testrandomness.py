@@ -0,0 +1,101 @@
+#!/usr/bin/python
+__copyright__ = """
+Copyright (C) Timo Engel (timo-e@freenet.de), Berlin 2012.
+This program was written as part of a master thesis advised by 
+Prof. Dr. Ruediger Weis at the Beuth University of Applied 
+Sciences Berlin.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import sys
+sys.path.append('..')
+
+import unittest
+import os
+import select
+import signal
+
+import randomness
+
+# ------------------------------------------------------------------------------
+
+class TestRandomness(unittest.TestCase):
+
+    def tearDown(self):
+        randomness.setBufferSize(0)
+
+    def testRead(self):
+        randomness.resetCounters()
+        r1 = randomness.read(10)
+        r2 = randomness.read(10)
+        self.assertEqual(len(r1), 10)
+        self.assertEqual(len(r2), 10)
+        self.assertTrue(r1 != r2)
+        self.assertEqual(randomness.read(0), '')
+        self.assertEqual(randomness.counters(), (3, 20, 2))
+
+    def testBuffer(self):
+        randomness.setBufferSize(64)
+        randomness.resetCounters()
+        r = [randomness.read(16) for i in range(0, 8)]
+        self.assertEqual(len(set(r)), 8)
+        self.assertEqual(randomness.counters(), (8, 128, 2))
+        self.assertEqual(len(randomness.read(100)), 100)
+        self.assertEqual(randomness.counters(), (9, 228, 3))
+
+    def testFork(self):
+        randomness.setBufferSize(64)
+        randomness.read(16)
+        readFd, writeFd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(readFd)
+            os.write(writeFd, randomness.read(16))
+            os._exit(0)
+        os.close(writeFd)
+        child = os.read(readFd, 16)
+        os.close(readFd)
+        os.waitpid(pid, 0)
+        self.assertEqual(len(child), 16)
+        self.assertNotEqual(child, randomness.read(16))
+
+    def testForkWhileLocked(self):
+        # another thread holds the lock while the process forks
+        lock = randomness._lock()
+        lock.acquire()
+        try:
+            readFd, writeFd = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                os.close(readFd)
+                os.write(writeFd, randomness.read(16))
+                os._exit(0)
+        finally:
+            lock.release()
+        os.close(writeFd)
+        ready = select.select([readFd], [], [], 10)[0]
+        if not ready:
+            os.kill(pid, signal.SIGKILL)
+        child = ''
+        if ready:
+            child = os.read(readFd, 16)
+        os.close(readFd)
+        os.waitpid(pid, 0)
+        self.assertEqual(len(child), 16)
+
+# ------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+        unittest.main()
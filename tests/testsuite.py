@@ -29,6 +29,8 @@ import testmessages
 import testblindca
 import testblinding
 import testencoding
+import testrandomness
+import testkeypool
 import testidserver
 import testkeyserver
 
@@ -42,6 +44,8 @@ suite.addTest(unittest.makeSuite(testmessages.TestMessages))
 suite.addTest(unittest.makeSuite(testblindca.TestBlindCa))
 suite.addTest(unittest.makeSuite(testblinding.TestBlinding))
 suite.addTest(unittest.makeSuite(testencoding.TestEncoding))
+suite.addTest(unittest.makeSuite(testrandomness.TestRandomness))
+suite.addTest(unittest.makeSuite(testkeypool.TestKeyPool))
 suite.addTest(unittest.makeSuite(testidserver.TestIDServer))
 suite.addTest(unittest.makeSuite(testkeyserver.TestKeyServer))
 
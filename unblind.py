@@ -22,6 +22,7 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import sys
 
 import blinding
+import crypto
 from OpenPGP import *
 
 if len(sys.argv) != 3:
@@ -34,10 +35,23 @@ randfile = open(sys.argv[1], 'r')
 r = elements.ScalarElement(randfile.readline().strip().decode('hex')).value
 hashtwo = randfile.readline().strip().decode('hex')
 sigTime = elements.TimeElement(int(randfile.readline().strip()))
+# random files written before the hash policy have no algorithm line
+hashAlgorithm = randfile.readline().strip()
+if len(hashAlgorithm) > 0:
+    hashAlgorithm = int(hashAlgorithm)
+else:
+    hashAlgorithm = crypto.HASH_SHA256
+# the exponent slot, if blind.py was called with --slot
+exponent = randfile.readline().strip()
+if len(exponent) > 0:
+    exponent = int(exponent)
+else:
+    exponent = None
 randfile.close()
 publicKey  = messages.fromRadix64(open(sys.argv[2], 'r').read())
 
-sig = blinding.unblind(publicKey, sigTime, r, hashtwo, blindSig)
+sig = blinding.unblind(publicKey, sigTime, r, hashtwo, blindSig, exponent,
+                       hashAlgorithm=hashAlgorithm)
 
 #print >>sys.stderr, sig
 print sig.rep()